@@ -3,10 +3,11 @@ from flask_cors import CORS
 import pandas as pd
 import requests
 import json
-from sentence_transformers import SentenceTransformer
 import chromadb
 import traceback
 import os
+from retrieval import retrieve
+from encoders import load_encoder, open_collection
 
 app = Flask(__name__)
 CORS(app)
@@ -17,9 +18,9 @@ EXCEL_FILE_PATH = os.path.join("backend", "Performence_Best_Practices.xlsx")
 JSON_FILE_PATH = os.path.join("backend", "DataSet.json")
 
 # Initialize Chroma and model
-model = SentenceTransformer("all-MiniLM-L6-v2")
+model = load_encoder("all-MiniLM-L6-v2")
 client = chromadb.PersistentClient(path="./chroma_store")
-collection = client.get_or_create_collection("java_feedback")
+collection = open_collection(client, "java_feedback", model.signature)
 
 # 1. Extract Excel (Observation/Recommendation)
 def extract_from_excel(excel_path):
@@ -67,15 +68,13 @@ def store_all_to_vector_db(excel_pairs, json_chunks):
             embeddings=[embedding.tolist()]
         )
 
-# 4. Query ChromaDB for relevant entries
+# 4. Query ChromaDB for relevant entries (windowed query, distance cutoff + MMR)
 def get_relevant_context(user_input, top_k=4):
-    embedding = model.encode(user_input).tolist()
-    results = collection.query(query_embeddings=[embedding], n_results=top_k)
-    docs = results["documents"][0]
-    metas = results["metadatas"][0]
+    items = retrieve(model.encode, collection, user_input, top_k=top_k)
 
     context_blocks = []
-    for doc, meta in zip(docs, metas):
+    for item in items:
+        doc, meta = item["document"], item["metadata"]
         if meta["source"] == "excel":
             context_blocks.append(f"Observation: {doc}\nRecommendation: {meta['recommendation']}")
         elif meta["source"] == "json":
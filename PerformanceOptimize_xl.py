@@ -1,12 +1,11 @@
 from flask import Flask, request, jsonify
 from flask_cors import CORS
-import pandas as pd
 import requests
 from sentence_transformers import SentenceTransformer
 import chromadb
 import traceback
 import os
-import Levenshtein
+from sheet_schema import extract_workbook
 
 app = Flask(__name__)
 CORS(app)
@@ -29,54 +28,24 @@ except Exception as e:
     collection = client.get_or_create_collection("java_feedback")
     print("Using in-memory ChromaDB client.")
 
-OBS_KEYS = ["Scenarios", "Observation", "Dependencies / Checklists", "Checklist", "Recommendation", "Section"]
-REC_KEYS = ["Sample Code", "Recommendation / Sample Code", "Sample Config", "Conclusion", "Example", "Details"]
-THRESHOLD = 0.7
-
-def normalize_header(h):
-    return h.strip().lower().replace("/", " ").replace("-", " ").replace("_", " ")
-
-def fuzzy_match(col, keys):
-    col = normalize_header(col)
-    keys = [normalize_header(k) for k in keys]
-    return max((Levenshtein.ratio(col, k) for k in keys), default=0)
-
-def find_column(df, keys):
-    best_col = None
-    best_score = 0
-    for col in df.columns:
-        score = fuzzy_match(str(col), keys)
-        if score > best_score and score >= THRESHOLD:
-            best_col = col
-            best_score = score
-    return best_col
-
+# Sheets are parsed in parallel; column mappings are cached by header layout
 def extract_from_excel(excel_path):
-    all_pairs = []
     try:
-        xls = pd.ExcelFile(excel_path)
-        for sheet in xls.sheet_names:
-            try:
-                df = xls.parse(sheet)
-                obs_col = find_column(df, OBS_KEYS)
-                rec_col = find_column(df, REC_KEYS)
-                desc_col = "Description" if "Description" in df.columns else None
-
-                if obs_col and rec_col:
-                    cols = [obs_col, rec_col] + ([desc_col] if desc_col else [])
-                    df = df[cols].dropna(subset=[obs_col, rec_col])
-                    for _, row in df.iterrows():
-                        obs = str(row[obs_col])
-                        rec = str(row[rec_col])
-                        desc = str(row[desc_col]) if desc_col else ""
-                        all_pairs.append((obs, rec, sheet, desc))
-            except Exception as e:
-                print(f"Error parsing sheet '{sheet}': {e}")
-                traceback.print_exc()
+        all_pairs, reports = extract_workbook(excel_path)
+        for report in reports:
+            if "error" in report:
+                print(f"Error parsing sheet '{report['sheet']}': {report['error']}")
+            else:
+                source = "cached" if report["cached_mapping"] else "fuzzy"
+                print(f"Sheet '{report['sheet']}': observation={report['observation']!r}, "
+                      f"recommendation={report['recommendation']!r}, description={report['description']!r} "
+                      f"({source} mapping, {report['rows']} rows, {report['seconds']}s)")
+        return all_pairs
     except Exception as e:
         print(f"Error reading Excel file: {e}")
         traceback.print_exc()
-    return all_pairs
+        return []
+
 
 def store_in_vector_db(pairs):
     print(f"Storing {len(pairs)} pairs into vector DB...")
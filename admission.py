@@ -0,0 +1,152 @@
+import math
+import os
+import threading
+import time
+from collections import deque
+
+# Requests allowed to generate at once (0 = one per Ollama backend); the
+# rest wait in a bounded queue per priority class, interactive first
+ADMISSION_CONCURRENCY = int(os.environ.get("ADMISSION_CONCURRENCY", "0"))
+PRIORITIES = ("interactive", "batch")
+ADMISSION_QUEUE_LIMITS = {
+    "interactive": int(os.environ.get("ADMISSION_INTERACTIVE_QUEUE", "32")),
+    "batch": int(os.environ.get("ADMISSION_BATCH_QUEUE", "128"))
+}
+# Deadline of a request that does not send X-Request-Timeout (seconds)
+ADMISSION_DEADLINES = {
+    "interactive": float(os.environ.get("ADMISSION_INTERACTIVE_DEADLINE", "30")),
+    "batch": float(os.environ.get("ADMISSION_BATCH_DEADLINE", "300"))
+}
+# Service time assumed until real requests have been measured
+INITIAL_SERVICE_SECONDS = 10.0
+SERVICE_TIME_SMOOTHING = 0.2
+WAIT_SAMPLES = 1000
+
+
+# Raised instead of queueing a request that cannot finish in time; status
+# is 429 when the queue is full and 503 when the deadline cannot be met
+class Overloaded(Exception):
+    def __init__(self, message, status, retry_after):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = max(1, int(math.ceil(retry_after)))
+
+
+class _Ticket:
+    def __init__(self, priority, deadline):
+        self.priority = priority
+        self.deadline = deadline
+        self.enqueued = time.monotonic()
+        self.admitted = threading.Event()
+        self.expired = False
+
+
+class AdmissionController:
+    def __init__(self, concurrency, queue_limits=None, deadlines=None):
+        self.concurrency = max(1, concurrency)
+        self.queue_limits = dict(ADMISSION_QUEUE_LIMITS, **(queue_limits or {}))
+        self.deadlines = dict(ADMISSION_DEADLINES, **(deadlines or {}))
+        self.lock = threading.Lock()
+        self.queues = {p: deque() for p in PRIORITIES}
+        self.running = 0
+        self.service_seconds = INITIAL_SERVICE_SECONDS
+        self.waits = {p: deque(maxlen=WAIT_SAMPLES) for p in PRIORITIES}
+        self.counters = {p: {"admitted": 0, "rejected_full": 0, "rejected_deadline": 0, "expired": 0, "max_depth": 0}
+                         for p in PRIORITIES}
+
+    def deadline_for(self, priority, timeout=None):
+        return time.monotonic() + (timeout if timeout else self.deadlines[priority])
+
+    # Expected queueing delay for a new request of this class: everything
+    # queued ahead of it drains through the slots at the measured pace
+    def estimated_wait(self, priority):
+        if self.running < self.concurrency and not any(self.queues.values()):
+            return 0.0
+        ahead = sum(len(self.queues[p]) for p in PRIORITIES[:PRIORITIES.index(priority) + 1])
+        return (ahead + 1) * self.service_seconds / self.concurrency
+
+    def acquire(self, priority, deadline):
+        if priority not in self.queues:
+            raise ValueError(f"Unknown priority '{priority}', expected one of {', '.join(PRIORITIES)}")
+        with self.lock:
+            counters = self.counters[priority]
+            wait = self.estimated_wait(priority)
+            if wait == 0.0:
+                self.running += 1
+                counters["admitted"] += 1
+                self.waits[priority].append(0.0)
+                return
+            if len(self.queues[priority]) >= self.queue_limits[priority]:
+                counters["rejected_full"] += 1
+                raise Overloaded(f"The {priority} queue is full", 429, wait)
+            remaining = deadline - time.monotonic()
+            if wait + self.service_seconds > remaining:
+                counters["rejected_deadline"] += 1
+                raise Overloaded(f"Estimated wait {wait:.1f}s plus {self.service_seconds:.1f}s of generation exceeds "
+                                 f"the request deadline ({remaining:.1f}s left)", 503, wait)
+            ticket = _Ticket(priority, deadline)
+            self.queues[priority].append(ticket)
+            counters["max_depth"] = max(counters["max_depth"], len(self.queues[priority]))
+
+        ticket.admitted.wait(max(deadline - time.monotonic(), 0))
+        with self.lock:
+            if not ticket.admitted.is_set():
+                # Timed out in the queue; the dispatcher may not have seen it yet
+                if ticket in self.queues[priority]:
+                    self.queues[priority].remove(ticket)
+                ticket.expired = True
+            if ticket.expired:
+                counters["expired"] += 1
+        if ticket.expired:
+            raise Overloaded("The request deadline expired while queued", 503, self.service_seconds)
+
+    # Hand the freed slot to the oldest live request of the highest class;
+    # expired ones are dropped on the way
+    def release(self, service_seconds):
+        with self.lock:
+            self.service_seconds += SERVICE_TIME_SMOOTHING * (service_seconds - self.service_seconds)
+            now = time.monotonic()
+            for priority in PRIORITIES:
+                queue = self.queues[priority]
+                while queue:
+                    ticket = queue.popleft()
+                    if ticket.deadline <= now:
+                        ticket.expired = True
+                        ticket.admitted.set()
+                        continue
+                    self.counters[priority]["admitted"] += 1
+                    self.waits[priority].append(now - ticket.enqueued)
+                    ticket.admitted.set()
+                    return
+            self.running -= 1
+
+    def run(self, priority, deadline, fn):
+        self.acquire(priority, deadline)
+        start = time.monotonic()
+        try:
+            return fn()
+        finally:
+            self.release(time.monotonic() - start)
+
+    def stats(self):
+        with self.lock:
+            classes = {}
+            for p in PRIORITIES:
+                waits = sorted(self.waits[p])
+                classes[p] = dict(
+                    self.counters[p],
+                    queued=len(self.queues[p]),
+                    queue_limit=self.queue_limits[p],
+                    estimated_wait_seconds=round(self.estimated_wait(p), 2),
+                    wait_ms={
+                        "avg": round(sum(waits) * 1000 / len(waits), 2) if waits else 0.0,
+                        "p95": round(waits[int(len(waits) * 0.95)] * 1000, 2) if waits else 0.0,
+                        "max": round(waits[-1] * 1000, 2) if waits else 0.0
+                    }
+                )
+            return {
+                "concurrency": self.concurrency,
+                "running": self.running,
+                "service_seconds": round(self.service_seconds, 3),
+                "classes": classes
+            }
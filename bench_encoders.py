@@ -0,0 +1,90 @@
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from code_examples import extract_code_examples
+from encoders import ENCODERS
+
+EXCEL_FILE_PATH = os.path.join("backend", "Performence_Best_Practices.xlsx")
+DATASET_FILE_PATH = os.path.join("backend", "DataSet.json")
+
+
+# Overlap of the top-k neighbours found with the candidate encoder and with
+# the reference encoder, averaged over the queries
+def neighbour_recall(reference_corpus, reference_queries, candidate_corpus, candidate_queries, k=3):
+    k = min(k, len(reference_corpus))
+    reference_top = np.argsort(-(np.asarray(reference_queries) @ np.asarray(reference_corpus).T), axis=1)[:, :k]
+    candidate_top = np.argsort(-(np.asarray(candidate_queries) @ np.asarray(candidate_corpus).T), axis=1)[:, :k]
+    return float(np.mean([len(set(r) & set(c)) / k for r, c in zip(reference_top, candidate_top)]))
+
+
+def load_corpus(excel_path, dataset_path):
+    corpus, queries = [], []
+    if os.path.exists(excel_path):
+        import pandas as pd
+        df = pd.read_excel(excel_path)
+        df.columns = df.columns.str.strip()
+        corpus = [str(obs).replace("\n", " ").strip() for obs in df["Observation"].dropna()]
+    if os.path.exists(dataset_path):
+        with open(dataset_path, "r", encoding="utf-8") as f:
+            queries = [e["code"] for e in extract_code_examples(json.load(f))]
+    return corpus, queries
+
+
+def benchmark(encoder, corpus, queries, repeats, batch_size):
+    encoder.encode(queries[:1])  # warm-up
+
+    latencies = []
+    for i in range(repeats):
+        start = time.perf_counter()
+        encoder.encode(queries[i % len(queries)])
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    corpus_vectors = encoder.encode(corpus, batch_size=batch_size, normalize_embeddings=True)
+    elapsed = time.perf_counter() - start
+
+    return {
+        "signature": encoder.signature,
+        "single_p50_ms": round(float(np.percentile(latencies, 50)), 2),
+        "single_p95_ms": round(float(np.percentile(latencies, 95)), 2),
+        "batch_texts_per_s": round(len(corpus) / elapsed, 1)
+    }, corpus_vectors, encoder.encode(queries, batch_size=batch_size, normalize_embeddings=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare an embedding backend with the stock sentence-transformers model")
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--backend", default="onnx", choices=sorted(ENCODERS))
+    parser.add_argument("--excel", default=EXCEL_FILE_PATH)
+    parser.add_argument("--dataset", default=DATASET_FILE_PATH)
+    parser.add_argument("--repeats", type=int, default=100)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--k", type=int, default=3)
+    args = parser.parse_args()
+
+    corpus, queries = load_corpus(args.excel, args.dataset)
+    if not corpus or not queries:
+        raise SystemExit(f"Need observations in {args.excel} and code examples in {args.dataset}")
+    print(f"Corpus: {len(corpus)} observations, {len(queries)} code queries")
+
+    reference = ENCODERS["torch"](args.model)
+    candidate = ENCODERS[args.backend](args.model)
+    ref_stats, ref_corpus, ref_queries = benchmark(reference, corpus, queries, args.repeats, args.batch_size)
+    cand_stats, cand_corpus, cand_queries = benchmark(candidate, corpus, queries, args.repeats, args.batch_size)
+
+    report = {
+        "reference": ref_stats,
+        "candidate": cand_stats,
+        f"recall_at_{args.k}": round(neighbour_recall(ref_corpus, ref_queries, cand_corpus, cand_queries, args.k), 4),
+        # Below ~0.99 the vectors are not interchangeable and the KB must be re-indexed
+        "mean_cosine_to_reference": round(float(np.mean(np.sum(ref_corpus * cand_corpus, axis=1))), 4)
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
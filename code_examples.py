@@ -0,0 +1,108 @@
+import hashlib
+import re
+
+# Fields of DataSet.json whose text may be a code example (compared in
+# lower case: the file mixes snake_case and CamelCase keys)
+CODE_FIELDS = {
+    "code_example", "problematic_code", "recommended_code", "example", "caller_method", "callee_method",
+    "oldcode", "updatedcode", "samplecode", "implementation", "code_snippet", "producer", "consumer",
+    "controller", "publisher", "details", "config", "code", "method"
+}
+PROBLEMATIC_FIELDS = {"problematic_code", "oldcode"}
+RECOMMENDED_FIELDS = {"recommended_code", "updatedcode"}
+
+# Prose fields that explain a code example, most specific first
+EXPLANATION_FIELDS = [
+    "recommendation", "description", "note", "use_case", "checklist", "conclusion",
+    "analysis", "context", "key_consideration", "overview"
+]
+
+CODE_LINE_END = re.compile(r"[;{}]\s*$", re.M)
+
+
+# Java-like snippets only: YAML/XML configs and prose "examples" are skipped
+def looks_like_code(text):
+    text = text.strip()
+    return not text.startswith("<") and "(" in text and bool(CODE_LINE_END.search(text))
+
+
+def role(field):
+    if field.lower() in PROBLEMATIC_FIELDS:
+        return "problematic"
+    if field.lower() in RECOMMENDED_FIELDS:
+        return "recommended"
+    return "example"
+
+
+def is_code_example(field, text):
+    if field.lower() not in CODE_FIELDS:
+        return False
+    if role(field) != "example":
+        # One half of an old/new pair may be a bare declaration without "("
+        return not text.strip().startswith("<") and bool(CODE_LINE_END.search(text))
+    return looks_like_code(text)
+
+
+# Snippets are stored either as one string or as a list of lines
+def text_value(value):
+    if isinstance(value, str):
+        return value
+    if isinstance(value, list) and value and all(isinstance(v, str) for v in value):
+        return "\n".join(value)
+    return None
+
+
+def explanation(node):
+    fields = {key.lower(): value for key, value in node.items()}
+    for field in EXPLANATION_FIELDS:
+        value = fields.get(field)
+        if isinstance(value, str) and value.strip() and not looks_like_code(value):
+            return value.strip()
+    return None
+
+
+# A method header stored apart from its body ("Method": "... {",
+# "Implementation": [lines]) is one example
+def code_fields(node):
+    fields = {key: text_value(value) for key, value in node.items()}
+    keys = {key.lower(): key for key in node}
+    method, body = keys.get("method"), keys.get("implementation")
+    if method and body and fields[method] and fields[body] and fields[method].rstrip().endswith("{"):
+        body_lines = "\n".join("    " + line for line in fields[body].splitlines())
+        fields[method] = f"{fields[method].rstrip()}\n{body_lines}\n}}"
+        fields[body] = None
+    return fields
+
+
+# 1. Collect the code examples of DataSet.json with their topic and the
+#    nearest recommendation/description they illustrate
+def extract_code_examples(data):
+    examples = []
+
+    def walk(node, path, explanations):
+        if isinstance(node, list):
+            for i, child in enumerate(node):
+                walk(child, path + [str(i)], explanations)
+            return
+        if not isinstance(node, dict):
+            return
+
+        own = explanation(node)
+        explanations = [own] + explanations if own else explanations
+        texts = code_fields(node)
+        for key, value in node.items():
+            if text_value(value) is None:
+                walk(value, path + [key], explanations)
+            elif texts[key] is not None and is_code_example(key, texts[key]):
+                key_path = "/".join(path + [key])
+                examples.append({
+                    "id": "code_" + hashlib.sha256(key_path.encode("utf-8")).hexdigest()[:16],
+                    "code": texts[key].strip(),
+                    "topic": path[0] if path else key,
+                    "role": role(key),
+                    "recommendation": explanations[0] if explanations else "",
+                    "path": key_path
+                })
+
+    walk(data, [], [])
+    return examples
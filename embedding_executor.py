@@ -0,0 +1,161 @@
+import os
+import queue
+import threading
+import time
+import traceback
+from collections import deque
+
+import numpy as np
+
+# Torch intra-op threads for request-time embedding (0 = torch default);
+# keep it small so Ollama keeps its cores
+EMBEDDING_THREADS = int(os.environ.get("EMBEDDING_THREADS", "2"))
+# How long the executor waits for more concurrent encode calls to batch
+EMBEDDING_BATCH_WINDOW_MS = float(os.environ.get("EMBEDDING_BATCH_WINDOW_MS", "2"))
+EMBEDDING_MAX_BATCH = int(os.environ.get("EMBEDDING_MAX_BATCH", "64"))
+WAIT_SAMPLES = 1000
+
+
+class _EncodeRequest:
+    def __init__(self, texts, kwargs):
+        self.texts = texts
+        self.kwargs = kwargs
+        self.enqueued = time.perf_counter()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+# One thread owns the encoder: concurrent encode() calls from request
+# threads are queued and run as micro-batches (one forward pass each)
+# instead of each spinning up its own torch thread pool
+class EmbeddingExecutor:
+    def __init__(self, encoder, window_ms=EMBEDDING_BATCH_WINDOW_MS, max_batch=EMBEDDING_MAX_BATCH,
+                 threads=EMBEDDING_THREADS):
+        self.encoder = encoder
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.threads = threads
+        self.queue = queue.Queue()
+        self.carry = deque()
+        self.lock = threading.Lock()
+        self.thread = None
+        self.waits = deque(maxlen=WAIT_SAMPLES)
+        self.counters = {"requests": 0, "batches": 0, "texts": 0, "encode_seconds": 0.0}
+
+    @property
+    def signature(self):
+        return self.encoder.signature
+
+    def encode(self, texts, **kwargs):
+        single = isinstance(texts, str)
+        request = _EncodeRequest([texts] if single else list(texts), kwargs)
+        if not request.texts:
+            return self.encoder.encode(request.texts, **kwargs)
+
+        # Started on first use, so a forked worker gets its own thread
+        self.start()
+        self.queue.put(request)
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.result[0] if single else request.result
+
+    def next_request(self, timeout=None):
+        if self.carry:
+            return self.carry.popleft()
+        return self.queue.get(timeout=timeout)
+
+    def collect(self):
+        first = self.next_request()
+        batch = [first]
+        size = len(first.texts)
+        deadline = time.perf_counter() + self.window
+        skipped = []
+        while size < self.max_batch:
+            try:
+                request = self.next_request(timeout=max(deadline - time.perf_counter(), 0))
+            except queue.Empty:
+                break
+            # Only calls with the same encode options share a forward pass
+            if request.kwargs != first.kwargs or size + len(request.texts) > self.max_batch:
+                skipped.append(request)
+                break
+            batch.append(request)
+            size += len(request.texts)
+        self.carry.extend(skipped)
+        return batch
+
+    def run_batch(self, batch):
+        started = time.perf_counter()
+        texts = [text for request in batch for text in request.texts]
+        try:
+            vectors = np.asarray(self.encoder.encode(texts, **batch[0].kwargs))
+            offset = 0
+            for request in batch:
+                request.result = vectors[offset:offset + len(request.texts)]
+                offset += len(request.texts)
+        except Exception as e:
+            for request in batch:
+                request.error = e
+
+        finished = time.perf_counter()
+        with self.lock:
+            self.waits.extend(started - request.enqueued for request in batch)
+            self.counters["requests"] += len(batch)
+            self.counters["batches"] += 1
+            self.counters["texts"] += len(texts)
+            self.counters["encode_seconds"] += finished - started
+        for request in batch:
+            request.done.set()
+
+    def run(self):
+        if self.threads:
+            try:
+                import torch
+                torch.set_num_threads(self.threads)
+            except ImportError:
+                pass
+        while True:
+            try:
+                self.run_batch(self.collect())
+            except Exception:
+                traceback.print_exc()
+
+    def start(self):
+        if self.thread is not None:
+            return
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name="embedding-executor", daemon=True)
+                self.thread.start()
+
+    # A forked worker inherits the parent's executor without its thread
+    # (and maybe with a lock held mid-stats), so it starts from scratch
+    def after_fork(self):
+        self.queue = queue.Queue()
+        self.carry = deque()
+        self.lock = threading.Lock()
+        self.thread = None
+        self.waits.clear()
+        self.counters = {"requests": 0, "batches": 0, "texts": 0, "encode_seconds": 0.0}
+
+    def stats(self):
+        with self.lock:
+            waits = sorted(self.waits)
+            counters = dict(self.counters)
+        batches = counters["batches"] or 1
+        return {
+            "signature": self.signature,
+            "threads": self.threads,
+            "queued": self.queue.qsize() + len(self.carry),
+            "requests": counters["requests"],
+            "batches": counters["batches"],
+            "avg_batch_texts": round(counters["texts"] / batches, 2),
+            "avg_encode_ms": round(counters["encode_seconds"] * 1000 / batches, 2),
+            "queue_wait_ms": {
+                "avg": round(sum(waits) * 1000 / len(waits), 2) if waits else 0.0,
+                "p95": round(waits[int(len(waits) * 0.95)] * 1000, 2) if waits else 0.0,
+                "max": round(waits[-1] * 1000, 2) if waits else 0.0
+            }
+        }
@@ -0,0 +1,93 @@
+import os
+
+# Embedding backend: "torch" (sentence-transformers, default) or "onnx"
+# (ONNX Runtime, int8 quantized by default), e.g. EMBEDDING_BACKEND=onnx
+EMBEDDING_BACKEND = os.environ.get("EMBEDDING_BACKEND", "torch")
+ONNX_MODEL_FILE = os.environ.get("ONNX_MODEL_FILE", "onnx/model_qint8_avx2.onnx")
+
+
+def encoder_signature(model_name, backend, file_name=ONNX_MODEL_FILE):
+    if backend == "onnx":
+        return f"{model_name}:{backend}:{file_name}"
+    return f"{model_name}:{backend}"
+
+
+# Common interface of the embedding backends: encode() behaves like
+# SentenceTransformer.encode, signature identifies the vector space
+class Encoder:
+    backend = None
+
+    def __init__(self, model_name):
+        self.model_name = model_name
+        self.model = self.load()
+
+    def load(self):
+        raise NotImplementedError
+
+    @property
+    def signature(self):
+        return encoder_signature(self.model_name, self.backend)
+
+    def encode(self, texts, **kwargs):
+        return self.model.encode(texts, **kwargs)
+
+
+class TorchEncoder(Encoder):
+    backend = "torch"
+
+    def load(self):
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(self.model_name, device="cpu")
+
+
+# Same model exported to ONNX; the int8 file trades a little accuracy for
+# a faster CPU encode, so its vectors get their own signature
+class OnnxEncoder(Encoder):
+    backend = "onnx"
+
+    def __init__(self, model_name, file_name=ONNX_MODEL_FILE):
+        self.file_name = file_name
+        super().__init__(model_name)
+
+    def load(self):
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(
+            self.model_name,
+            device="cpu",
+            backend="onnx",
+            model_kwargs={"file_name": self.file_name, "provider": "CPUExecutionProvider"}
+        )
+
+    @property
+    def signature(self):
+        return encoder_signature(self.model_name, self.backend, self.file_name)
+
+
+ENCODERS = {"torch": TorchEncoder, "onnx": OnnxEncoder}
+
+
+def load_encoder(model_name, backend=EMBEDDING_BACKEND):
+    try:
+        encoder = ENCODERS[backend](model_name)
+    except Exception as e:
+        if backend == "torch":
+            raise
+        print(f"❌ Could not load {backend} encoder for {model_name} ({e}), falling back to torch")
+        encoder = TorchEncoder(model_name)
+    print(f"DEBUG: Embedding with {encoder.signature}")
+    return encoder
+
+
+# Open a collection for an encoder signature; a collection embedded with
+# another encoder (or before signatures were recorded) is dropped so that
+# the ingestion re-indexes it instead of mixing vector spaces
+def open_collection(client, name, signature):
+    collection = client.get_or_create_collection(name)
+    stored = (collection.metadata or {}).get("embedding")
+    if stored == signature:
+        return collection
+
+    if collection.count():
+        print(f"⚠️ Collection {name} was embedded with {stored}, re-indexing for {signature}")
+    client.delete_collection(name)
+    return client.create_collection(name, metadata={"embedding": signature})
@@ -0,0 +1,335 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# --- Structured Summary (summary + decomposition in one generation) ---
+# Shared by /summarize and the bulk pipeline below
+SUMMARY_FIELDS = ["problem", "impact", "rootCause", "fix"]
+
+DECOMPOSE_SCHEMA = {
+    "type": "object",
+    "properties": {field: {"type": "string"} for field in SUMMARY_FIELDS},
+    "required": SUMMARY_FIELDS,
+}
+
+SUMMARY_SCHEMA = {
+    "type": "object",
+    "properties": {"summary": {"type": "string"}, **DECOMPOSE_SCHEMA["properties"]},
+    "required": ["summary"] + SUMMARY_FIELDS,
+}
+
+SUMMARY_TIMEOUT = 60
+
+# Bulk summarization: incidents summarized at once (each is one Ollama
+# generation, so this bounds the load put on the backends)
+INCIDENT_WORKERS = int(os.environ.get("INCIDENT_WORKERS", "4"))
+INCIDENT_MODEL = os.environ.get("INCIDENT_MODEL", "llama3")
+# Results are written back to the workbook as this sheet, and read from it
+# into the KB; the sheet itself is never read as input
+INCIDENT_SHEET = "Incident Summaries"
+HEADER_SEARCH_ROWS = 5
+
+# Column headers accepted for each field, compared without case/spaces/punctuation
+INCIDENT_COLUMNS = {
+    "problem": ["problem", "problem statement", "issue"],
+    "impact": ["impact", "impact of problem"],
+    "rootCause": ["root cause", "rootcause", "cause"],
+    "fix": ["fix", "fix of problem", "resolution", "solution"]
+}
+
+OUTPUT_COLUMNS = ["Id", "Occurrences", "Problem", "Impact", "Root Cause", "Fix", "Summary",
+                  "Summary Problem", "Summary Impact", "Summary Root Cause", "Summary Fix"]
+
+
+def summary_prompt(data):
+    return (
+        f"The following describes a performance issue:\n"
+        f"Problem: {data['problem']}\n"
+        f"Impact: {data['impact']}\n"
+        f"Root Cause: {data['rootCause']}\n"
+        f"Fix: {data['fix']}\n\n"
+        f"Return a JSON object with:\n"
+        f"- summary: this issue summarized in 5 lines\n"
+        f"- problem, impact, rootCause, fix: one concise sentence each, "
+        f"as they should be extracted back from that summary."
+    )
+
+
+def structured_payload(model, prompt, schema):
+    # Ollama constrains decoding to the JSON schema passed in "format"
+    return {
+        "model": model,
+        "prompt": prompt,
+        "format": schema,
+        "stream": False,
+        "options": {"temperature": 0}
+    }
+
+
+def validate_structured_output(text, schema):
+    data = json.loads(text)
+    if not isinstance(data, dict):
+        raise ValueError("Structured output is not a JSON object")
+
+    parsed = {}
+    for field in schema["required"]:
+        value = data.get(field)
+        if not isinstance(value, str) or not value.strip():
+            raise ValueError(f"Structured output is missing field '{field}'")
+        parsed[field] = value.strip()
+    return parsed
+
+
+# 1. Incident rows of every sheet that has all four columns; the header may
+#    sit below a description row
+def normalize_header(value):
+    return re.sub(r"[^a-z0-9]", "", str(value).lower())
+
+
+COLUMN_FIELDS = {normalize_header(name): field for field, names in INCIDENT_COLUMNS.items() for name in names}
+
+
+def find_incident_header(cells):
+    columns = {}
+    for i, value in enumerate(cells):
+        field = COLUMN_FIELDS.get(normalize_header(value))
+        if field and field not in columns:
+            columns[field] = i
+    return columns if len(columns) == len(SUMMARY_FIELDS) else None
+
+
+def clean(value):
+    return " ".join(str(value).split())
+
+
+def read_incidents(excel_path):
+    import pandas as pd
+    records = []
+    for sheet, df in pd.read_excel(excel_path, sheet_name=None, header=None).items():
+        if sheet == INCIDENT_SHEET:
+            continue
+        found = None
+        for start in range(min(HEADER_SEARCH_ROWS, len(df))):
+            found = find_incident_header(df.iloc[start])
+            if found:
+                break
+        if not found:
+            print(f"⚠️ Sheet '{sheet}' has no Problem/Impact/Root Cause/Fix header, skipped")
+            continue
+        for offset, row in enumerate(df.iloc[start + 1:].itertuples(index=False)):
+            values = {field: row[i] for field, i in found.items()}
+            if any(pd.isna(v) or not str(v).strip() for v in values.values()):
+                continue
+            record = {field: clean(v) for field, v in values.items()}
+            # Spreadsheet row number, for people tracing a summary back
+            record["source"] = f"{sheet}!{start + offset + 2}"
+            records.append(record)
+    return records
+
+
+# 2. Identical incidents (same four fields after whitespace cleanup) are
+#    summarized once; the id also keys the checkpoint across runs
+def incident_id(record):
+    raw = "\n".join(record[field] for field in SUMMARY_FIELDS).encode("utf-8")
+    return "inc_" + hashlib.sha256(raw).hexdigest()[:16]
+
+
+def dedup_incidents(records):
+    unique = {}
+    for record in records:
+        key = incident_id(record)
+        if key in unique:
+            unique[key]["occurrences"].append(record["source"])
+        else:
+            unique[key] = dict({field: record[field] for field in SUMMARY_FIELDS}, id=key,
+                               occurrences=[record["source"]])
+    return list(unique.values())
+
+
+# 3. Checkpoint: one JSON line per finished incident, appended as soon as
+#    it is summarized; a line cut short by a crash is ignored on load
+def load_checkpoint(path):
+    done = {}
+    if not os.path.exists(path):
+        return done
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            done[entry["id"]] = entry
+    return done
+
+
+class Checkpoint:
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.done = load_checkpoint(path)
+        self.file = None
+
+    def __contains__(self, incident_id):
+        return incident_id in self.done
+
+    def add(self, entry):
+        with self.lock:
+            if self.file is None:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                self.file = open(self.path, "a+", encoding="utf-8")
+                # Start on a fresh line after one cut short by a crash
+                if self.file.tell():
+                    self.file.seek(self.file.tell() - 1)
+                    if self.file.read(1) != "\n":
+                        self.file.write("\n")
+            self.file.write(json.dumps(entry) + "\n")
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.done[entry["id"]] = entry
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+
+# 4. Summarize the incidents the checkpoint does not hold yet, workers at
+#    a time. A failed incident is reported and left out of the checkpoint,
+#    so the next run retries it.
+def summarize_incidents(incidents, summarize, checkpoint, workers=INCIDENT_WORKERS):
+    start = time.time()
+    todo = [incident for incident in incidents if incident["id"] not in checkpoint]
+    report = {"incidents": len(incidents), "skipped": len(incidents) - len(todo), "summarized": 0, "failed": 0}
+    print(f"DEBUG: Summarizing {len(todo)} incidents ({report['skipped']} already done) with {workers} workers")
+
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="incident") as pool:
+        futures = {pool.submit(summarize, {field: i[field] for field in SUMMARY_FIELDS}): i for i in todo}
+        for future in as_completed(futures):
+            incident = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                report["failed"] += 1
+                print(f"❌ Incident {incident['id']} ({incident['occurrences'][0]}) failed: {e}")
+                continue
+            checkpoint.add({"id": incident["id"], "input": {field: incident[field] for field in SUMMARY_FIELDS},
+                            "result": result})
+            report["summarized"] += 1
+            done = report["summarized"] + report["failed"]
+            if done % 50 == 0:
+                print(f"DEBUG: {done}/{len(todo)} incidents processed")
+
+    report["seconds"] = round(time.time() - start, 3)
+    return report
+
+
+# 5. One output row per distinct incident of this run that has a summary
+def summary_rows(incidents, checkpoint):
+    rows = []
+    for incident in incidents:
+        entry = checkpoint.done.get(incident["id"])
+        if entry is None:
+            continue
+        result = entry["result"]
+        rows.append([
+            incident["id"], "; ".join(incident["occurrences"]),
+            incident["problem"], incident["impact"], incident["rootCause"], incident["fix"],
+            result["summary"], result["problem"], result["impact"], result["rootCause"], result["fix"]
+        ])
+    return rows
+
+
+def write_summaries(rows, excel_path, parquet_path=None):
+    import pandas as pd
+    df = pd.DataFrame(rows, columns=OUTPUT_COLUMNS)
+    with pd.ExcelWriter(excel_path, engine="openpyxl", mode="a", if_sheet_exists="replace") as writer:
+        df.to_excel(writer, sheet_name=INCIDENT_SHEET, index=False)
+    print(f"✅ Wrote {len(df)} incident summaries to sheet '{INCIDENT_SHEET}' of {excel_path}")
+    if parquet_path:
+        # Parquet is optional; without pyarrow only the sheet is written
+        try:
+            df.to_parquet(parquet_path + ".tmp", index=False, engine="pyarrow")
+            os.replace(parquet_path + ".tmp", parquet_path)
+            print(f"✅ Wrote {parquet_path}")
+        except ImportError:
+            print("⚠️ pyarrow is not installed, Parquet output skipped")
+
+
+# 6. KB entries: each summarized incident becomes an observation (what
+#    went wrong and why) with the fix as its recommendation
+def read_incident_summaries(excel_path, language="java"):
+    import pandas as pd
+    try:
+        df = pd.read_excel(excel_path, sheet_name=INCIDENT_SHEET)
+    except ValueError:
+        return []  # no summaries written yet
+    rows = []
+    for row in df.to_dict("records"):
+        if any(pd.isna(row.get(c)) for c in ("Summary Problem", "Summary Root Cause", "Summary Fix")):
+            continue
+        rows.append({
+            "observation": clean(f"{row['Summary Problem']} Root cause: {row['Summary Root Cause']}"),
+            "recommendation": clean(row["Summary Fix"]),
+            "topic": "Incidents",
+            "source": "incident",
+            "summary": str(row["Summary"]),
+            "language": language
+        })
+    return rows
+
+
+def ollama_summarizer(model=INCIDENT_MODEL):
+    from ollama_client import OllamaClient
+    client = OllamaClient()
+
+    def summarize(data):
+        result = client.generate(structured_payload(model, summary_prompt(data), SUMMARY_SCHEMA), timeout=SUMMARY_TIMEOUT)
+        return validate_structured_output(result.get("response", ""), SUMMARY_SCHEMA)
+    return summarize
+
+
+def run_pipeline(excel_path, summarize, checkpoint_path=None, parquet_path=None, workers=INCIDENT_WORKERS):
+    checkpoint_path = checkpoint_path or os.path.splitext(excel_path)[0] + ".incidents.jsonl"
+    records = read_incidents(excel_path)
+    incidents = dedup_incidents(records)
+    checkpoint = Checkpoint(checkpoint_path)
+    try:
+        report = summarize_incidents(incidents, summarize, checkpoint, workers)
+    finally:
+        checkpoint.close()
+    rows = summary_rows(incidents, checkpoint)
+    if rows:
+        write_summaries(rows, excel_path, parquet_path)
+    report.update(records=len(records), duplicates=len(records) - len(incidents), written=len(rows))
+    print(f"✅ Incidents: {report['records']} rows, {report['duplicates']} duplicates, {report['skipped']} from the "
+          f"checkpoint, {report['summarized']} summarized, {report['failed']} failed in {report['seconds']}s")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize the Problem/Impact/Root Cause/Fix incidents of a workbook")
+    parser.add_argument("excel", help="workbook to read; the summaries are written back as a new sheet")
+    parser.add_argument("--checkpoint", help="JSONL of finished incidents (default: next to the workbook)")
+    parser.add_argument("--parquet", help="also write the summaries to this Parquet file")
+    parser.add_argument("--workers", type=int, default=INCIDENT_WORKERS)
+    parser.add_argument("--model", default=INCIDENT_MODEL)
+    args = parser.parse_args()
+
+    try:
+        report = run_pipeline(args.excel, ollama_summarizer(args.model), args.checkpoint, args.parquet, args.workers)
+    except Exception as e:
+        print(f"❌ Incident summarization failed: {e}")
+        traceback.print_exc()
+        raise SystemExit(1)
+    raise SystemExit(1 if report["failed"] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+import os
+import queue
+import threading
+import time
+
+from knowledge_base import HEADER_SEARCH_ROWS, clean, observation_records, write_records
+
+# Rows per batch and batches allowed between two stages; a full queue
+# blocks the stage before it, so memory stays bounded by
+# (INGEST_QUEUE_DEPTH x 2 + 3) x INGEST_BATCH_ROWS rows whatever the workbook size
+INGEST_BATCH_ROWS = int(os.environ.get("INGEST_BATCH_ROWS", "256"))
+INGEST_QUEUE_DEPTH = int(os.environ.get("INGEST_QUEUE_DEPTH", "4"))
+
+_DONE = object()
+
+
+def find_header(cells):
+    names = [str(c).strip().lower() if c is not None else "" for c in cells]
+    if "observation" in names and "recommendation" in names:
+        return names.index("observation"), names.index("recommendation")
+    return None
+
+
+# 1. Read Observation/Recommendation rows sheet by sheet in openpyxl's
+#    read-only mode (rows are streamed from the file, never loaded whole)
+def stream_rows(excel_path, batch_rows=INGEST_BATCH_ROWS):
+    from openpyxl import load_workbook
+    workbook = load_workbook(excel_path, read_only=True, data_only=True)
+    try:
+        batch = []
+        for sheet in workbook.worksheets:
+            columns = None
+            for n, cells in enumerate(sheet.iter_rows(values_only=True)):
+                if columns is None:
+                    columns = find_header(cells)
+                    if columns is None and n >= HEADER_SEARCH_ROWS:
+                        print(f"⚠️ Sheet '{sheet.title}' has no Observation/Recommendation header, skipped")
+                        break
+                    continue
+                obs_col, rec_col = columns
+                obs = cells[obs_col] if obs_col < len(cells) else None
+                rec = cells[rec_col] if rec_col < len(cells) else None
+                if obs is None or rec is None or not str(obs).strip() or not str(rec).strip():
+                    continue
+                batch.append({"observation": clean(obs), "recommendation": clean(rec), "topic": sheet.title})
+                if len(batch) >= batch_rows:
+                    yield batch
+                    batch = []
+        if batch:
+            yield batch
+    finally:
+        workbook.close()
+
+
+class _Stage(threading.Thread):
+    def __init__(self, name, fn, inbox, outbox, pipeline):
+        super().__init__(name=f"ingest-{name}", daemon=True)
+        self.fn = fn
+        self.inbox = inbox
+        self.outbox = outbox
+        self.pipeline = pipeline
+        self.busy = 0.0
+
+    def run(self):
+        try:
+            for item in iter(self.inbox.get, _DONE):
+                if self.pipeline.error is not None:
+                    continue  # drain so upstream stages are not blocked
+                start = time.perf_counter()
+                result = self.fn(item)
+                self.busy += time.perf_counter() - start
+                if self.outbox is not None:
+                    self.outbox.put(result)
+        except Exception as e:
+            self.pipeline.fail(e)
+            for _ in iter(self.inbox.get, _DONE):
+                pass
+        finally:
+            if self.outbox is not None:
+                self.outbox.put(_DONE)
+
+
+# 2. read -> embed -> write, each stage in its own thread connected by
+#    bounded queues, so parsing, encoding and DB writes overlap
+class StreamingIngest:
+    def __init__(self, collection, encode, batch_rows=INGEST_BATCH_ROWS, queue_depth=INGEST_QUEUE_DEPTH):
+        self.collection = collection
+        self.encode = encode
+        self.batch_rows = batch_rows
+        self.queue_depth = queue_depth
+        self.error = None
+        self.rows = 0
+        self.batches = 0
+
+    def fail(self, error):
+        if self.error is None:
+            self.error = error
+
+    def embed(self, rows):
+        records = observation_records(rows)
+        return records, self.encode([r["document"] for r in records])
+
+    def write(self, item):
+        records, vectors = item
+        write_records(self.collection, records, vectors)
+        self.rows += len(records)
+        self.batches += 1
+        if self.batches % 10 == 0:
+            print(f"DEBUG: Ingested {self.rows} rows...", flush=True)
+
+    def run(self, batches):
+        start = time.perf_counter()
+        parsed = queue.Queue(maxsize=self.queue_depth)
+        embedded = queue.Queue(maxsize=self.queue_depth)
+        stages = [
+            _Stage("embed", self.embed, parsed, embedded, self),
+            _Stage("write", self.write, embedded, None, self)
+        ]
+        for stage in stages:
+            stage.start()
+
+        read_busy = 0.0
+        try:
+            batches = iter(batches)
+            while self.error is None:
+                t = time.perf_counter()
+                batch = next(batches, None)
+                read_busy += time.perf_counter() - t
+                if batch is None:
+                    break
+                parsed.put(batch)
+        except Exception as e:
+            self.fail(e)
+        finally:
+            parsed.put(_DONE)
+            for stage in stages:
+                stage.join()
+
+        if self.error is not None:
+            raise self.error
+        report = {
+            "rows": self.rows,
+            "batches": self.batches,
+            "seconds": round(time.perf_counter() - start, 3),
+            "busy_seconds": {
+                "read": round(read_busy, 3),
+                "embed": round(stages[0].busy, 3),
+                "write": round(stages[1].busy, 3)
+            }
+        }
+        print(f"✅ Streamed {report['rows']} rows in {report['seconds']}s (stage busy time {report['busy_seconds']})", flush=True)
+        return report
+
+
+def stream_ingest(excel_path, collection, encode, batch_rows=INGEST_BATCH_ROWS, queue_depth=INGEST_QUEUE_DEPTH):
+    pipeline = StreamingIngest(collection, encode, batch_rows, queue_depth)
+    return pipeline.run(stream_rows(excel_path, batch_rows))
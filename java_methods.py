@@ -0,0 +1,187 @@
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+
+METHOD_HEADER = re.compile(r"(\w+)\s*\([^()]*(?:\([^()]*\)[^()]*)*\)\s*(?:throws\s+[\w.,\s]+)?$")
+NOT_METHODS = {"if", "for", "while", "switch", "catch", "synchronized", "try", "do", "else", "return", "new"}
+TYPE_KEYWORDS = re.compile(r"\b(class|interface|enum|record)\b")
+
+MAX_CACHED_METHODS = 5000
+
+
+# 1. Split Java source into code, comment and literal (string/char/text
+#    block) segments, so braces and "//" inside literals are not misread
+def scan_segments(source):
+    segments = []
+    code_start = 0
+    i, n = 0, len(source)
+    while i < n:
+        c = source[i]
+        if source.startswith("//", i):
+            kind = "comment"
+            end = source.find("\n", i)
+            end = n if end == -1 else end
+        elif source.startswith("/*", i):
+            kind = "comment"
+            end = source.find("*/", i + 2)
+            end = n if end == -1 else end + 2
+        elif source.startswith('"""', i):
+            kind = "literal"
+            end = source.find('"""', i + 3)
+            end = n if end == -1 else end + 3
+        elif c in "\"'":
+            kind = "literal"
+            end = i + 1
+            while end < n and source[end] != c and source[end] != "\n":
+                end += 2 if source[end] == "\\" else 1
+            end = min(end + 1, n)
+        else:
+            i += 1
+            continue
+        if code_start < i:
+            segments.append(("code", source[code_start:i]))
+        segments.append((kind, source[i:end]))
+        i = code_start = end
+    if code_start < n:
+        segments.append(("code", source[code_start:]))
+    return segments
+
+
+# Blank out comments and literals, keeping offsets, for brace matching
+def mask_literals(source):
+    return "".join(
+        text if kind == "code" else "".join("\n" if ch == "\n" else " " for ch in text)
+        for kind, text in scan_segments(source)
+    )
+
+
+# Drop comments and whitespace differences outside literals; literal
+# contents are kept verbatim so edits to them change the fingerprint
+def normalize_code(code):
+    tokens = []
+    for kind, text in scan_segments(code):
+        if kind == "code":
+            tokens.extend(text.split())
+        elif kind == "literal":
+            tokens.append(text)
+    return " ".join(tokens)
+
+
+def fingerprint(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+# 2. Split a Java source into the methods of its top-level types and the
+#    remaining class skeleton (imports, fields, declarations)
+def split_methods(source):
+    masked = mask_literals(source)
+    methods = []
+    depth = 0
+    type_depths = []
+    member_start = 0
+
+    i = 0
+    while i < len(masked):
+        c = masked[i]
+        if c == "{":
+            header = masked[member_start:i].strip()
+            if depth == 1 and type_depths == [0] and not TYPE_KEYWORDS.search(header) and "=" not in top_level(header):
+                m = METHOD_HEADER.search(header)
+                if m and m.group(1) not in NOT_METHODS:
+                    end = matching_brace(masked, i)
+                    start = member_start + (len(masked[member_start:i]) - len(masked[member_start:i].lstrip()))
+                    text = source[start:end + 1]
+                    methods.append({
+                        "name": m.group(1),
+                        "start": start,
+                        "end": end + 1,
+                        "text": text,
+                        "fingerprint": fingerprint(normalize_code(text))
+                    })
+                    i = end + 1
+                    member_start = i
+                    continue
+            if TYPE_KEYWORDS.search(header):
+                type_depths.append(depth)
+            depth += 1
+            member_start = i + 1
+        elif c == "}":
+            depth -= 1
+            if type_depths and type_depths[-1] == depth:
+                type_depths.pop()
+            member_start = i + 1
+        elif c == ";":
+            member_start = i + 1
+        i += 1
+
+    skeleton = source
+    for m in reversed(methods):
+        skeleton = skeleton[:m["start"]] + f"/* method {m['name']} */" + skeleton[m["end"]:]
+    return methods, skeleton
+
+
+# The header without its parenthesized parts: an "=" left over is a field
+# initializer, one inside @Transactional(readOnly = true) is not
+def top_level(header):
+    depth = 0
+    kept = []
+    for c in header:
+        if c == "(":
+            depth += 1
+        elif c == ")":
+            depth = max(depth - 1, 0)
+        elif depth == 0:
+            kept.append(c)
+    return "".join(kept)
+
+
+def matching_brace(masked, open_index):
+    depth = 0
+    for i in range(open_index, len(masked)):
+        if masked[i] == "{":
+            depth += 1
+        elif masked[i] == "}":
+            depth -= 1
+            if depth == 0:
+                return i
+    return len(masked) - 1
+
+
+def context_fingerprint(skeleton, *extra):
+    return fingerprint("\n".join([normalize_code(skeleton), *map(str, extra)]))
+
+
+# 3. Findings per (method fingerprint, context fingerprint)
+class MethodResultCache:
+    def __init__(self, max_entries=MAX_CACHED_METHODS):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, method_fp, context_fp):
+        with self.lock:
+            result = self.entries.get((method_fp, context_fp))
+            if result is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.entries.move_to_end((method_fp, context_fp))
+            return result
+
+    def put(self, method_fp, context_fp, result):
+        with self.lock:
+            self.entries[(method_fp, context_fp)] = result
+            self.entries.move_to_end((method_fp, context_fp))
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            return {"entries": len(self.entries), "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,597 @@
+import argparse
+import hashlib
+import json
+import math
+import os
+import re
+import threading
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from multiprocessing import get_context
+
+import numpy as np
+
+from code_examples import extract_code_examples
+from encoders import EMBEDDING_BACKEND, ENCODERS, encoder_signature
+from incident_summaries import read_incident_summaries
+from topics import topic_flags, topic_ids
+
+# Processes used to embed a bulk build (1 = embed in this process); the
+# command line build defaults to one per core
+KB_BUILD_WORKERS = int(os.environ.get("KB_BUILD_WORKERS", "1"))
+EMBED_BATCH_SIZE = 64
+# Chroma rejects very large add/upsert calls
+WRITE_BATCH_SIZE = 1000
+HEADER_SEARCH_ROWS = 5
+# Observations whose character-shingle Jaccard similarity reaches this are
+# collapsed into one entry (0 disables)
+DEDUP_THRESHOLD = float(os.environ.get("KB_DEDUP_THRESHOLD", "0.8"))
+SHINGLE_SIZE = 5
+
+
+# Every record is tagged with the language it applies to; queries filter on it
+LANGUAGES = ("java", "python", "javascript")
+
+
+def clean(text):
+    return str(text).replace("\n", " ").strip()
+
+
+# 1. Observation/Recommendation rows of every sheet; some sheets start with a
+#    description row, so the header is looked up in the first few rows
+def header_row(df):
+    for i in range(min(HEADER_SEARCH_ROWS, len(df))):
+        cells = [str(c).strip().lower() for c in df.iloc[i]]
+        if "observation" in cells and "recommendation" in cells:
+            return i, cells.index("observation"), cells.index("recommendation")
+    return None
+
+
+def read_observation_sheets(excel_path, language="java"):
+    import pandas as pd
+    rows = []
+    for sheet, df in pd.read_excel(excel_path, sheet_name=None, header=None).items():
+        found = header_row(df)
+        if found is None:
+            print(f"⚠️ Sheet '{sheet}' has no Observation/Recommendation header, skipped")
+            continue
+        start, obs_col, rec_col = found
+        for obs, rec in df.iloc[start + 1:, [obs_col, rec_col]].itertuples(index=False):
+            if pd.isna(obs) or pd.isna(rec):
+                continue
+            rows.append({"observation": clean(obs), "recommendation": clean(rec), "topic": sheet, "language": language})
+    return rows
+
+
+# 1b. Near-duplicate observations (the same advice repeated across sheets
+#     with small wording changes) become one canonical row whose metadata
+#     merges the sheets and recommendations of the whole cluster
+def shingles(text, size=SHINGLE_SIZE):
+    text = " ".join(re.findall(r"\w+", text.lower()))
+    if len(text) <= size:
+        return {text}
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+def near_duplicate_clusters(texts, threshold=DEDUP_THRESHOLD):
+    sets = [shingles(t) for t in texts]
+    parent = list(range(len(texts)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    # Jaccard >= t needs the smaller set to be at least t times the larger
+    order = sorted(range(len(texts)), key=lambda i: len(sets[i]))
+    for x, i in enumerate(order):
+        for j in order[x + 1:]:
+            if len(sets[i]) < threshold * len(sets[j]):
+                break
+            if find(i) != find(j) and jaccard(sets[i], sets[j]) >= threshold:
+                parent[find(j)] = find(i)
+
+    clusters = {}
+    for i in range(len(texts)):
+        clusters.setdefault(find(i), []).append(i)
+    return sorted(clusters.values(), key=lambda c: c[0])
+
+
+def unique(values):
+    return list(dict.fromkeys(v for v in values if v))
+
+
+def collapse_near_duplicates(rows, threshold=DEDUP_THRESHOLD):
+    if not threshold or not rows:
+        return list(rows), {"rows": len(rows), "kept": len(rows), "compression_ratio": 1.0}
+
+    # Advice is only merged within one language
+    partitions = {}
+    for row in rows:
+        partitions.setdefault(row.get("language", "java"), []).append(row)
+
+    collapsed = []
+    for language, part in partitions.items():
+        for cluster in near_duplicate_clusters([r["observation"] for r in part], threshold):
+            collapsed.append(merge_cluster([part[i] for i in cluster], language))
+
+    report = {
+        "rows": len(rows),
+        "kept": len(collapsed),
+        "compression_ratio": round(len(rows) / len(collapsed), 3)
+    }
+    print(f"DEBUG: Collapsed {report['rows']} observations into {report['kept']} "
+          f"(compression ratio {report['compression_ratio']})")
+    return collapsed, report
+
+
+def merge_cluster(members, language):
+    # The most detailed wording is kept as the canonical observation
+    canonical = max(members, key=lambda r: len(r["observation"]))
+    row = {
+        "observation": canonical["observation"],
+        "recommendation": "\n".join(unique(r["recommendation"] for r in members)),
+        "topic": canonical.get("topic") or next((r.get("topic") for r in members if r.get("topic")), None),
+        "language": language
+    }
+    for field in ("source", "summary"):
+        if canonical.get(field):
+            row[field] = canonical[field]
+    if len(members) > 1:
+        row["topics"] = "; ".join(unique(r.get("topic") for r in members))
+        row["duplicates"] = len(members) - 1
+    return row
+
+
+# Ids come from the content, so the same row keeps its id whichever sheet
+# or workbook it is loaded from
+def observation_id(observation, recommendation):
+    raw = f"{observation}\n{recommendation}".encode("utf-8")
+    return "obs_" + hashlib.sha256(raw).hexdigest()[:16]
+
+
+def observation_records(rows):
+    records = {}
+    for row in rows:
+        record_id = observation_id(row["observation"], row["recommendation"])
+        if record_id in records:
+            continue
+        metadata = {"recommendation": row["recommendation"], "language": row.get("language", "java")}
+        for field in ("topic", "topics", "duplicates", "source", "summary"):
+            if row.get(field):
+                metadata[field] = row[field]
+        metadata.update(topic_flags(topic_ids(row.get("topic"), row.get("topics"))))
+        records[record_id] = {"id": record_id, "document": row["observation"], "metadata": metadata}
+    return list(records.values())
+
+
+def code_example_records(examples):
+    return [
+        {
+            "id": e["id"],
+            "document": e["code"],
+            "metadata": dict(
+                {"source": "code_example", "language": "java", "topic": e["topic"], "role": e["role"],
+                 "recommendation": e["recommendation"], "path": e["path"]},
+                **topic_flags(topic_ids(e["topic"]))
+            )
+        }
+        for e in examples
+    ]
+
+
+# 2. Embedding: shards of texts are encoded by a pool of processes, each
+#    with its own encoder and an equal share of the cores for torch
+_worker_encoder = None
+
+
+def threads_per_worker(workers, cpus=None):
+    return max(1, (cpus or os.cpu_count() or 1) // workers)
+
+
+def _init_worker(model_name, backend, threads):
+    global _worker_encoder
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+    os.environ["MKL_NUM_THREADS"] = str(threads)
+    os.environ["TOKENIZERS_PARALLELISM"] = "false"
+    import torch
+    torch.set_num_threads(threads)
+    torch.set_num_interop_threads(1)
+    _worker_encoder = ENCODERS[backend](model_name)
+
+
+def _encode_shard(texts):
+    return _worker_encoder.encode(texts, batch_size=EMBED_BATCH_SIZE)
+
+
+def shards(items, workers, min_size=EMBED_BATCH_SIZE):
+    # A few shards per worker keeps the pool busy when shard costs differ
+    size = max(min_size, math.ceil(len(items) / (workers * 4)))
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def embed_parallel(texts, model_name, backend=EMBEDDING_BACKEND, workers=KB_BUILD_WORKERS):
+    if not texts:
+        return np.zeros((0, 0))
+    threads = threads_per_worker(workers)
+    print(f"DEBUG: Embedding {len(texts)} texts with {workers} processes x {threads} threads")
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(model_name, backend, threads)
+    ) as pool:
+        # map() returns the shards in submission order
+        return np.vstack(list(pool.map(_encode_shard, shards(texts, workers))))
+
+
+# 3. Bulk writes
+def write_records(collection, records, vectors):
+    for i in range(0, len(records), WRITE_BATCH_SIZE):
+        batch = records[i:i + WRITE_BATCH_SIZE]
+        collection.upsert(
+            ids=[r["id"] for r in batch],
+            documents=[r["document"] for r in batch],
+            metadatas=[r["metadata"] for r in batch],
+            embeddings=[list(map(float, v)) for v in vectors[i:i + WRITE_BATCH_SIZE]]
+        )
+
+
+def embed_texts(texts, model_name, backend=EMBEDDING_BACKEND, workers=KB_BUILD_WORKERS, encode=None):
+    if not texts:
+        return []
+    if workers > 1:
+        return embed_parallel(texts, model_name, backend, workers)
+    encode = encode or ENCODERS[backend](model_name).encode
+    return encode(texts, batch_size=EMBED_BATCH_SIZE)
+
+
+def build_collection(collection, records, model_name, backend=EMBEDDING_BACKEND, workers=KB_BUILD_WORKERS, encode=None):
+    start = time.time()
+    vectors = embed_texts([r["document"] for r in records], model_name, backend, workers, encode)
+    write_records(collection, records, vectors)
+    print(f"✅ Indexed {len(records)} records into {collection.name} in {time.time() - start:.2f}s")
+    return vectors
+
+
+# Stored vectors of the records whose id and document are unchanged
+def reusable_vectors(collection, records):
+    documents = {r["id"]: r["document"] for r in records}
+    ids = list(documents)
+    vectors = {}
+    for i in range(0, len(ids), WRITE_BATCH_SIZE):
+        found = collection.get(ids=ids[i:i + WRITE_BATCH_SIZE], include=["documents", "embeddings"])
+        for record_id, document, vector in zip(found["ids"], found["documents"], found["embeddings"]):
+            if documents.get(record_id) == document and vector is not None:
+                vectors[record_id] = [float(x) for x in vector]
+    return vectors
+
+
+# 4. Blue/green versions: every build goes into a new collection named
+#    after its content ("java_feedback_v<hash>", Chroma names cannot hold
+#    "@"), is validated, then made current by atomically replacing a
+#    pointer file. Queries lease the current version, so a retired one is
+#    only dropped once its last in-flight query is done.
+def version_name(base, signature, records):
+    digest = hashlib.sha256(signature.encode("utf-8"))
+    for r in records:
+        digest.update(json.dumps([r["id"], r["document"], r["metadata"]], sort_keys=True).encode("utf-8"))
+    return f"{base}_v{digest.hexdigest()[:12]}"
+
+
+def collection_names(client):
+    # list_collections() returns names in recent Chroma, collections before
+    return [getattr(c, "name", c) for c in client.list_collections()]
+
+
+def write_pointer(path, pointer):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(pointer, f)
+    os.replace(tmp, path)
+
+
+def read_pointer(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+# With several processes serving one store, only the one that publishes
+# drops retired versions (drop_retired), and only retire_grace seconds
+# after retiring them, once the others have followed the pointer
+KB_RETIRE_GRACE = float(os.environ.get("KB_RETIRE_GRACE", "0"))
+
+
+class VersionedCollection:
+    def __init__(self, client, base, signature, store_path, drop_retired=True, retire_grace=KB_RETIRE_GRACE):
+        self.client = client
+        self.base = base
+        self.signature = signature
+        self.pointer_path = os.path.join(store_path, f"{base}.pointer.json")
+        self.drop_retired = drop_retired
+        self.retire_grace = retire_grace
+        self.lock = threading.Lock()
+        self.build_lock = threading.Lock()
+        self.active = None
+        self.retired = []
+        self.swaps = 0
+
+    # Open the version the pointer names, if it was built with our encoder
+    def load(self):
+        pointer = read_pointer(self.pointer_path)
+        if not pointer or pointer.get("signature") != self.signature:
+            return None
+        try:
+            collection = self.client.get_collection(pointer["name"])
+        except Exception as e:
+            print(f"⚠️ KB version {pointer['name']} is missing: {e}")
+            return None
+        with self.lock:
+            self.active = {"name": pointer["name"], "collection": collection, "leases": 0}
+        print(f"DEBUG: Serving KB version {pointer['name']} ({collection.count()} records)")
+        return pointer["name"]
+
+    # A forked worker cannot share the parent's SQLite handles: it opens
+    # its own client and reloads the current version through it
+    def reopen(self, client, drop_retired=None):
+        self.client = client
+        if drop_retired is not None:
+            self.drop_retired = drop_retired
+        self.lock = threading.Lock()
+        self.build_lock = threading.Lock()
+        self.active = None
+        self.retired = []
+        return self.load()
+
+    # Follow a version published by another process (e.g. knowledge_base.py)
+    def refresh(self):
+        pointer = read_pointer(self.pointer_path)
+        if not pointer or pointer.get("signature") != self.signature or pointer["name"] == self.current_name():
+            return False
+        self.activate(pointer["name"], self.client.get_collection(pointer["name"]))
+        return True
+
+    @contextmanager
+    def lease(self):
+        with self.lock:
+            version = self.active
+            if version is not None:
+                version["leases"] += 1
+        try:
+            yield version["collection"] if version else None
+        finally:
+            if version is not None:
+                with self.lock:
+                    version["leases"] -= 1
+                self.collect_garbage()
+
+    def current_name(self):
+        with self.lock:
+            return self.active["name"] if self.active else None
+
+    def in_use(self, name):
+        with self.lock:
+            return name == (self.active or {}).get("name") or any(v["name"] == name for v in self.retired)
+
+    def validate(self, collection, records, vectors):
+        if collection.count() != len(records):
+            raise ValueError(f"{collection.name} holds {collection.count()} records, expected {len(records)}")
+        if records:
+            # A stored vector must find itself
+            probe = collection.query(query_embeddings=[list(map(float, vectors[0]))], n_results=1, include=["distances"])
+            if not probe["distances"][0] or probe["distances"][0][0] > 1e-3:
+                raise ValueError(f"{collection.name} does not return its own records")
+
+    # Build the version for these records and switch to it. The build is
+    # incremental: vectors of rows the current version already holds are
+    # copied, only new or edited rows are embedded.
+    def publish(self, records, model_name, backend=EMBEDDING_BACKEND, workers=KB_BUILD_WORKERS, encode=None):
+        with self.build_lock:
+            start = time.time()
+            name = version_name(self.base, self.signature, records)
+            report = {"version": name, "records": len(records), "added": 0, "removed": 0, "embedded": 0, "unchanged": True}
+            if name == self.current_name():
+                print(f"DEBUG: KB version {name} is already current")
+                report["seconds"] = round(time.time() - start, 3)
+                return report
+
+            # Undoing an edit brings back a retired version's name; that
+            # version may still be read, so it is reactivated, not rebuilt
+            with self.lock:
+                revived = next((v for v in self.retired if v["name"] == name), None)
+                if revived is not None:
+                    self.retired.remove(revived)
+            if revived is not None:
+                with self.lease() as current:
+                    previous = set(current.get(include=[])["ids"]) if current is not None else set()
+                self.swap(name, revived["collection"], revived["collection"].count())
+                ids = {r["id"] for r in records}
+                report.update(added=len(ids - previous), removed=len(previous - ids), unchanged=False,
+                              revived=True, seconds=round(time.time() - start, 3))
+                print(f"✅ KB {self.base}: reactivated retired version {name}")
+                return report
+
+            with self.lease() as current:
+                known = reusable_vectors(current, records) if current is not None else {}
+                previous = set(current.get(include=[])["ids"]) if current is not None else set()
+
+            if name in collection_names(self.client) and not self.in_use(name):
+                self.client.delete_collection(name)  # left over from an interrupted build
+            collection = self.client.create_collection(name, metadata={"embedding": self.signature})
+            try:
+                missing = [r for r in records if r["id"] not in known]
+                embedded = embed_texts([r["document"] for r in missing], model_name, backend, workers, encode)
+                if len(embedded) != len(missing):
+                    raise ValueError(f"Encoder returned {len(embedded)} vectors for {len(missing)} texts")
+                known.update(zip((r["id"] for r in missing), embedded))
+                vectors = [known[r["id"]] for r in records]
+                write_records(collection, records, vectors)
+                self.validate(collection, records, vectors)
+            except Exception:
+                self.client.delete_collection(name)
+                raise
+
+            self.swap(name, collection, len(records))
+            ids = {r["id"] for r in records}
+            report.update(
+                added=len(ids - previous), removed=len(previous - ids), embedded=len(missing),
+                unchanged=False, seconds=round(time.time() - start, 3)
+            )
+            print(f"✅ KB {self.base}: {report['added']} added, {report['removed']} removed, "
+                  f"{report['embedded']} embedded in {report['seconds']}s")
+            return report
+
+    def swap(self, name, collection, count):
+        write_pointer(self.pointer_path, {
+            "name": name, "signature": self.signature, "records": count, "published_at": time.time()
+        })
+        self.activate(name, collection)
+
+    def activate(self, name, collection):
+        with self.lock:
+            if self.active is not None:
+                self.active["retired_at"] = time.time()
+                self.retired.append(self.active)
+            self.active = {"name": name, "collection": collection, "leases": 0}
+            self.swaps += 1
+        print(f"✅ KB {self.base} now serves {name} ({collection.count()} records)")
+        self.collect_garbage()
+
+    def collect_garbage(self):
+        with self.lock:
+            now = time.time()
+            idle, kept = [], []
+            for version in self.retired:
+                done = version["leases"] == 0 and now - version["retired_at"] >= self.retire_grace
+                (idle if done else kept).append(version)
+            self.retired = kept
+        if not self.drop_retired:
+            return
+        for version in idle:
+            if self.in_use(version["name"]):
+                continue  # reactivated, or retired again under the same name
+            try:
+                self.client.delete_collection(version["name"])
+                print(f"DEBUG: Dropped retired KB version {version['name']}")
+            except Exception as e:
+                print(f"⚠️ Could not drop KB version {version['name']}: {e}")
+
+    def stats(self):
+        with self.lock:
+            return {
+                "current": self.active["name"] if self.active else None,
+                "leases": self.active["leases"] if self.active else 0,
+                "retired": [{"name": v["name"], "leases": v["leases"]} for v in self.retired],
+                "swaps": self.swaps
+            }
+
+
+# 5. Poll source files and call back once a change has settled (editors
+#    and Excel save in several steps, so a change must be seen twice)
+KB_WATCH_INTERVAL = float(os.environ.get("KB_WATCH_INTERVAL", "2"))
+
+
+def file_state(path):
+    try:
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+    except OSError:
+        return None
+
+
+class SourceWatcher:
+    def __init__(self, interval=KB_WATCH_INTERVAL):
+        self.interval = interval
+        self.groups = []
+        self.thread = None
+
+    def watch(self, paths, callback):
+        paths = list(paths)
+        state = {p: file_state(p) for p in paths}
+        self.groups.append({"paths": paths, "callback": callback, "seen": state, "pending": None})
+
+    def check(self):
+        for group in self.groups:
+            state = {p: file_state(p) for p in group["paths"]}
+            if state == group["seen"]:
+                group["pending"] = None
+                continue
+            if state != group["pending"]:
+                group["pending"] = state
+                continue
+            changed = [p for p in group["paths"] if state[p] != group["seen"][p]]
+            group["seen"], group["pending"] = state, None
+            group["callback"](changed)
+
+    def run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.check()
+            except Exception:
+                traceback.print_exc()
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, name="kb-watcher", daemon=True)
+            self.thread.start()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild the knowledge base from an Excel workbook and DataSet.json")
+    parser.add_argument("--excel", default=os.path.join("backend", "FinalDataset.xlsx"))
+    parser.add_argument("--python-excel", default=os.path.join("backend", "Python_Best_Practices.xlsx"))
+    parser.add_argument("--javascript-excel", default=os.path.join("backend", "JavaScript_Best_Practices.xlsx"))
+    parser.add_argument("--incidents", default=os.path.join("backend", "Incidents.xlsx"),
+                        help="workbook summarized by incident_summaries.py")
+    parser.add_argument("--dataset", default=os.path.join("backend", "DataSet.json"))
+    parser.add_argument("--store", default="./chroma_store")
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--backend", default=EMBEDDING_BACKEND, choices=sorted(ENCODERS))
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("KB_BUILD_WORKERS", os.cpu_count() or 1)),
+                        help="embedding processes, each with cores/workers torch threads")
+    args = parser.parse_args()
+
+    import chromadb
+    client = chromadb.PersistentClient(path=args.store)
+    signature = encoder_signature(args.model, args.backend)
+
+    # Publishes new versions; a running app switches to them on refresh()
+    # One KB for all languages, records are tagged with theirs
+    sources = {"java": args.excel, "python": args.python_excel, "javascript": args.javascript_excel}
+    rows = []
+    for language, excel_path in sources.items():
+        if os.path.exists(excel_path):
+            rows.extend(read_observation_sheets(excel_path, language))
+        else:
+            print(f"⚠️ No {language} workbook at: {excel_path}")
+    if os.path.exists(args.incidents):
+        rows.extend(read_incident_summaries(args.incidents))
+    if rows:
+        kb = VersionedCollection(client, "java_feedback", signature, args.store)
+        kb.load()
+        rows, _ = collapse_near_duplicates(rows)
+        kb.publish(observation_records(rows), args.model, args.backend, args.workers)
+
+    if os.path.exists(args.dataset):
+        with open(args.dataset, "r", encoding="utf-8") as f:
+            records = code_example_records(extract_code_examples(json.load(f)))
+        code_kb = VersionedCollection(client, "java_code_examples", signature, args.store)
+        code_kb.load()
+        code_kb.publish(records, args.model, args.backend, args.workers)
+    else:
+        print(f"❌ DataSet.json not found at: {args.dataset}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Minimal stand-in for one or more Ollama servers, for trying out the backend
+# pool locally:
+#   python mock_ollama.py --ports 11501 11502 11503 --delay 2
+#   OLLAMA_URL=http://localhost:11501,http://localhost:11502,http://localhost:11503 python performanceOptimize.py
+
+
+def make_handler(port, delay, fail_rate):
+    loaded = set()
+
+    class MockOllamaHandler(BaseHTTPRequestHandler):
+        def send_json(self, status, body):
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path == "/api/tags":
+                self.send_json(200, {"models": [{"name": m} for m in sorted(loaded)]})
+            elif self.path == "/api/ps":
+                self.send_json(200, {"models": [{"name": m, "model": m} for m in sorted(loaded)]})
+            else:
+                self.send_json(404, {"error": "not found"})
+
+        def do_POST(self):
+            if self.path != "/api/generate":
+                self.send_json(404, {"error": "not found"})
+                return
+
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            if random.random() < fail_rate:
+                self.send_json(500, {"error": f"mock failure on port {port}"})
+                return
+
+            model = payload.get("model", "")
+            load_duration = 0 if model in loaded else int(1.5e9)
+            loaded.add(model)
+            if payload.get("prompt"):
+                time.sleep(delay)
+            response = f"Mock response from port {port}"
+            if payload.get("format"):
+                response = json.dumps({"summary": response, "problem": "p", "impact": "i", "rootCause": "r", "fix": "f"})
+            self.send_json(200, {"model": model, "response": response, "done": True, "load_duration": load_duration})
+
+        def log_message(self, format, *args):
+            print(f"[mock:{port}] {format % args}")
+
+    return MockOllamaHandler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run mock Ollama servers")
+    parser.add_argument("--ports", type=int, nargs="+", default=[11501, 11502])
+    parser.add_argument("--delay", type=float, default=1.0, help="Seconds per generation")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Fraction of generations that return 500")
+    args = parser.parse_args()
+
+    servers = [ThreadingHTTPServer(("localhost", port), make_handler(port, args.delay, args.fail_rate)) for port in args.ports]
+    for server in servers:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        print(f"Mock Ollama listening on http://localhost:{server.server_address[1]}")
+
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        for server in servers:
+            server.shutdown()
@@ -0,0 +1,510 @@
+import os
+import threading
+import time
+import traceback
+from collections import OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeout
+from contextlib import contextmanager
+
+import requests
+
+# One or more Ollama instances, comma separated, e.g.
+# OLLAMA_URL="http://localhost:11434,http://localhost:11435"
+OLLAMA_URL = os.environ.get("OLLAMA_URL", "http://localhost:11434/api/generate")
+
+# How long Ollama keeps each model in memory after a request,
+# e.g. OLLAMA_KEEP_ALIVE="llama3:8b=1h,llama3=30m" (default 30m)
+DEFAULT_KEEP_ALIVE = "30m"
+KEEP_ALIVE_SPEC = os.environ.get("OLLAMA_KEEP_ALIVE", "")
+
+# A load_duration above this means the request paid for loading the model
+COLD_LOAD_SECONDS = float(os.environ.get("OLLAMA_COLD_LOAD_SECONDS", "0.5"))
+RESIDENCY_CHECK_INTERVAL = int(os.environ.get("OLLAMA_RESIDENCY_CHECK_INTERVAL", "60"))
+
+# Backend pool health: consecutive failures before ejection, and how long
+# an ejected backend stays out before a health check may readmit it
+MAX_BACKEND_FAILURES = int(os.environ.get("OLLAMA_MAX_FAILURES", "3"))
+EJECT_SECONDS = int(os.environ.get("OLLAMA_EJECT_SECONDS", "30"))
+HEALTH_CHECK_INTERVAL = int(os.environ.get("OLLAMA_HEALTH_CHECK_INTERVAL", "10"))
+MAX_STICKY_SESSIONS = 10000
+
+# Circuit breaker over all backends: after this many failed generations in
+# a row, calls fail fast for CIRCUIT_OPEN_SECONDS, then one probe is let through
+CIRCUIT_FAILURES = int(os.environ.get("OLLAMA_CIRCUIT_FAILURES", "5"))
+CIRCUIT_OPEN_SECONDS = float(os.environ.get("OLLAMA_CIRCUIT_OPEN_SECONDS", "15"))
+
+# Hedging (off by default): a generation still running after this latency
+# percentile of the model's recent calls is also sent to a second backend,
+# and the first answer wins, e.g. OLLAMA_HEDGE_PERCENTILE=95
+HEDGE_PERCENTILE = float(os.environ.get("OLLAMA_HEDGE_PERCENTILE", "0"))
+HEDGE_MIN_SAMPLES = 20
+HEDGE_WORKERS = int(os.environ.get("OLLAMA_HEDGE_WORKERS", "16"))
+LATENCY_SAMPLES = 500
+
+
+def parse_keep_alive(spec):
+    keep_alive = {}
+    for item in spec.split(","):
+        if "=" in item:
+            model, value = item.split("=", 1)
+            keep_alive[model.strip()] = value.strip()
+    return keep_alive
+
+
+def base_url(url):
+    return url.split("/api/")[0].rstrip("/")
+
+
+def percentile(samples, p):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))] if ordered else None
+
+
+# Generation refused or cut short: status is 503 while the circuit is open,
+# 504 when the request deadline is used up
+class OllamaUnavailable(requests.exceptions.RequestException):
+    def __init__(self, message, status, retry_after=1):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = max(1, int(retry_after + 0.999))
+
+
+# Request deadline (time.monotonic) of the calling thread; every generate()
+# inside the scope gets at most the time that is left, so the budget is
+# shared between retrieval and generation
+_scope = threading.local()
+
+
+@contextmanager
+def deadline_scope(deadline):
+    previous = getattr(_scope, "deadline", None)
+    _scope.deadline = deadline if previous is None else min(previous, deadline)
+    try:
+        yield
+    finally:
+        _scope.deadline = previous
+
+
+def remaining_seconds():
+    deadline = getattr(_scope, "deadline", None)
+    return None if deadline is None else deadline - time.monotonic()
+
+
+class CircuitBreaker:
+    def __init__(self, max_failures=CIRCUIT_FAILURES, open_seconds=CIRCUIT_OPEN_SECONDS):
+        self.max_failures = max_failures
+        self.open_seconds = open_seconds
+        self.lock = threading.Lock()
+        self.failures = 0
+        self.opened_until = 0.0
+        self.probing = False
+        self.opened = 0
+
+    def state(self, now=None):
+        now = time.monotonic() if now is None else now
+        if self.failures < self.max_failures:
+            return "closed"
+        return "open" if now < self.opened_until else "half_open"
+
+    # Raises while open; once the open period is over a single probe passes
+    def allow(self):
+        with self.lock:
+            now = time.monotonic()
+            state = self.state(now)
+            if state == "closed":
+                return
+            if state == "half_open" and not self.probing:
+                self.probing = True
+                return
+            retry_after = max(self.opened_until - now, 1)
+        raise OllamaUnavailable("Ollama is failing, circuit open", 503, retry_after)
+
+    def record(self, ok):
+        with self.lock:
+            self.probing = False
+            if ok:
+                if self.failures >= self.max_failures:
+                    print("✅ Ollama circuit closed")
+                self.failures = 0
+                return
+            self.failures += 1
+            if self.failures >= self.max_failures:
+                if self.opened_until <= time.monotonic():
+                    print(f"⚠️ Ollama circuit open for {self.open_seconds}s after {self.failures} failures")
+                    self.opened += 1
+                self.opened_until = time.monotonic() + self.open_seconds
+
+    def stats(self):
+        with self.lock:
+            return {"state": self.state(), "consecutive_failures": self.failures, "opened": self.opened}
+
+
+class Backend:
+    def __init__(self, url):
+        self.base_url = base_url(url)
+        self.url = f"{self.base_url}/api/generate"
+        self.outstanding = 0
+        self.failures = 0
+        self.ejected_until = 0.0
+        self.requests = 0
+        self.errors = 0
+        self.probe_failures = 0
+
+    def available(self, now):
+        return self.ejected_until <= now
+
+    def stats(self, now):
+        return {
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "errors": self.errors,
+            "consecutive_failures": self.failures,
+            "probe_failures": self.probe_failures,
+            "ejected": not self.available(now)
+        }
+
+
+# Least-outstanding-requests balancing over several Ollama instances, with
+# ejection of failing backends and sticky routing for follow-up requests
+class BackendPool:
+    def __init__(self, urls, max_failures=MAX_BACKEND_FAILURES, eject_seconds=EJECT_SECONDS,
+                 health_interval=HEALTH_CHECK_INTERVAL):
+        self.backends = [Backend(url.strip()) for url in urls.split(",") if url.strip()]
+        self.max_failures = max_failures
+        self.eject_seconds = eject_seconds
+        self.health_interval = health_interval
+        self.lock = threading.Lock()
+        self.sticky = OrderedDict()
+        self.thread = None
+
+    def acquire(self, sticky_key=None, exclude=()):
+        with self.lock:
+            now = time.time()
+            candidates = [b for b in self.backends if b.available(now) and b not in exclude]
+            if not candidates:
+                # Everything is ejected: try the least recently ejected one
+                candidates = sorted((b for b in self.backends if b not in exclude), key=lambda b: b.ejected_until)[:1]
+            if not candidates:
+                raise requests.exceptions.ConnectionError("No Ollama backend available")
+
+            backend = None
+            if sticky_key is not None:
+                url = self.sticky.get(sticky_key)
+                backend = next((b for b in candidates if b.url == url), None)
+            if backend is None:
+                backend = min(candidates, key=lambda b: b.outstanding)
+            if sticky_key is not None:
+                self.sticky[sticky_key] = backend.url
+                self.sticky.move_to_end(sticky_key)
+                while len(self.sticky) > MAX_STICKY_SESSIONS:
+                    self.sticky.popitem(last=False)
+
+            backend.outstanding += 1
+            backend.requests += 1
+            return backend
+
+    def release(self, backend, ok):
+        with self.lock:
+            backend.outstanding -= 1
+            self.record(backend, ok)
+
+    def record(self, backend, ok):
+        if ok:
+            backend.failures = 0
+            backend.ejected_until = 0.0
+            return
+        backend.errors += 1
+        backend.failures += 1
+        if backend.failures >= self.max_failures:
+            if backend.available(time.time()):
+                print(f"⚠️ Ejecting Ollama backend {backend.base_url} after {backend.failures} failures")
+            backend.ejected_until = time.time() + self.eject_seconds
+
+    def health_check(self):
+        # Probes only keep dead instances out and readmit ejected ones once
+        # their ejection has expired; they never touch the request counters
+        for backend in self.backends:
+            try:
+                response = requests.get(f"{backend.base_url}/api/tags", timeout=5)
+                ok = response.status_code == 200
+            except requests.exceptions.RequestException:
+                ok = False
+            with self.lock:
+                self.record_probe(backend, ok)
+
+    def record_probe(self, backend, ok):
+        now = time.time()
+        if ok:
+            backend.probe_failures = 0
+            if backend.ejected_until and now >= backend.ejected_until:
+                print(f"✅ Readmitting Ollama backend {backend.base_url}")
+                backend.ejected_until = 0.0
+            return
+        backend.probe_failures += 1
+        if backend.probe_failures >= self.max_failures:
+            if backend.available(now):
+                print(f"⚠️ Ejecting Ollama backend {backend.base_url}: health check failed {backend.probe_failures} times")
+            backend.ejected_until = max(backend.ejected_until, now + self.eject_seconds)
+
+    def run(self):
+        while True:
+            time.sleep(self.health_interval)
+            try:
+                self.health_check()
+            except Exception:
+                traceback.print_exc()
+
+    def start(self):
+        if self.thread is None and len(self.backends) > 1:
+            self.thread = threading.Thread(target=self.run, name="ollama-health", daemon=True)
+            self.thread.start()
+
+    def stats(self):
+        with self.lock:
+            now = time.time()
+            return {b.base_url: b.stats(now) for b in self.backends}
+
+
+class OllamaClient:
+    def __init__(self, url=OLLAMA_URL, keep_alive_spec=KEEP_ALIVE_SPEC, hedge_percentile=HEDGE_PERCENTILE):
+        self.pool = BackendPool(url)
+        self.keep_alive = parse_keep_alive(keep_alive_spec)
+        self.breaker = CircuitBreaker()
+        self.hedge_percentile = hedge_percentile
+        self.hedge_executor = None
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.latencies = {}
+        self.outcomes = {"ok": 0, "error": 0, "timeout": 0, "circuit_open": 0, "deadline_exceeded": 0,
+                         "hedged": 0, "hedge_wins": 0}
+
+    def keep_alive_for(self, model):
+        return self.keep_alive.get(model, DEFAULT_KEEP_ALIVE)
+
+    def _count(self, model, name, amount=1):
+        with self.lock:
+            counters = self.counters.setdefault(model, {"requests": 0, "cold_loads": 0, "load_seconds": 0.0, "warmups": 0})
+            counters[name] += amount
+
+    def _outcome(self, name):
+        with self.lock:
+            self.outcomes[name] += 1
+
+    def _post(self, backend, payload, timeout):
+        response = requests.post(backend.url, json=payload, timeout=timeout)
+        response.raise_for_status()
+        return response.json()
+
+    # One attempt on an acquired backend, which it releases whatever happens
+    # (a losing hedge finishes, and is released, in the background)
+    def _call(self, backend, payload, timeout):
+        try:
+            result = self._post(backend, payload, timeout)
+        except requests.exceptions.HTTPError as e:
+            self.pool.release(backend, ok=e.response is None or e.response.status_code < 500)
+            raise
+        except Exception:
+            self.pool.release(backend, ok=False)
+            raise
+        self.pool.release(backend, ok=True)
+        return result, backend
+
+    def hedge_delay(self, model):
+        if not self.hedge_percentile or len(self.pool.backends) < 2:
+            return None
+        with self.lock:
+            samples = list(self.latencies.get(model, ()))
+        return percentile(samples, self.hedge_percentile) if len(samples) >= HEDGE_MIN_SAMPLES else None
+
+    def _hedged_call(self, backend, payload, timeout, tried):
+        delay = self.hedge_delay(payload["model"])
+        if delay is None or (timeout is not None and delay >= timeout):
+            return self._call(backend, payload, timeout)
+
+        if self.hedge_executor is None:
+            with self.lock:
+                if self.hedge_executor is None:
+                    self.hedge_executor = ThreadPoolExecutor(max_workers=HEDGE_WORKERS, thread_name_prefix="ollama-hedge")
+        primary = self.hedge_executor.submit(self._call, backend, payload, timeout)
+        try:
+            return primary.result(timeout=delay)
+        except FutureTimeout:
+            pass
+        try:
+            other = self.pool.acquire(exclude=tried + [backend])
+        except requests.exceptions.ConnectionError:
+            return primary.result()
+
+        self._outcome("hedged")
+        hedge = self.hedge_executor.submit(self._call, other, payload, None if timeout is None else timeout - delay)
+        pending = {primary, hedge}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        self._outcome("hedge_wins")
+                    return future.result()
+        return primary.result()  # both failed: report the primary's error
+
+    def generate(self, payload, timeout=None, sticky_key=None):
+        payload = dict(payload)
+        payload.setdefault("keep_alive", self.keep_alive_for(payload["model"]))
+
+        # The request deadline caps the call's own timeout
+        remaining = remaining_seconds()
+        if remaining is not None:
+            if remaining <= 0:
+                self._outcome("deadline_exceeded")
+                raise OllamaUnavailable("Request deadline exceeded before generation", 504)
+            timeout = remaining if timeout is None else min(timeout, remaining)
+        try:
+            self.breaker.allow()
+        except OllamaUnavailable:
+            self._outcome("circuit_open")
+            raise
+
+        start = time.monotonic()
+        tried = []
+        try:
+            while True:
+                backend = self.pool.acquire(sticky_key, exclude=tried)
+                try:
+                    result, backend = self._hedged_call(backend, payload, timeout, tried)
+                    break
+                except requests.exceptions.ConnectionError:
+                    # The backend is down: fail over once per remaining backend
+                    tried.append(backend)
+                    if len(tried) >= len(self.pool.backends):
+                        raise
+        except requests.exceptions.Timeout:
+            self.breaker.record(False)
+            self._outcome("timeout")
+            if remaining is not None and timeout == remaining:
+                self._outcome("deadline_exceeded")
+                raise OllamaUnavailable(f"Request deadline exceeded after {time.monotonic() - start:.1f}s of generation", 504)
+            raise
+        except requests.exceptions.HTTPError as e:
+            # A 4xx is our request's fault: Ollama answered, so it counts as
+            # healthy (and ends a half-open probe)
+            self.breaker.record(e.response is not None and e.response.status_code < 500)
+            self._outcome("error")
+            raise
+        except Exception:
+            self.breaker.record(False)
+            self._outcome("error")
+            raise
+
+        self.breaker.record(True)
+        self._outcome("ok")
+        with self.lock:
+            self.latencies.setdefault(payload["model"], deque(maxlen=LATENCY_SAMPLES)).append(time.monotonic() - start)
+        self._count(payload["model"], "requests")
+        load_seconds = result.get("load_duration", 0) / 1e9
+        if load_seconds > COLD_LOAD_SECONDS:
+            self._count(payload["model"], "cold_loads")
+            self._count(payload["model"], "load_seconds", load_seconds)
+            print(f"⚠️ Request paid a cold load of {payload['model']} on {backend.base_url}: {load_seconds:.2f}s")
+        return result
+
+    def load_model(self, model, backend):
+        # A generate request without a prompt only loads the model into memory
+        payload = {"model": model, "keep_alive": self.keep_alive_for(model)}
+        self._post(backend, payload, timeout=300)
+        self._count(model, "warmups")
+
+    def resident_models(self, backend):
+        response = requests.get(f"{backend.base_url}/api/ps", timeout=5)
+        response.raise_for_status()
+        loaded = set()
+        for m in response.json().get("models", []):
+            loaded.update(name for name in (m.get("name"), m.get("model")) if name)
+        return loaded
+
+    def stats(self):
+        with self.lock:
+            return {model: dict(c) for model, c in self.counters.items()}
+
+    def resilience_stats(self):
+        with self.lock:
+            outcomes = dict(self.outcomes)
+            latencies = {model: list(samples) for model, samples in self.latencies.items()}
+        return {
+            "outcomes": outcomes,
+            "circuit": self.breaker.stats(),
+            "hedge_percentile": self.hedge_percentile or None,
+            "latency_seconds": {
+                model: {f"p{p}": round(percentile(samples, p), 3) for p in (50, 95, 99)}
+                for model, samples in latencies.items() if samples
+            }
+        }
+
+
+# Preload the configured models on every backend and keep them resident
+class ModelLifecycle:
+    def __init__(self, client, models, interval=RESIDENCY_CHECK_INTERVAL):
+        self.client = client
+        self.models = list(dict.fromkeys(models))
+        self.interval = interval
+        self.resident = {}
+        self.last_check = None
+        self.thread = None
+
+    def load(self, model, backend):
+        start = time.time()
+        try:
+            self.client.load_model(model, backend)
+            self.resident.setdefault(backend.base_url, {})[model] = True
+            print(f"✅ Model {model} loaded on {backend.base_url} in {time.time() - start:.2f}s "
+                  f"(keep_alive={self.client.keep_alive_for(model)})")
+        except Exception as e:
+            self.resident.setdefault(backend.base_url, {})[model] = False
+            print(f"❌ Failed to load model {model} on {backend.base_url}: {e}")
+
+    def warm_up(self):
+        for backend in self.client.pool.backends:
+            for model in self.models:
+                self.load(model, backend)
+
+    def check_residency(self):
+        self.last_check = time.time()
+        for backend in self.client.pool.backends:
+            if not backend.available(self.last_check):
+                continue
+            try:
+                loaded = self.client.resident_models(backend)
+            except Exception as e:
+                print(f"❌ Ollama residency check failed on {backend.base_url}: {e}")
+                continue
+
+            for model in self.models:
+                names = {model, model if ":" in model else f"{model}:latest"}
+                if names & loaded:
+                    self.resident.setdefault(backend.base_url, {})[model] = True
+                else:
+                    print(f"⚠️ Model {model} is no longer resident on {backend.base_url}, reloading...")
+                    self.load(model, backend)
+
+    def run(self):
+        self.warm_up()
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.check_residency()
+            except Exception:
+                traceback.print_exc()
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, name="ollama-lifecycle", daemon=True)
+            self.thread.start()
+
+    def stats(self):
+        return {
+            "resident": {url: dict(models) for url, models in self.resident.items()},
+            "last_check": self.last_check,
+            "models": self.client.stats(),
+            "backends": self.client.pool.stats(),
+            "resilience": self.client.resilience_stats()
+        }
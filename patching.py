@@ -0,0 +1,107 @@
+import re
+
+HUNK_HEADER = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+CODE_BLOCK = re.compile(r"```[\w+-]*[ \t]*\n(.*?)```", re.S)
+
+
+class PatchError(ValueError):
+    pass
+
+
+# 1. Pull the unified diff out of the model reply
+def extract_diff(text):
+    for block in CODE_BLOCK.findall(text):
+        if "@@" in block:
+            return block.strip("\n")
+
+    # Unfenced diff: take the lines from the first header/hunk line up to the
+    # first line that cannot be part of a diff (usually the explanation)
+    lines = text.splitlines()
+    for i, line in enumerate(lines):
+        if line.startswith("--- ") or line.startswith("@@"):
+            end = i
+            while end < len(lines) and is_diff_line(lines[end]):
+                end += 1
+            return "\n".join(lines[i:end]).rstrip("\n")
+    raise PatchError("No unified diff found in model output")
+
+
+def is_diff_line(line):
+    return line == "" or line[0] in "+- \\" or line.startswith("@@") or line.startswith("diff ") or line.startswith("index ")
+
+
+# 2. Parse hunks into (old lines, new lines), tolerating what LLMs usually get
+#    wrong: missing line numbers and context lines without the leading space
+def parse_hunks(diff):
+    hunks = []
+    current = None
+    lines = diff.splitlines()
+    for i, line in enumerate(lines):
+        if line.startswith("@@"):
+            m = HUNK_HEADER.match(line)
+            current = {
+                "start": int(m.group(1)) if m else None,
+                "count": int(m.group(2)) if m and m.group(2) is not None else 1,
+                "old": [],
+                "new": []
+            }
+            hunks.append(current)
+        elif line.startswith("--- ") and i + 1 < len(lines) and lines[i + 1].startswith("+++ "):
+            current = None
+        elif current is None or line.startswith("\\"):
+            continue
+        elif line.startswith("+"):
+            current["new"].append(line[1:])
+        elif line.startswith("-"):
+            current["old"].append(line[1:])
+        else:
+            context = line[1:] if line.startswith(" ") else line
+            current["old"].append(context)
+            current["new"].append(context)
+
+    hunks = [h for h in hunks if h["old"] != h["new"]]
+    if not hunks:
+        raise PatchError("Diff contains no changes")
+    return hunks
+
+
+def find_block(lines, block, start_from, hint):
+    size = len(block)
+    positions = range(start_from, len(lines) - size + 1)
+    for normalize in (lambda l: l.rstrip(), lambda l: " ".join(l.split())):
+        wanted = [normalize(l) for l in block]
+        matches = [i for i in positions if [normalize(l) for l in lines[i:i + size]] == wanted]
+        if matches:
+            return min(matches, key=lambda i: abs(i - hint))
+    return None
+
+
+# 3. Apply the hunks in order to the submitted source
+def apply_unified_diff(source, diff):
+    lines = source.splitlines()
+    out = []
+    pos = 0
+
+    for n, hunk in enumerate(parse_hunks(diff), start=1):
+        hint = hunk["start"] - 1 if hunk["start"] else pos
+        if hunk["old"]:
+            idx = find_block(lines, hunk["old"], pos, hint)
+            if idx is None:
+                raise PatchError(f"Hunk {n} does not match the submitted code")
+        elif hunk["start"] is not None:
+            # Pure insertion: "-10,0" inserts after line 10
+            idx = hunk["start"] if hunk["count"] == 0 else hunk["start"] - 1
+            if not pos <= idx <= len(lines):
+                raise PatchError(f"Hunk {n} inserts outside the submitted code")
+        else:
+            raise PatchError(f"Hunk {n} has neither context nor a line number")
+
+        out.extend(lines[pos:idx])
+        out.extend(hunk["new"])
+        pos = idx + len(hunk["old"])
+
+    out.extend(lines[pos:])
+    patched = "\n".join(out) + ("\n" if source.endswith("\n") else "")
+    if patched == source:
+        raise PatchError("Patch makes no changes")
+    return patched
@@ -1,118 +1,503 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
-import pandas as pd
 import requests
-from sentence_transformers import SentenceTransformer
 import chromadb
 import traceback
 import os
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from single_flight import SingleFlight, request_key
+from admission import ADMISSION_CONCURRENCY, ADMISSION_DEADLINES, PRIORITIES, AdmissionController, Overloaded
+from ollama_client import OllamaClient, ModelLifecycle, OllamaUnavailable, deadline_scope
+from patching import PatchError, extract_diff, apply_unified_diff
+from java_methods import MethodResultCache, split_methods, context_fingerprint
+from retrieval import embed_query, embed_queries, search_focused, search_many, fuse
+from topics import detect_topics, topic_filter
+from code_examples import extract_code_examples
+from incident_summaries import (DECOMPOSE_SCHEMA, SUMMARY_FIELDS, SUMMARY_SCHEMA, SUMMARY_TIMEOUT,
+                                read_incident_summaries, structured_payload, summary_prompt,
+                                validate_structured_output)
+from encoders import load_encoder
+from embedding_executor import EmbeddingExecutor
+from knowledge_base import (KB_RETIRE_GRACE, KB_WATCH_INTERVAL, VersionedCollection, SourceWatcher,
+                            code_example_records, collapse_near_duplicates, observation_records,
+                            read_observation_sheets)
 
 app = Flask(__name__)
 CORS(app)
 
-OLLAMA_URL = "http://localhost:11434/api/generate"
+CODE_MODEL = "llama3:8b"
+SUMMARY_MODEL = "llama3"
 #EXCEL_FILE_PATH = os.path.join("backend", "Book2.xlsx")
 EXCEL_FILE_PATH = os.path.join("backend", "Performence_Best_Practices.xlsx")
+EXCEL_FILE_PATHS = [EXCEL_FILE_PATH, os.path.join("backend", "FinalDataset.xlsx")]
+# Best-practice workbooks per language; the KB is partitioned by the
+# language tag and each route only retrieves from its own partition
+KB_SOURCES = {
+    "java": EXCEL_FILE_PATHS,
+    "python": [os.path.join("backend", "Python_Best_Practices.xlsx")],
+    "javascript": [os.path.join("backend", "JavaScript_Best_Practices.xlsx")]
+}
+# Workbooks summarized by incident_summaries.py; their summary sheet is
+# read into the Java partition
+INCIDENT_FILE_PATHS = [os.path.join("backend", "Incidents.xlsx")]
+DATASET_FILE_PATH = os.path.join("backend", "DataSet.json")
+CHROMA_PATH = "./chroma_store"
+# Protects /admin/reload when set (sent as X-Admin-Token); without it the
+# route only answers requests from this machine
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN")
+LOCAL_ADDRESSES = {"127.0.0.1", "::1"}
+
+# Code examples are embedded code-to-code, optionally with a code-oriented model
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+CODE_EMBEDDING_MODEL = os.environ.get("CODE_EMBEDDING_MODEL", EMBEDDING_MODEL)
 
 
 # Initialize shared components
 try:
-    print("DEBUG: Initializing SentenceTransformer...")
-    model = SentenceTransformer("all-MiniLM-L6-v2")
-    print("DEBUG: SentenceTransformer initialized.")
+    print("DEBUG: Initializing embedding model...")
+    # Request threads share one micro-batching encoder with a fixed thread budget
+    model = EmbeddingExecutor(load_encoder(EMBEDDING_MODEL))
+    code_model = model if CODE_EMBEDDING_MODEL == EMBEDDING_MODEL else EmbeddingExecutor(load_encoder(CODE_EMBEDDING_MODEL))
+    print("DEBUG: Embedding model initialized.")
 
     print("DEBUG: Connecting to ChromaDB...")
-    client = chromadb.PersistentClient(path="./chroma_store")
-    collection = client.get_or_create_collection("java_feedback")
-    print("DEBUG: ChromaDB collection ready.")
+    client = chromadb.PersistentClient(path=CHROMA_PATH)
+    # Versioned (blue/green) collections: queries read the current version
+    # while a new one is built and swapped in; another encoder means a new version
+    kb = VersionedCollection(client, "java_feedback", model.signature, CHROMA_PATH)
+    code_kb = VersionedCollection(client, "java_code_examples", code_model.signature, CHROMA_PATH)
+    kb.load()
+    code_kb.load()
+    print("DEBUG: ChromaDB collections ready.")
 except Exception as e:
     print(f"❌ Error during initialization: {e}")
     traceback.print_exc()
 
 
-# 1. Read Excel and return (observation, recommendation) pairs
-def extract_from_excel(excel_path):
+# Ollama client; the lifecycle manager preloads the models and keeps them resident
+ollama = OllamaClient()
+lifecycle = ModelLifecycle(ollama, [CODE_MODEL, SUMMARY_MODEL])
+
+# Identical concurrent requests share one retrieval + generation
+flight = SingleFlight()
+
+# Bounded queues in front of generation: interactive requests go before
+# batch ones, and a request that cannot meet its deadline is refused early
+admission = AdmissionController(ADMISSION_CONCURRENCY or len(ollama.pool.backends))
+
+
+# Follow-up requests from one client go to the same Ollama backend
+def session_id():
+    return request.headers.get("X-Session-Id")
+
+
+# Priority (X-Priority: interactive|batch) and deadline (X-Request-Timeout,
+# seconds) of the current request
+def admission_error(default_priority="interactive"):
+    priority = request.headers.get("X-Priority", default_priority)
+    if priority not in PRIORITIES:
+        return jsonify({"error": f"Unknown priority '{priority}', expected one of {', '.join(PRIORITIES)}"}), 400
     try:
-        print(f"DEBUG: Reading Excel file at {excel_path}")
-        df = pd.read_excel(excel_path)
-        df.columns = df.columns.str.strip()
-        print("DEBUG: Excel columns:", df.columns.tolist())
-
-        if "Observation" in df.columns and "Recommendation" in df.columns:
-            df = df.dropna(subset=["Observation", "Recommendation"])
-            print(f"DEBUG: Extracted {len(df)} rows with Observation and Recommendation")
-            print("DEBUG: Sample row:")
-            print(df[["Observation", "Recommendation"]].head(1))
-            return list(zip(df["Observation"], df["Recommendation"]))
-        else:
-            print("❌ ERROR: 'Observation' or 'Recommendation' column missing.")
-            return []
+        float(request.headers.get("X-Request-Timeout") or 0)
+    except ValueError:
+        return jsonify({"error": "X-Request-Timeout must be a number of seconds"}), 400
+    return None
+
+
+# The deadline also bounds the Ollama calls made by compute: whatever
+# queueing and retrieval used up is no longer available to generation.
+# Work known to need longer than its class default (min_timeout) gets that
+# long unless the client sent its own X-Request-Timeout.
+def admitted(compute, default_priority="interactive", min_timeout=None):
+    priority = request.headers.get("X-Priority", default_priority)
+    timeout = float(request.headers.get("X-Request-Timeout") or 0)
+    if not timeout and min_timeout:
+        timeout = max(min_timeout, admission.deadlines[priority])
+    deadline = admission.deadline_for(priority, timeout)
+
+    def run():
+        with deadline_scope(deadline):
+            return compute()
+    return lambda: admission.run(priority, deadline, run)
+
+
+def overloaded(e):
+    print(f"⚠️ Request refused ({e.status}): {e}")
+    return jsonify({"error": str(e)}), e.status, {"Retry-After": str(e.retry_after)}
+
+
+# 1. Read every sheet of the KB workbooks into observation rows
+def extract_from_excel(excel_paths, language="java"):
+    rows = []
+    for excel_path in excel_paths:
+        if not os.path.exists(excel_path):
+            print(f"❌ Excel file not found at: {excel_path}")
+            continue
+        try:
+            print(f"DEBUG: Reading Excel file at {excel_path}")
+            rows.extend(read_observation_sheets(excel_path, language))
+        except Exception as e:
+            print(f"❌ Error reading Excel: {e}")
+            traceback.print_exc()
+    print(f"DEBUG: Extracted {len(rows)} rows with Observation and Recommendation")
+    return rows
+
+
+# 1b. Summarized incidents (incident_summaries.py) as observation rows
+def extract_incidents(excel_paths):
+    rows = []
+    for excel_path in excel_paths:
+        if not os.path.exists(excel_path):
+            continue
+        try:
+            rows.extend(read_incident_summaries(excel_path))
+        except Exception as e:
+            print(f"❌ Error reading incident summaries: {e}")
+            traceback.print_exc()
+    if rows:
+        print(f"DEBUG: Extracted {len(rows)} summarized incidents")
+    return rows
+
+
+# 2. Embed and store in ChromaDB as a new KB version (one batched encode,
+#    bulk upserts; use "python knowledge_base.py" to rebuild a big KB on
+#    several cores). Only new or edited rows are embedded.
+def store_in_vector_db(rows):
+    if not rows:
+        # Never swap in an empty KB because a source is missing or mid-save
+        print("⚠️ No observation rows found, keeping the current KB version")
+        return None
+    try:
+        print("DEBUG: Starting to store rows in ChromaDB...")
+        return kb.publish(observation_records(rows), EMBEDDING_MODEL, workers=1, encode=model.encode)
     except Exception as e:
-        print(f"❌ Error reading Excel: {e}")
+        print(f"❌ Error in store_in_vector_db(): {e}")
         traceback.print_exc()
-        return []
+        return None
 
 
-# 2. Embed and store in ChromaDB
-def store_in_vector_db(pairs):
+# 2b. Embed the code examples of DataSet.json into the code-to-code index
+def store_code_examples(examples):
+    if not examples:
+        print("⚠️ No code examples found, keeping the current KB version")
+        return None
     try:
-        #print(f"DEBUG: Initial collection count: {collection.count()}")
-        print("DEBUG: Starting to store pairs in ChromaDB...")
-
-        for i, (obs, rec) in enumerate(pairs):
-            try:
-                # Ensure both are strings and clean newlines
-                obs = str(obs).replace("\n", " ").strip()
-                rec = str(rec).replace("\n", " ").strip()
-
-                print(f"  ➤ Encoding and storing pair #{i+1}")
-                print(f"    Observation: {obs[:60]}...")
-                print(f"    Recommendation: {rec[:60]}...")
-
-                embedding = model.encode(obs)
-
-                collection.add(
-                    documents=[obs],
-                    metadatas=[{"recommendation": rec}],
-                    ids=[f"obs_{i}"],
-                    embeddings=[embedding.tolist()]
-                )
-
-                print(f"    ✅ Stored obs_{i} successfully.")
-            except Exception as inner_e:
-                print(f"    ❌ Failed to store pair #{i+1}: {inner_e}")
-                traceback.print_exc()
-
-        print(f"DEBUG: Final collection count after insert: {collection.count()}")
+        print(f"DEBUG: Storing {len(examples)} code examples in ChromaDB...")
+        return code_kb.publish(code_example_records(examples), CODE_EMBEDDING_MODEL, workers=1, encode=code_model.encode)
     except Exception as e:
-        print(f"❌ Error in store_in_vector_db(): {e}")
+        print(f"❌ Error in store_code_examples(): {e}")
         traceback.print_exc()
+        return None
+
+
+def load_knowledge_base():
+    # Near-duplicate observations across sheets are stored once
+    rows = []
+    for language, excel_paths in KB_SOURCES.items():
+        rows.extend(extract_from_excel(excel_paths, language))
+    rows.extend(extract_incidents(INCIDENT_FILE_PATHS))
+    rows, dedup = collapse_near_duplicates(rows)
+    reports = {"observations": store_in_vector_db(rows), "code_examples": None, "dedup": dedup}
+    if os.path.exists(DATASET_FILE_PATH):
+        try:
+            with open(DATASET_FILE_PATH, "r", encoding="utf-8") as f:
+                reports["code_examples"] = store_code_examples(extract_code_examples(json.load(f)))
+        except Exception as e:
+            print(f"❌ Error reading DataSet.json: {e}")
+            traceback.print_exc()
+    else:
+        print(f"❌ DataSet.json not found at: {DATASET_FILE_PATH}")
+    return reports
 
 
+# 2c. Hot reload: a source change (or POST /admin/reload) re-indexes in the
+#     background and swaps the new version in; one reload runs at a time
+reload_lock = threading.Lock()
+last_reload = {}
 
 
-# 3. Search relevant observation by code
-def get_relevant_observations(code):
+def reload_knowledge_base(reason):
+    if not reload_lock.acquire(blocking=False):
+        print(f"DEBUG: KB reload ({reason}) skipped, one is already running")
+        return None
     try:
-        print(f"DEBUG: Encoding provided Java code for similarity search...")
-        embedding = model.encode(code).tolist()
-        results = collection.query(query_embeddings=[embedding], n_results=3)
-        print("Retrieved:", results["documents"][0][0])
-        print("Recommendation:", results["metadatas"][0][0]["recommendation"])
-        print("DEBUG: Top 3 matches:")
-        for i, (doc, meta) in enumerate(zip(results["documents"][0], results["metadatas"][0])):
-            print(f"\nResult #{i+1}")
-            print(f"Observation: {doc}")
-            print(f"Recommendation: {meta['recommendation']}")
-
-        return [(doc, meta["recommendation"]) for doc, meta in zip(results["documents"][0], results["metadatas"][0])]
+        start = time.time()
+        print(f"DEBUG: Reloading knowledge base ({reason})...")
+        reports = load_knowledge_base()
+        result = dict(
+            reports,
+            reason=reason,
+            finished_at=time.time(),
+            duration_seconds=round(time.time() - start, 3),
+            changed_rows=sum(r["added"] + r["removed"] for r in (reports["observations"], reports["code_examples"]) if r)
+        )
+        last_reload.clear()
+        last_reload.update(result)
+        print(f"✅ Knowledge base reloaded in {result['duration_seconds']}s ({result['changed_rows']} changed rows)")
+        return result
+    finally:
+        reload_lock.release()
+
+
+def follow_published_versions(changed):
+    kb.refresh()
+    code_kb.refresh()
+
+
+# 3. Search relevant observations by code: long code is embedded as one batch
+#    of windows, and the candidate pool is filtered by distance and diversified
+#    with MMR, so the prompt only carries useful context. Observations (prose)
+#    and DataSet.json code examples (code-to-code) are fused by rank.
+#    Only the observations of the code's language are searched, and those
+#    of the topics its imports/annotations point at come first.
+def get_relevant_observations(code, language="java"):
+    try:
+        topics = detect_topics(code) if language == "java" else []
+        focus = topic_filter(topics)
+        print(f"DEBUG: Encoding provided {language} code for similarity search (topics: {', '.join(topics) or 'none'})...")
+        vectors = embed_query(model.encode, code, language)
+        ranked = []
+        with kb.lease() as collection, code_kb.lease() as code_collection:
+            if collection is not None:
+                ranked.append(search_focused(collection, vectors, focus, where={"language": language}))
+            # The DataSet.json examples are all Java
+            if code_collection is not None and language == "java":
+                code_vectors = vectors if code_model is model else embed_query(code_model.encode, code)
+                ranked.append(search_focused(code_collection, code_vectors, focus))
+        items = fuse(ranked)
+
+        print(f"DEBUG: {len(items)} matches kept:")
+        for i, item in enumerate(items):
+            print(f"\nResult #{i+1} (score {item['score']}, {item['metadata'].get('source', 'observation')})")
+            print(f"Observation: {item['document'][:200]}")
+            print(f"Recommendation: {item['metadata'].get('recommendation')}")
+        return items
     except Exception as e:
         print(f"❌ Error during ChromaDB query: {e}")
         traceback.print_exc()
         return []
 
 
+# 3b. The same for many snippets at once: one encode call and one
+#     multi-query per index for the whole batch
+def get_relevant_observations_many(codes, language="java"):
+    try:
+        topics = [detect_topics(code) if language == "java" else [] for code in codes]
+        groups = embed_queries(model.encode, codes, language)
+        ranked = [[] for _ in codes]
+        with kb.lease() as collection, code_kb.lease() as code_collection:
+            if collection is not None:
+                for lists, items in zip(ranked, search_many(collection, groups, topics, where={"language": language})):
+                    lists.append(items)
+            if code_collection is not None and language == "java":
+                code_groups = groups if code_model is model else embed_queries(code_model.encode, codes)
+                for lists, items in zip(ranked, search_many(code_collection, code_groups, topics)):
+                    lists.append(items)
+        return [fuse(lists) for lists in ranked]
+    except Exception as e:
+        print(f"❌ Error during batched ChromaDB query: {e}")
+        traceback.print_exc()
+        return [[] for _ in codes]
+
+
+def is_code_example(item):
+    return item["metadata"].get("source") == "code_example"
+
+
+def context_preamble(items):
+    if not items:
+        return ""
+    blocks = []
+    for item in items:
+        meta = item["metadata"]
+        if is_code_example(item):
+            blocks.append(
+                f"Reference {meta.get('role')} code ({meta.get('topic')}):\n```java\n{item['document']}\n```\n"
+                f"Recommendation: {meta.get('recommendation')}"
+            )
+        else:
+            blocks.append(f"Observation: {item['document']}\nRecommendation: {meta.get('recommendation')}")
+    context_str = "\n\n".join(blocks)
+    return f"Based on the following Observations and Recommendations:\n{context_str}\n\n"
+
+
+def context_used(items):
+    used = []
+    for item in items:
+        entry = {
+            "recommendation": item["metadata"].get("recommendation"),
+            "score": item["score"],
+            "distance": item["distance"]
+        }
+        if is_code_example(item):
+            entry.update(source="code_example", topic=item["metadata"].get("topic"), example=item["document"])
+        else:
+            entry.update(source="observation", observation=item["document"])
+        used.append(entry)
+    return used
+
+
+# --- Code Generation (full file or diff-only) ---
+OUTPUT_MODES = ("full", "diff")
+
+DIFF_INSTRUCTIONS = (
+    "Do not repeat the whole code. Reply with only your changes as a unified diff "
+    "(--- / +++ headers and @@ hunks with 3 unchanged context lines copied exactly from the code above) "
+    "inside a ```diff block, followed by a short explanation of each change."
+)
+
+
+def generate_code_reply(task, code, mode="full", preamble="", session=None):
+    if mode == "diff":
+        prompt = f"{preamble}{task}{code}\n\n{DIFF_INSTRUCTIONS}"
+        result = ollama.generate({"model": CODE_MODEL, "prompt": prompt, "stream": False}, timeout=30, sticky_key=session)
+        reply = result.get("response", "")
+        try:
+            patch = extract_diff(reply)
+            return {"optimized": reply, "patch": patch, "patched": apply_unified_diff(code, patch), "mode": "diff"}
+        except PatchError as e:
+            print(f"⚠️ Diff output did not apply ({e}), falling back to full-file mode")
+
+    prompt = f"{preamble}{task}{code}"
+    result = ollama.generate({"model": CODE_MODEL, "prompt": prompt, "stream": False}, timeout=30, sticky_key=session)
+    return {"optimized": result.get("response"), "mode": "full"}
+
+
+def mode_error(mode, modes=OUTPUT_MODES):
+    if mode not in modes:
+        return jsonify({"error": f"Unknown mode '{mode}', expected one of {', '.join(modes)}"}), 400
+    return None
+
+
+# --- Incremental Java Optimization (per-method results cache) ---
+JAVA_OUTPUT_MODES = OUTPUT_MODES + ("incremental",)
+
+METHODS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "methods": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "id": {"type": "string"},
+                    "findings": {"type": "string"},
+                    "optimized_code": {"type": "string"}
+                },
+                "required": ["id", "findings", "optimized_code"]
+            }
+        }
+    },
+    "required": ["methods"]
+}
+
+# One call generates all changed methods, so its timeout grows with their count
+METHOD_TIMEOUT_BASE = 30
+METHOD_TIMEOUT_PER_METHOD = 15
+
+def method_timeout(count):
+    return METHOD_TIMEOUT_BASE + METHOD_TIMEOUT_PER_METHOD * count
+
+
+# Findings per (normalized method body, class context); on resubmission only
+# changed or new methods go to the LLM
+method_cache = MethodResultCache()
+
+
+def generate_method_findings(methods, skeleton, session=None):
+    context_items = get_relevant_observations("\n\n".join(m["text"] for m in methods))
+    methods_str = "\n\n".join(f"[M{i}] {m['name']}\n{m['text']}" for i, m in enumerate(methods, start=1))
+
+    prompt = (
+        f"{context_preamble(context_items)}"
+        f"The methods below belong to this Java Spring Boot class (method bodies omitted):\n{skeleton}\n\n"
+        f"Performance Optimize each of these methods:\n\n{methods_str}\n\n"
+        f"Return a JSON object with a \"methods\" array holding one entry per method: its id (e.g. M1), "
+        f"findings (the performance issues and why the change helps) and optimized_code "
+        f"(the complete optimized method, or the original method if nothing needs to change)."
+    )
+    payload = {"model": CODE_MODEL, "prompt": prompt, "format": METHODS_SCHEMA, "stream": False, "options": {"temperature": 0}}
+    result = ollama.generate(payload, timeout=method_timeout(len(methods)), sticky_key=session)
+
+    data = json.loads(result.get("response", ""))
+    if not isinstance(data, dict):
+        raise ValueError("Structured output is not a JSON object")
+    entries = {entry.get("id"): entry for entry in data.get("methods", []) if isinstance(entry, dict)}
+    findings = []
+    for i, m in enumerate(methods, start=1):
+        entry = entries.get(f"M{i}")
+        if not entry or not isinstance(entry.get("findings"), str) or not isinstance(entry.get("optimized_code"), str):
+            raise ValueError(f"Structured output is missing method M{i} ({m['name']})")
+        findings.append({"findings": entry["findings"].strip(), "optimized_code": entry["optimized_code"].strip()})
+    return findings, context_items
+
+
+def optimize_java_methods(java_code, session=None):
+    methods, skeleton = split_methods(java_code)
+    if not methods:
+        return optimize_java_code(java_code, "full", session)
+
+    context_fp = context_fingerprint(skeleton, CODE_MODEL)
+    results = {}
+    changed = []
+    for m in methods:
+        cached = method_cache.get(m["fingerprint"], context_fp)
+        if cached:
+            results[m["fingerprint"]] = dict(cached, cached=True)
+        elif m["fingerprint"] not in results:
+            results[m["fingerprint"]] = None
+            changed.append(m)
+
+    print(f"DEBUG: {len(methods)} methods, {len(changed)} changed or new, {len(methods) - len(changed)} reused")
+    context_items = []
+    if changed:
+        try:
+            findings, context_items = generate_method_findings(changed, skeleton, session)
+        except ValueError as e:
+            print(f"⚠️ Per-method output was invalid ({e}), falling back to full-file mode")
+            return optimize_java_code(java_code, "full", session)
+        for m, finding in zip(changed, findings):
+            method_cache.put(m["fingerprint"], context_fp, finding)
+            results[m["fingerprint"]] = dict(finding, cached=False)
+
+    method_results = [dict(results[m["fingerprint"]], name=m["name"], fingerprint=m["fingerprint"]) for m in methods]
+    optimized = "\n\n".join(
+        f"### {r['name']}{' (unchanged, cached)' if r['cached'] else ''}\n{r['findings']}\n```java\n{r['optimized_code']}\n```"
+        for r in method_results
+    )
+    return {
+        "optimized": optimized,
+        "mode": "incremental",
+        "methods": method_results,
+        "generated": len(changed),
+        "reused": len(methods) - len(changed),
+        "context_used": context_used(context_items)
+    }
+
+
 # --- Java Route ---
+def optimize_java_code(java_code, mode="full", session=None, context_items=None):
+    if context_items is None:
+        context_items = get_relevant_observations(java_code)
+    preamble = context_preamble(context_items)
+    print(f"DEBUG: Constructed context for LLaMA:\n{preamble}")
+
+    print("DEBUG: Sending prompt to Ollama...")
+    result = generate_code_reply(
+        "Performance Optimize this Java code for Spring Boot microservice:\n",
+        java_code,
+        mode,
+        preamble=preamble,
+        session=session
+    )
+    print("DEBUG: Received response from Ollama.")
+    return dict(result, context_used=context_used(context_items))
+
+
 @app.route("/optimize-java", methods=["POST"])
 def optimize_java():
     try:
@@ -120,21 +505,22 @@ def optimize_java():
         java_code = data.get("code")
         if not java_code:
             return jsonify({"error": "No code provided"}), 400
-
-        context_pairs = get_relevant_observations(java_code)
-        context_str = "\n\n".join([f"Observation: {obs}\nRecommendation: {rec}" for obs, rec in context_pairs])
-        print(f"DEBUG: Constructed context for LLaMA:\n{context_str}")
-
-        prompt = f"""Based on the following Observations and Recommendations:\n{context_str}\n\nPerformance Optimize this Java code for Spring Boot microservice:\n{java_code}"""
-        payload = {"model": "llama3:8b", "prompt": prompt, "stream": False}
-
-        print("DEBUG: Sending prompt to Ollama...")
-        response = requests.post(OLLAMA_URL, json=payload, timeout=30)
-        response.raise_for_status()
-
-        result = response.json()
-        print("DEBUG: Received response from Ollama.")
-        return jsonify({"optimized": result.get("response")})
+        mode = data.get("mode", "full")
+        error = mode_error(mode, JAVA_OUTPUT_MODES) or admission_error()
+        if error:
+            return error
+
+        min_timeout = None
+        if mode == "incremental":
+            compute = lambda: optimize_java_methods(java_code, session_id())
+            # A first submission generates every method in one call
+            min_timeout = method_timeout(len(split_methods(java_code)[0]))
+        else:
+            compute = lambda: optimize_java_code(java_code, mode, session_id())
+        key = request_key("optimize-java", CODE_MODEL, {"code": java_code, "mode": mode})
+        return jsonify(flight.do(key, admitted(compute, min_timeout=min_timeout), label="optimize-java"))
+    except (Overloaded, OllamaUnavailable) as e:
+        return overloaded(e)
     except requests.exceptions.RequestException as req_err:
         print(f"❌ HTTP Error during Ollama call: {req_err}")
         return jsonify({"error": "Failed to reach Ollama server"}), 500
@@ -146,6 +532,19 @@ def optimize_java():
 
 
 # --- Python Route ---
+def optimize_python_code(python_code, mode="full", session=None, context_items=None):
+    if context_items is None:
+        context_items = get_relevant_observations(python_code, "python")
+    result = generate_code_reply(
+        "Performance Optimize the following Python code and explain any improvements:\n\n",
+        python_code,
+        mode,
+        preamble=context_preamble(context_items),
+        session=session
+    )
+    return dict(result, context_used=context_used(context_items))
+
+
 @app.route("/optimize-python", methods=["POST"])
 def optimize_python():
     data = request.json
@@ -153,19 +552,35 @@ def optimize_python():
     if not python_code:
         return jsonify({"error": "No Python code provided"}), 400
 
-    try:
-        prompt = f"Performance Optimize the following Python code and explain any improvements:\n\n{python_code}"
-
-        payload = {"model": "llama3:8b", "prompt": prompt, "stream": False}
-        response = requests.post(OLLAMA_URL, json=payload, timeout=30)
-        result = response.json()
-        return jsonify({"optimized": result.get("response")})
+    mode = data.get("mode", "full")
+    error = mode_error(mode) or admission_error()
+    if error:
+        return error
 
+    try:
+        key = request_key("optimize-python", CODE_MODEL, {"code": python_code, "mode": mode})
+        compute = admitted(lambda: optimize_python_code(python_code, mode, session_id()))
+        return jsonify(flight.do(key, compute, label="optimize-python"))
+    except (Overloaded, OllamaUnavailable) as e:
+        return overloaded(e)
     except Exception as e:
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
 
 # --- JavaScript Optimization Route ---
+def optimize_js(js_code, mode="full", session=None, context_items=None):
+    if context_items is None:
+        context_items = get_relevant_observations(js_code, "javascript")
+    result = generate_code_reply(
+        "Performance optimize the following JavaScript code and explain the improvements:\n\n",
+        js_code,
+        mode,
+        preamble=context_preamble(context_items),
+        session=session
+    )
+    return dict(result, context_used=context_used(context_items))
+
+
 @app.route("/optimize-js", methods=["POST"])
 def optimize_js_code():
     data = request.json
@@ -173,107 +588,323 @@ def optimize_js_code():
     if not js_code:
         return jsonify({"error": "No JavaScript code provided"}), 400
 
-    try:
-        prompt = f"Performance optimize the following JavaScript code and explain the improvements:\n\n{js_code}"
-        payload = {"model": "llama3:8b", "prompt": prompt, "stream": False}
-        response = requests.post(OLLAMA_URL, json=payload, timeout=30)
-        result = response.json()
-        return jsonify({"optimized": result.get("response")})
+    mode = data.get("mode", "full")
+    error = mode_error(mode) or admission_error()
+    if error:
+        return error
 
+    try:
+        key = request_key("optimize-js", CODE_MODEL, {"code": js_code, "mode": mode})
+        compute = admitted(lambda: optimize_js(js_code, mode, session_id()))
+        return jsonify(flight.do(key, compute, label="optimize-js"))
+    except (Overloaded, OllamaUnavailable) as e:
+        return overloaded(e)
     except Exception as e:
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
     
+# --- Batch Routes (many snippets per call) ---
+BATCH_MAX_ITEMS = int(os.environ.get("BATCH_MAX_ITEMS", "64"))
+BATCH_WORKERS = int(os.environ.get("BATCH_WORKERS", "8"))
+batch_executor = ThreadPoolExecutor(max_workers=BATCH_WORKERS, thread_name_prefix="batch")
+
+BATCH_ROUTES = {
+    "java": ("optimize-java", optimize_java_code),
+    "python": ("optimize-python", optimize_python_code),
+    "javascript": ("optimize-js", optimize_js)
+}
+
+
+def batch_items(data):
+    items = (data or {}).get("items")
+    if not isinstance(items, list) or not items:
+        return None, "Expected a non-empty \"items\" list"
+    if len(items) > BATCH_MAX_ITEMS:
+        return None, f"At most {BATCH_MAX_ITEMS} items per batch"
+    parsed = []
+    for i, item in enumerate(items):
+        if isinstance(item, str):
+            item = {"code": item}
+        if not isinstance(item, dict) or not isinstance(item.get("code"), str) or not item["code"].strip():
+            return None, f"Item {i} has no code"
+        mode = item.get("mode", (data or {}).get("mode", "full"))
+        if mode not in OUTPUT_MODES:
+            return None, f"Item {i}: unknown mode '{mode}', expected one of {', '.join(OUTPUT_MODES)}"
+        parsed.append({"id": item.get("id", i), "code": item["code"], "mode": mode})
+    return parsed, None
+
+
+def run_batch_item(index, item, key, label, compute):
+    entry = {"index": index, "id": item["id"]}
+    try:
+        return dict(flight.do(key, compute, label=label), **entry)
+    except (Overloaded, OllamaUnavailable) as e:
+        return dict(entry, error=str(e), status=e.status, retry_after=e.retry_after)
+    except Exception as e:
+        traceback.print_exc()
+        return dict(entry, error=str(e), status=500)
+
+
+# Retrieval for the whole batch runs once up front; the generations are
+# dispatched concurrently and go through the same admission queues (as
+# batch priority unless X-Priority says otherwise) as single requests.
+# With "stream": true, results are sent as NDJSON lines as they finish.
+def optimize_batch(language):
+    data = request.json
+    items, problem = batch_items(data)
+    if problem:
+        return jsonify({"error": problem}), 400
+    error = admission_error("batch")
+    if error:
+        return error
+
+    endpoint, optimize = BATCH_ROUTES[language]
+    session = session_id()
+    start = time.time()
+    contexts = get_relevant_observations_many([item["code"] for item in items], language)
+    retrieval_ms = round((time.time() - start) * 1000, 1)
+    print(f"DEBUG: Retrieved context for {len(items)} {language} snippets in {retrieval_ms}ms")
+
+    futures = []
+    for index, (item, context_items) in enumerate(zip(items, contexts)):
+        compute = admitted(
+            lambda item=item, context_items=context_items: optimize(item["code"], item["mode"], session, context_items),
+            "batch"
+        )
+        key = request_key(endpoint, CODE_MODEL, {"code": item["code"], "mode": item["mode"]})
+        futures.append(batch_executor.submit(run_batch_item, index, item, key, f"{endpoint}-batch", compute))
+
+    if (data or {}).get("stream"):
+        def lines():
+            for future in as_completed(futures):
+                yield json.dumps(future.result()) + "\n"
+        return Response(lines(), mimetype="application/x-ndjson")
+
+    results = [future.result() for future in futures]
+    return jsonify({
+        "results": results,
+        "items": len(results),
+        "failed": sum(1 for r in results if "error" in r),
+        "retrieval_ms": retrieval_ms
+    })
+
+
+@app.route("/optimize-java/batch", methods=["POST"])
+def optimize_java_batch():
+    return optimize_batch("java")
+
+
+@app.route("/optimize-python/batch", methods=["POST"])
+def optimize_python_batch():
+    return optimize_batch("python")
+
+
+@app.route("/optimize-js/batch", methods=["POST"])
+def optimize_js_batch():
+    return optimize_batch("javascript")
+
+
+# --- Structured Summary (summary + decomposition in one generation) ---
+# Decompositions of recently generated summaries, so /decompose-summary on a
+# summary we produced ourselves needs no second LLM round trip.
+MAX_CACHED_SUMMARIES = 256
+summary_cache = OrderedDict()
+summary_cache_lock = threading.Lock()
+
+
+def generate_structured(prompt, schema, session=None):
+    payload = structured_payload(SUMMARY_MODEL, prompt, schema)
+    result = ollama.generate(payload, timeout=SUMMARY_TIMEOUT, sticky_key=session)
+    return validate_structured_output(result.get("response", ""), schema)
+
+
+def cache_summary(result):
+    with summary_cache_lock:
+        summary_cache[result["summary"]] = {field: result[field] for field in SUMMARY_FIELDS}
+        summary_cache.move_to_end(result["summary"])
+        while len(summary_cache) > MAX_CACHED_SUMMARIES:
+            summary_cache.popitem(last=False)
+
+
+def cached_decomposition(summary_text):
+    with summary_cache_lock:
+        return summary_cache.get(summary_text.strip())
+
+
+def summarize_and_decompose(data, session=None):
+    result = generate_structured(summary_prompt(data), SUMMARY_SCHEMA, session)
+    cache_summary(result)
+    return result
+
+
+def missing_summary_fields(data):
+    return [field for field in SUMMARY_FIELDS if not (data or {}).get(field)]
+
+
+def coalesced_summary(data):
+    fields = {field: data.get(field) for field in SUMMARY_FIELDS}
+    key = request_key("summarize", SUMMARY_MODEL, fields)
+    return flight.do(key, admitted(lambda: summarize_and_decompose(fields, session_id())), label="summarize")
+
+
+# --- Summarize and Decompose in one call ---
+@app.route("/summarize-decompose", methods=["POST"])
+def summarize_decompose():
+    data = request.json
+    missing = missing_summary_fields(data)
+    if missing:
+        return jsonify({"error": f"Missing field(s): {', '.join(missing)}"}), 400
+    error = admission_error()
+    if error:
+        return error
+
+    try:
+        return jsonify(coalesced_summary(data))
+    except (Overloaded, OllamaUnavailable) as e:
+        return overloaded(e)
+    except ValueError as e:
+        print(f"❌ Invalid structured output from Ollama: {e}")
+        return jsonify({"error": f"Invalid model output: {e}"}), 502
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
 # --- Summarize Problem Context ---
 @app.route("/summarize", methods=["POST"])
 def summarize():
     data = request.json
-    prompt = (
-        f"Summarize the following:\n"
-        f"Problem: {data['problem']}\n"
-        f"Impact: {data['impact']}\n"
-        f"Root Cause: {data['rootCause']}\n"
-        f"Fix: {data['fix']}\n\n"
-        f"Summarize this issue in 5 lines."
-    )
-
-    payload = {
-        "model": "llama3",
-        "prompt": prompt,
-        "stream": False
-    }
+    missing = missing_summary_fields(data)
+    if missing:
+        return jsonify({"error": f"Missing field(s): {', '.join(missing)}"}), 400
+    error = admission_error()
+    if error:
+        return error
 
     try:
-        response = requests.post(OLLAMA_URL, json=payload)
-        result = response.json()
-        return jsonify({"summary": result.get("response", "").strip()})
+        return jsonify(coalesced_summary(data))
+    except (Overloaded, OllamaUnavailable) as e:
+        return overloaded(e)
+    except ValueError as e:
+        print(f"❌ Invalid structured output from Ollama: {e}")
+        return jsonify({"error": f"Invalid model output: {e}"}), 502
     except Exception as e:
         return jsonify({"summary": f"Error: {str(e)}"}), 500
-    
+
+
 # --- Decompose Summarized Output ---
 @app.route("/decompose-summary", methods=["POST"])
 def decompose_summary():
     data = request.json
     summary_text = data.get("summary", "")
 
+    cached = cached_decomposition(summary_text)
+    if cached:
+        return jsonify(cached)
+    error = admission_error()
+    if error:
+        return error
+
     prompt = (
         f"The following is a summarized issue:\n\n"
         f"{summary_text}\n\n"
-        f"Extract and return the following in plain text:\n"
-        f"Problem Statement:\nImpact of Problem:\nRoot Cause:\nFix of Problem:\n\n"
-        f"Format the output exactly like:\n"
-        f"Problem: <...>\nImpact: <...>\nRoot Cause: <...>\nFix: <...>"
+        f"Extract the Problem Statement, Impact of Problem, Root Cause and Fix of Problem "
+        f"and return them as a JSON object with the keys problem, impact, rootCause and fix."
     )
 
-    payload = {
-        "model": "llama3",
-        "prompt": prompt,
-        "stream": False
-    }
-
     try:
-        response = requests.post(OLLAMA_URL, json=payload)
-        result = response.json()
-        output = result.get("response", "")
-
-        # Simple parsing logic
-        lines = output.strip().splitlines()
-        parsed = {"problem": "", "impact": "", "rootCause": "", "fix": ""}
-        for line in lines:
-            if line.lower().startswith("problem:"):
-                parsed["problem"] = line.split(":", 1)[-1].strip()
-            elif line.lower().startswith("impact:"):
-                parsed["impact"] = line.split(":", 1)[-1].strip()
-            elif line.lower().startswith("root cause:"):
-                parsed["rootCause"] = line.split(":", 1)[-1].strip()
-            elif line.lower().startswith("fix:"):
-                parsed["fix"] = line.split(":", 1)[-1].strip()
-
-        return jsonify(parsed)
-
+        key = request_key("decompose-summary", SUMMARY_MODEL, summary_text)
+        compute = admitted(lambda: generate_structured(prompt, DECOMPOSE_SCHEMA, session_id()))
+        return jsonify(flight.do(key, compute, label="decompose-summary"))
+    except (Overloaded, OllamaUnavailable) as e:
+        return overloaded(e)
+    except ValueError as e:
+        print(f"❌ Invalid structured output from Ollama: {e}")
+        return jsonify({"error": f"Invalid model output: {e}"}), 502
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
+# --- Admin ---
+@app.route("/admin/reload", methods=["GET", "POST"])
+def admin_reload():
+    if ADMIN_TOKEN and request.headers.get("X-Admin-Token") != ADMIN_TOKEN:
+        return jsonify({"error": "Forbidden"}), 403
+    if not ADMIN_TOKEN and request.remote_addr not in LOCAL_ADDRESSES:
+        return jsonify({"error": "Forbidden: set ADMIN_TOKEN to reload from another host"}), 403
+    if request.method == "GET":
+        return jsonify({"running": reload_lock.locked(), "last": last_reload or None})
+
+    if request.args.get("wait") == "true":
+        result = reload_knowledge_base("admin")
+        if result is None:
+            return jsonify({"error": "A reload is already running"}), 409
+        return jsonify(result)
+
+    if reload_lock.locked():
+        return jsonify({"error": "A reload is already running"}), 409
+    threading.Thread(target=reload_knowledge_base, args=("admin",), name="kb-reload", daemon=True).start()
+    return jsonify({"status": "started"}), 202
+
+
+# --- Metrics ---
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    embedding = {"model": model.stats()}
+    if code_model is not model:
+        embedding["code_model"] = code_model.stats()
+    return jsonify({
+        "single_flight": flight.stats(),
+        "admission": admission.stats(),
+        "ollama": lifecycle.stats(),
+        "method_cache": method_cache.stats(),
+        "embedding": embedding,
+        "knowledge_base": {"observations": kb.stats(), "code_examples": code_kb.stats()}
+    })
+
+
+# --- Background work ---
+# The KB is (re)built in the background; until its new version is swapped
+# in, requests are served from the previous one. Edited sources are
+# re-indexed live, and versions published by knowledge_base.py are followed.
+# Under serve.py only the leader worker rebuilds, watches the sources and
+# manages model residency; every process follows the pointers.
+def start_background(leader=True):
+    watcher = SourceWatcher()
+    if leader:
+        threading.Thread(target=reload_knowledge_base, args=("startup",), name="kb-reload", daemon=True).start()
+        sources = [path for paths in KB_SOURCES.values() for path in paths] + INCIDENT_FILE_PATHS + [DATASET_FILE_PATH]
+        watcher.watch(sources, lambda changed: reload_knowledge_base(f"changed: {', '.join(changed)}"))
+    watcher.watch([kb.pointer_path, code_kb.pointer_path], follow_published_versions)
+    watcher.start()
+    ollama.pool.start()
+    if leader:
+        lifecycle.start()
+
+
+# Called by serve.py in each forked worker. The encoder weights loaded by
+# the master stay shared copy-on-write; what cannot cross a fork is
+# reopened: Chroma's SQLite handles and the executor threads. Followers
+# never drop retired KB versions, and the leader waits for them to follow.
+def after_fork(leader, workers):
+    global client
+    from chromadb.api.client import SharedSystemClient
+    SharedSystemClient.clear_system_cache()
+    client = chromadb.PersistentClient(path=CHROMA_PATH)
+    for store in (kb, code_kb):
+        store.reopen(client, drop_retired=leader)
+        # A follower notices a new pointer within two polls and its
+        # requests hold the old version for at most their deadline
+        store.retire_grace = KB_RETIRE_GRACE or max(ADMISSION_DEADLINES.values()) + 2 * KB_WATCH_INTERVAL
+    for executor in {id(model): model, id(code_model): code_model}.values():
+        executor.after_fork()
+    # The generation slots are shared by all workers
+    admission.concurrency = max(1, -(-admission.concurrency // workers))
+    start_background(leader)
+
+
 # --- Main ---
 if __name__ == "__main__":
-    with app.app_context():
-        try:
-            if os.path.exists(EXCEL_FILE_PATH):
-                pairs = extract_from_excel(EXCEL_FILE_PATH)
-                print(f"DEBUG: Extracted pairs count: {len(pairs)}")
-                for obs, rec in pairs[:3]:
-                    print(f"Observation: {obs}\nRecommendation: {rec}\n")
-                store_in_vector_db(pairs)
-                print(f"DEBUG: Total docs in collection after insert: {collection.count()}")
-            else:
-                print(f"❌ Excel file not found at: {EXCEL_FILE_PATH}")
-        except Exception as e:
-            print(f"❌ Error during data load: {e}", flush=True)
-            traceback.print_exc()
+    start_background()
 
     # Start the Flask app
     app.run(port=5000, debug=True, use_reloader=False)
-
-
-
@@ -2,8 +2,13 @@ import pandas as pd
 import os
 import json
 
+from sheet_export import export_workbook
+
 EXCEL_FILE_PATH = os.path.join("backend", "DATASET1.xlsx")
 OUTPUT_DIR = "output_data"  # Folder to save JSON & CSV files
+# EXPORT_MODE=columnar writes chunked Parquet + JSONL per sheet, in parallel,
+# skipping sheets that did not change since the last export
+EXPORT_MODE = os.environ.get("EXPORT_MODE", "json")
 
 def ensure_output_dir(path):
     if not os.path.exists(path):
@@ -41,4 +46,7 @@ def process_excel_sheets(excel_path, output_dir):
             print(f"Error processing sheet '{sheet_name}': {e}")
 
 if __name__ == "__main__":
-    process_excel_sheets(EXCEL_FILE_PATH, OUTPUT_DIR)
+    if EXPORT_MODE == "columnar":
+        export_workbook(EXCEL_FILE_PATH, OUTPUT_DIR)
+    else:
+        process_excel_sheets(EXCEL_FILE_PATH, OUTPUT_DIR)
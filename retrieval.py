@@ -0,0 +1,223 @@
+import os
+
+import numpy as np
+
+from java_methods import split_methods
+from topics import topic_flags
+
+# Ask Chroma for a pool of candidates, drop the ones that are too far away and
+# keep a diverse top-k of the rest (maximal marginal relevance)
+RETRIEVAL_CANDIDATES = int(os.environ.get("RETRIEVAL_CANDIDATES", "12"))
+RETRIEVAL_TOP_K = int(os.environ.get("RETRIEVAL_TOP_K", "3"))
+# Squared L2 between normalized embeddings (Chroma's default space);
+# 1.4 corresponds to a cosine similarity of 0.3
+RETRIEVAL_MAX_DISTANCE = float(os.environ.get("RETRIEVAL_MAX_DISTANCE", "1.4"))
+MMR_LAMBDA = float(os.environ.get("RETRIEVAL_MMR_LAMBDA", "0.7"))
+
+QUERY_INCLUDE = ["documents", "metadatas", "distances", "embeddings"]
+
+# all-MiniLM-L6-v2 truncates input at 256 word-pieces, so long submissions are
+# embedded as method units / overlapping line windows in one batch
+QUERY_WINDOW_LINES = int(os.environ.get("QUERY_WINDOW_LINES", "30"))
+QUERY_WINDOW_OVERLAP = int(os.environ.get("QUERY_WINDOW_OVERLAP", "10"))
+MAX_QUERY_WINDOWS = int(os.environ.get("MAX_QUERY_WINDOWS", "16"))
+
+# Rank constant of reciprocal rank fusion (60 is the usual choice)
+RRF_K = int(os.environ.get("RETRIEVAL_RRF_K", "60"))
+
+
+def distance_to_score(distance):
+    # Cosine similarity for normalized vectors compared with squared L2
+    return 1 - distance / 2
+
+
+def unpack_query(results, i=0):
+    return {
+        key: results[key][i]
+        for key in ["ids"] + QUERY_INCLUDE
+        if results.get(key) is not None
+    }
+
+
+def mmr(scores, vectors, k, lambda_=MMR_LAMBDA):
+    if not len(scores):
+        return []
+    vectors = np.asarray(vectors, dtype=float)
+    vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    similarity = vectors @ vectors.T
+
+    selected = []
+    remaining = list(range(len(scores)))
+    while remaining and len(selected) < k:
+        def marginal(i):
+            redundancy = max((similarity[i][j] for j in selected), default=0.0)
+            return lambda_ * scores[i] - (1 - lambda_) * redundancy
+        best = max(remaining, key=marginal)
+        selected.append(best)
+        remaining.remove(best)
+    return selected
+
+
+def select_context(result, top_k=RETRIEVAL_TOP_K, max_distance=RETRIEVAL_MAX_DISTANCE, mmr_lambda=MMR_LAMBDA):
+    candidates = [i for i, d in enumerate(result.get("distances", [])) if d <= max_distance]
+    if not candidates:
+        return []
+
+    scores = [distance_to_score(result["distances"][i]) for i in candidates]
+    embeddings = result.get("embeddings")
+    if embeddings is not None and len(embeddings):
+        order = mmr(scores, [embeddings[i] for i in candidates], top_k, mmr_lambda)
+    else:
+        order = sorted(range(len(candidates)), key=lambda j: -scores[j])[:top_k]
+
+    items = []
+    for j in order:
+        i = candidates[j]
+        items.append({
+            "id": result["ids"][i],
+            "document": result["documents"][i],
+            "metadata": result["metadatas"][i] or {},
+            "distance": round(float(result["distances"][i]), 4),
+            "score": round(float(scores[j]), 4)
+        })
+    return items
+
+
+def line_windows(text, size=QUERY_WINDOW_LINES, overlap=QUERY_WINDOW_OVERLAP):
+    lines = [line for line in text.splitlines() if line.strip()]
+    if len(lines) <= size:
+        return ["\n".join(lines)] if lines else []
+    step = max(size - overlap, 1)
+    return ["\n".join(lines[i:i + size]) for i in range(0, len(lines) - overlap, step)]
+
+
+def query_windows(code, language="java", max_windows=MAX_QUERY_WINDOWS):
+    if len(code.splitlines()) <= QUERY_WINDOW_LINES:
+        return [code]
+
+    units = [code]
+    if language == "java":
+        methods, skeleton = split_methods(code)
+        if methods:
+            units = [skeleton] + [m["text"] for m in methods]
+
+    windows = [w for unit in units for w in line_windows(unit)]
+    if len(windows) > max_windows:
+        # Keep an even spread over the whole file
+        picks = np.linspace(0, len(windows) - 1, max_windows).round().astype(int)
+        windows = [windows[i] for i in sorted(set(picks))]
+    return windows or [code]
+
+
+# Merge the per-window results of one batched query into one candidate list,
+# keeping each KB item's best distance over all windows
+def merge_window_results(results, start=0, count=None):
+    count = len(results["ids"]) - start if count is None else count
+    merged = {}
+    for q in range(start, start + count):
+        window = unpack_query(results, q)
+        for i, item_id in enumerate(window["ids"]):
+            best = merged.get(item_id)
+            if best is None or window["distances"][i] < best["distance"]:
+                merged[item_id] = {
+                    "distance": window["distances"][i],
+                    "document": window["documents"][i],
+                    "metadata": window["metadatas"][i],
+                    "embedding": window["embeddings"][i] if "embeddings" in window else None
+                }
+
+    ranked = sorted(merged.items(), key=lambda kv: kv[1]["distance"])
+    result = {
+        "ids": [item_id for item_id, _ in ranked],
+        "documents": [c["document"] for _, c in ranked],
+        "metadatas": [c["metadata"] for _, c in ranked],
+        "distances": [c["distance"] for _, c in ranked]
+    }
+    if all(c["embedding"] is not None for _, c in ranked):
+        result["embeddings"] = [c["embedding"] for _, c in ranked]
+    return result
+
+
+def embed_query(encode, text, language="java"):
+    return [list(map(float, v)) for v in encode(query_windows(text, language))]
+
+
+# where is a Chroma metadata filter, e.g. {"language": "python"}, so a
+# query only scans its own partition of the KB
+def search(collection, vectors, top_k=RETRIEVAL_TOP_K, n_candidates=RETRIEVAL_CANDIDATES, where=None):
+    options = {"where": where} if where else {}
+    results = collection.query(query_embeddings=vectors, n_results=n_candidates, include=QUERY_INCLUDE, **options)
+    return select_context(merge_window_results(results), top_k)
+
+
+# Search the records of the detected topics first (focus is a where
+# filter); the rest of the partition only fills up when they are too few
+def search_focused(collection, vectors, focus=None, top_k=RETRIEVAL_TOP_K, n_candidates=RETRIEVAL_CANDIDATES, where=None):
+    if not focus:
+        return search(collection, vectors, top_k, n_candidates, where)
+    items = search(collection, vectors, top_k, n_candidates, {"$and": [where, focus]} if where else focus)
+    if len(items) >= top_k:
+        return items
+    seen = {item["id"] for item in items}
+    rest = search(collection, vectors, top_k + len(items), n_candidates, where)
+    return items + [item for item in rest if item["id"] not in seen][:top_k - len(items)]
+
+
+# Several snippets in one round trip: all their windows are embedded in
+# one encode call and sent as one multi-query, then split per snippet
+def embed_queries(encode, texts, language="java"):
+    windows = [query_windows(text, language) for text in texts]
+    vectors = [list(map(float, v)) for v in encode([w for group in windows for w in group])]
+    groups, start = [], 0
+    for group in windows:
+        groups.append(vectors[start:start + len(group)])
+        start += len(group)
+    return groups
+
+
+def filter_result(result, keep):
+    picked = [i for i, meta in enumerate(result["metadatas"]) if keep(meta or {})]
+    return {key: [values[i] for i in picked] for key, values in result.items()}
+
+
+# Same preference as search_focused, applied to one shared candidate pool:
+# items of the snippet's topics first, the rest only to fill up
+def select_focused(result, topics=None, top_k=RETRIEVAL_TOP_K):
+    flags = list(topic_flags(topics or []))
+    if not flags:
+        return select_context(result, top_k)
+    on_topic = lambda meta: any(meta.get(flag) for flag in flags)
+    items = select_context(filter_result(result, on_topic), top_k)
+    if len(items) < top_k:
+        items += select_context(filter_result(result, lambda meta: not on_topic(meta)), top_k - len(items))
+    return items
+
+
+def search_many(collection, vector_groups, topics=None, top_k=RETRIEVAL_TOP_K, n_candidates=RETRIEVAL_CANDIDATES,
+                where=None):
+    options = {"where": where} if where else {}
+    vectors = [v for group in vector_groups for v in group]
+    results = collection.query(query_embeddings=vectors, n_results=n_candidates, include=QUERY_INCLUDE, **options)
+    found, start = [], 0
+    for i, group in enumerate(vector_groups):
+        merged = merge_window_results(results, start, len(group))
+        found.append(select_focused(merged, topics[i] if topics else None, top_k))
+        start += len(group)
+    return found
+
+
+def retrieve(encode, collection, text, language="java", top_k=RETRIEVAL_TOP_K, n_candidates=RETRIEVAL_CANDIDATES,
+             where=None):
+    return search(collection, embed_query(encode, text, language), top_k, n_candidates, where)
+
+
+# Reciprocal rank fusion of the results of several indexes: distances of
+# different embedding models are not comparable, ranks are
+def fuse(ranked_lists, top_k=RETRIEVAL_TOP_K, k=RRF_K):
+    fused = {}
+    for items in ranked_lists:
+        for rank, item in enumerate(items):
+            entry = fused.setdefault(item["id"], {"item": item, "rrf": 0.0})
+            entry["rrf"] += 1 / (k + rank + 1)
+    ranked = sorted(fused.values(), key=lambda e: (-e["rrf"], e["item"]["distance"]))
+    return [e["item"] for e in ranked[:top_k]]
@@ -23,6 +23,12 @@ window.onload = function () {
 // });
 
 let selectedLanguage = 'java';
+// Decomposed fields returned alongside the last generated summary
+let lastDecomposition = null;
+
+// Lets the backend route this page's follow-up requests to the same model instance
+const sessionId = Date.now().toString(36) + Math.random().toString(36).slice(2);
+axios.defaults.headers.common['X-Session-Id'] = sessionId;
 
 function setLanguage(lang) {
     selectedLanguage = lang;
@@ -119,9 +125,10 @@ function submitSummary() {
   summaryBox.value = "";
   autoResizeTextarea(summaryBox); // reset height
 
-  axios.post("http://localhost:5000/summarize", data)
+  axios.post("http://localhost:5000/summarize-decompose", data)
     .then((response) => {
       spinner.style.display = "none";
+      lastDecomposition = response.data;
       summaryBox.value = response.data.summary;
       autoResizeTextarea(summaryBox); // resize to fit content
     })
@@ -167,12 +174,7 @@ function decomposeSummary() {
   autoResizeTextarea(decomposedRoot);
   autoResizeTextarea(decomposedFix);
 
-  axios.post("http://localhost:5000/decompose-summary", {
-    summary: summarizedInput
-  })
-  .then((response) => {
-    spinner1.style.display = "none";
-    const data = response.data;
+  const fillDecomposed = (data) => {
     decomposedProblem.value = data.problem || '';
     decomposedImpact.value = data.impact || '';
     decomposedRoot.value = data.rootCause || '';
@@ -182,6 +184,21 @@ function decomposeSummary() {
     autoResizeTextarea(decomposedImpact);
     autoResizeTextarea(decomposedRoot);
     autoResizeTextarea(decomposedFix);
+  };
+
+  // Summary generated in this session: the fields came back with it
+  if (lastDecomposition && lastDecomposition.summary.trim() === summarizedInput) {
+    spinner1.style.display = "none";
+    fillDecomposed(lastDecomposition);
+    return;
+  }
+
+  axios.post("http://localhost:5000/decompose-summary", {
+    summary: summarizedInput
+  })
+  .then((response) => {
+    spinner1.style.display = "none";
+    fillDecomposed(response.data);
   })
   .catch((error) => {
     spinner1.style.display = "none";
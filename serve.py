@@ -0,0 +1,110 @@
+import fcntl
+import importlib
+import os
+import resource
+import time
+
+# Prefork server: the master imports the app once (encoders, Flask app,
+# KB pointers) and forks the workers, so the model weights are shared
+# copy-on-write instead of being loaded once per process
+SERVE_APP = os.environ.get("SERVE_APP", "performanceOptimize:app")
+SERVE_BIND = os.environ.get("SERVE_BIND", "0.0.0.0:5000")
+SERVE_WORKERS = int(os.environ.get("SERVE_WORKERS", "2"))
+SERVE_THREADS = int(os.environ.get("SERVE_THREADS", "8"))
+# Must outlive the longest request deadline (batch: 300s)
+SERVE_TIMEOUT = int(os.environ.get("SERVE_TIMEOUT", "330"))
+# Whoever holds this lock is the leader worker (KB rebuilds, source
+# watching, model residency); a respawned worker takes over a dead leader's lock
+SERVE_LEADER_LOCK = os.environ.get("SERVE_LEADER_LOCK", os.path.join("chroma_store", "serve.leader.lock"))
+
+started_at = time.time()
+preload = {}
+leader_lock = None
+
+
+# Resident memory of this process in MB. Pss splits shared pages among
+# the processes mapping them, so the workers' Pss adds up to real usage
+def process_memory():
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            fields = {}
+            for line in f:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == "kB":
+                    fields[parts[0].rstrip(":")] = int(parts[1])
+        shared = fields.get("Shared_Clean", 0) + fields.get("Shared_Dirty", 0)
+        return {
+            "rss_mb": round(fields.get("Rss", 0) / 1024, 1),
+            "pss_mb": round(fields.get("Pss", 0) / 1024, 1),
+            "shared_mb": round(shared / 1024, 1)
+        }
+    except OSError:
+        # ru_maxrss is the peak, in KB on Linux
+        return {"max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)}
+
+
+def load_app(spec=SERVE_APP):
+    module_name, _, attr = spec.partition(":")
+    start = time.time()
+    module = importlib.import_module(module_name)
+    preload.update(module=module, seconds=round(time.time() - start, 2))
+    print(f"✅ Preloaded {spec} in {preload['seconds']}s ({process_memory()})")
+    return getattr(module, attr or "app")
+
+
+def elect_leader(path=SERVE_LEADER_LOCK):
+    global leader_lock
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    handle = open(path, "a")
+    try:
+        fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        handle.close()
+        return False
+    leader_lock = handle  # held until the worker exits
+    return True
+
+
+def post_fork(server, worker):
+    leader = elect_leader()
+    hook = getattr(preload.get("module"), "after_fork", None)
+    if hook is not None:
+        hook(leader, server.cfg.workers)
+    print(f"✅ Worker {worker.pid} ready{' (leader)' if leader else ''} {round(time.time() - started_at, 2)}s "
+          f"after start: {process_memory()}")
+
+
+def when_ready(server):
+    print(f"DEBUG: Master {os.getpid()} serving {SERVE_APP} on {SERVE_BIND} with {SERVE_WORKERS} workers "
+          f"x {SERVE_THREADS} threads")
+
+
+def main():
+    from gunicorn.app.base import BaseApplication
+
+    class PreforkServer(BaseApplication):
+        def __init__(self, options):
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return load_app()
+
+    PreforkServer({
+        "bind": SERVE_BIND,
+        "workers": SERVE_WORKERS,
+        "worker_class": "gthread",
+        "threads": SERVE_THREADS,
+        "timeout": SERVE_TIMEOUT,
+        "preload_app": True,
+        "post_fork": post_fork,
+        "when_ready": when_ready
+    }).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+import hashlib
+import json
+import os
+import time
+import traceback
+import zipfile
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+
+# Rows written per Parquet row group / JSONL flush, and processes exporting
+# sheets side by side
+EXPORT_CHUNK_ROWS = int(os.environ.get("EXPORT_CHUNK_ROWS", "5000"))
+EXPORT_WORKERS = int(os.environ.get("EXPORT_WORKERS", os.cpu_count() or 1))
+MANIFEST_FILE = "_manifest.json"
+
+NS = {
+    "main": "http://schemas.openxmlformats.org/spreadsheetml/2006/main",
+    "rel": "http://schemas.openxmlformats.org/package/2006/relationships"
+}
+R_ID = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}id"
+
+
+# 1. Per-sheet checksums without loading the cells: an .xlsx is a zip and
+#    every sheet is its own part, whose CRC the zip directory already holds.
+#    Cell text lives in the shared strings part, which all sheets share, so
+#    a sheet's key holds only the strings its cells reference (editing the
+#    text of one sheet re-exports that sheet alone)
+def shared_strings(archive):
+    if "xl/sharedStrings.xml" not in archive.namelist():
+        return []
+    strings = []
+    with archive.open("xl/sharedStrings.xml") as f:
+        for _, elem in ET.iterparse(f):
+            if elem.tag == f"{{{NS['main']}}}si":
+                strings.append("".join(t.text or "" for t in elem.iter(f"{{{NS['main']}}}t")))
+                elem.clear()
+    return strings
+
+
+def referenced_strings(archive, part):
+    indexes = set()
+    with archive.open(part) as f:
+        for _, elem in ET.iterparse(f):
+            if elem.tag == f"{{{NS['main']}}}c":
+                if elem.get("t") == "s":
+                    value = elem.find("main:v", NS)
+                    if value is not None and value.text:
+                        indexes.add(int(value.text))
+                elem.clear()
+    return sorted(indexes)
+
+
+def sheet_checksums(excel_path):
+    if not zipfile.is_zipfile(excel_path):
+        with open(excel_path, "rb") as f:
+            digest = hashlib.sha256(f.read()).hexdigest()
+        import pandas as pd
+        return {sheet: digest for sheet in pd.ExcelFile(excel_path).sheet_names}
+
+    with zipfile.ZipFile(excel_path) as archive:
+        parts = {info.filename: f"{info.CRC}:{info.file_size}" for info in archive.infolist()}
+        workbook = ET.fromstring(archive.read("xl/workbook.xml"))
+        rels = ET.fromstring(archive.read("xl/_rels/workbook.xml.rels"))
+
+        targets = {}
+        for rel in rels.findall("rel:Relationship", NS):
+            target = rel.get("Target").lstrip("/")
+            targets[rel.get("Id")] = target if target.startswith("xl/") else f"xl/{target}"
+        strings = None
+
+        checksums = {}
+        for sheet in workbook.findall("main:sheets/main:sheet", NS):
+            part = targets.get(sheet.get(R_ID))
+            digest = hashlib.sha256(f"{part}|{parts.get(part, '')}".encode("utf-8"))
+            if part in parts:
+                for i in referenced_strings(archive, part):
+                    if strings is None:
+                        strings = shared_strings(archive)
+                    digest.update(f"\0{i}\0{strings[i] if i < len(strings) else ''}".encode("utf-8"))
+            checksums[sheet.get("name")] = digest.hexdigest()[:16]
+    return checksums
+
+
+# Column names as pandas gives them: blank headers become "Unnamed: i",
+# repeated ones get a ".n" suffix
+def column_names(header):
+    names, seen = [], {}
+    for i, value in enumerate(header):
+        name = f"Unnamed: {i}" if value is None or str(value).strip() == "" else str(value)
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+def safe_name(sheet):
+    return "".join(c if c.isalnum() or c in " ._-" else "_" for c in sheet).strip() or "sheet"
+
+
+# File names of the sheets' exports: a sheet keeps the name the manifest
+# gave it, and two sheets that clean up to the same name (B&C, B_C) get
+# distinct ones; compared case-insensitively for Windows/macOS disks
+def output_names(sheets, previous=None):
+    names = {}
+    taken = set()
+    for sheet in sheets:
+        name = (previous or {}).get(sheet)
+        if name and name.lower() not in taken:
+            names[sheet] = name
+            taken.add(name.lower())
+    for sheet in sheets:
+        if sheet in names:
+            continue
+        base = name = safe_name(sheet)
+        n = 2
+        while name.lower() in taken:
+            name = f"{base}_{n}"
+            n += 1
+        names[sheet] = name
+        taken.add(name.lower())
+    return names
+
+
+def cell(value):
+    if value is None:
+        return None
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+# 2. Stream one sheet into <sheet>.parquet (one row group per chunk) and
+#    <sheet>.jsonl; values are stored as text so every chunk shares a schema
+def export_sheet(excel_path, sheet, output_dir, chunk_rows=EXPORT_CHUNK_ROWS, name=None):
+    from openpyxl import load_workbook
+    # Parquet is optional; without pyarrow only the JSONL file is written
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        pa = None
+
+    start = time.time()
+    base = os.path.join(output_dir, name or safe_name(sheet))
+    workbook = load_workbook(excel_path, read_only=True, data_only=True)
+    writer = None
+    rows = 0
+    try:
+        lines = workbook[sheet].iter_rows(values_only=True)
+        columns = column_names(next(lines, ()))
+        schema = pa.schema([(c, pa.string()) for c in columns]) if pa is not None else None
+
+        with open(f"{base}.jsonl.tmp", "w", encoding="utf-8") as jsonl:
+            chunk = []
+            for values in lines:
+                if all(v is None for v in values):
+                    continue
+                values = list(values[:len(columns)]) + [None] * (len(columns) - len(values))
+                chunk.append([cell(v) for v in values])
+                if len(chunk) >= chunk_rows:
+                    writer = write_chunk(chunk, columns, jsonl, writer, schema, f"{base}.parquet.tmp")
+                    rows += len(chunk)
+                    chunk = []
+            if chunk or writer is None:
+                writer = write_chunk(chunk, columns, jsonl, writer, schema, f"{base}.parquet.tmp")
+                rows += len(chunk)
+    finally:
+        workbook.close()
+        if writer is not None:
+            writer.close()
+
+    files = [f"{base}.jsonl"]
+    os.replace(f"{base}.jsonl.tmp", f"{base}.jsonl")
+    if pa is not None:
+        os.replace(f"{base}.parquet.tmp", f"{base}.parquet")
+        files.append(f"{base}.parquet")
+    return {
+        "sheet": sheet,
+        "name": os.path.basename(base),
+        "rows": rows,
+        "columns": columns,
+        "files": [os.path.basename(f) for f in files],
+        "seconds": round(time.time() - start, 3)
+    }
+
+
+def write_chunk(chunk, columns, jsonl, writer, schema, parquet_path):
+    for values in chunk:
+        jsonl.write(json.dumps(dict(zip(columns, values)), ensure_ascii=False))
+        jsonl.write("\n")
+    if schema is None:
+        return writer
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    if writer is None:
+        writer = pq.ParquetWriter(parquet_path, schema, compression="zstd")
+    table = pa.Table.from_arrays([pa.array([row[i] for row in chunk], pa.string()) for i in range(len(columns))],
+                                 schema=schema)
+    writer.write_table(table)
+    return writer
+
+
+def _export_task(args):
+    excel_path, sheet, output_dir, chunk_rows, name = args
+    try:
+        return export_sheet(excel_path, sheet, output_dir, chunk_rows, name)
+    except Exception as e:
+        traceback.print_exc()
+        return {"sheet": sheet, "error": str(e)}
+
+
+def load_manifest(output_dir):
+    try:
+        with open(os.path.join(output_dir, MANIFEST_FILE), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(output_dir, manifest):
+    path = os.path.join(output_dir, MANIFEST_FILE)
+    with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    os.replace(f"{path}.tmp", path)
+
+
+# 3. Export every changed sheet, several at a time; the manifest records
+#    each sheet's checksum and files so unchanged sheets are skipped
+def export_workbook(excel_path, output_dir, workers=EXPORT_WORKERS, chunk_rows=EXPORT_CHUNK_ROWS, force=False):
+    if not os.path.exists(excel_path):
+        print(f"ERROR: Excel file not found at: {os.path.abspath(excel_path)}")
+        return None
+
+    start = time.time()
+    os.makedirs(output_dir, exist_ok=True)
+    checksums = sheet_checksums(excel_path)
+    manifest = load_manifest(output_dir)
+    sheets = manifest.get("sheets", {})
+    names = output_names(checksums, {sheet: entry.get("name") for sheet, entry in sheets.items()})
+
+    def up_to_date(sheet):
+        entry = sheets.get(sheet)
+        return (not force and entry is not None and entry.get("checksum") == checksums[sheet]
+                and entry.get("name") == names[sheet]
+                and all(os.path.exists(os.path.join(output_dir, f)) for f in entry["files"]))
+
+    todo = [sheet for sheet in checksums if not up_to_date(sheet)]
+    tasks = [(excel_path, sheet, output_dir, chunk_rows, names[sheet]) for sheet in todo]
+    workers = max(1, min(workers, len(tasks)))
+    if workers == 1:
+        results = [_export_task(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_export_task, tasks))
+
+    for sheet, result in zip(todo, results):
+        if "error" in result:
+            print(f"❌ Sheet '{sheet}' not exported: {result['error']}")
+            continue
+        sheets[sheet] = dict(result, checksum=checksums[sheet])
+
+    manifest = {"source": os.path.abspath(excel_path), "sheets": {s: sheets[s] for s in checksums if s in sheets}}
+    save_manifest(output_dir, manifest)
+
+    report = {
+        "sheets": len(checksums),
+        "exported": sum(1 for r in results if "error" not in r),
+        "skipped": len(checksums) - len(todo),
+        "failed": sum(1 for r in results if "error" in r),
+        "rows": sum(r.get("rows", 0) for r in results),
+        "seconds": round(time.time() - start, 3)
+    }
+    print(f"✅ Exported {report['exported']} sheets ({report['rows']} rows), skipped {report['skipped']} unchanged, "
+          f"with {workers} processes in {report['seconds']}s")
+    return report
+
+
+# 4. Read an exported sheet back: Parquet when available, JSONL otherwise
+def read_exported_sheet(output_dir, sheet):
+    import pandas as pd
+    entry = load_manifest(output_dir).get("sheets", {}).get(sheet, {})
+    base = os.path.join(output_dir, entry.get("name") or safe_name(sheet))
+    if os.path.exists(f"{base}.parquet"):
+        try:
+            return pd.read_parquet(f"{base}.parquet")
+        except ImportError:
+            pass
+    return pd.read_json(f"{base}.jsonl", lines=True, dtype=False)
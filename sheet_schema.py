@@ -0,0 +1,152 @@
+import json
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+
+import Levenshtein
+import pandas as pd
+
+OBS_KEYS = ["Scenarios", "Observation", "Dependencies / Checklists", "Checklist", "Recommendation", "Section"]
+REC_KEYS = ["Sample Code", "Recommendation / Sample Code", "Sample Config", "Conclusion", "Example", "Details"]
+THRESHOLD = 0.7
+
+# Sheets are parsed by this many processes; resolved column mappings are
+# kept per header signature in SCHEMA_CACHE_PATH across loads
+XL_PARSE_WORKERS = int(os.environ.get("XL_PARSE_WORKERS", os.cpu_count() or 1))
+SCHEMA_CACHE_PATH = os.environ.get("XL_SCHEMA_CACHE", ".xl_schema_cache.json")
+# Below this size starting processes costs more than it saves
+XL_PARALLEL_MIN_BYTES = int(os.environ.get("XL_PARALLEL_MIN_BYTES", str(1024 * 1024)))
+
+
+def normalize_header(h):
+    return h.strip().lower().replace("/", " ").replace("-", " ").replace("_", " ")
+
+
+def fuzzy_match(col, keys):
+    col = normalize_header(col)
+    keys = [normalize_header(k) for k in keys]
+    return max((Levenshtein.ratio(col, k) for k in keys), default=0)
+
+
+def find_column(columns, keys):
+    best_col = None
+    best_score = 0
+    for i, col in enumerate(columns):
+        score = fuzzy_match(str(col), keys)
+        if score > best_score and score >= THRESHOLD:
+            best_col = i
+            best_score = score
+    return best_col
+
+
+def header_signature(columns):
+    return "|".join(normalize_header(str(c)) for c in columns)
+
+
+# 1. Column positions for a header layout; identical layouts (the same
+#    headers in the same order) reuse the mapping instead of fuzzy matching
+def resolve_columns(columns, cache):
+    signature = header_signature(columns)
+    if signature in cache:
+        return cache[signature], True
+    mapping = {
+        "observation": find_column(columns, OBS_KEYS),
+        "recommendation": find_column(columns, REC_KEYS),
+        "description": next((i for i, c in enumerate(columns) if c == "Description"), None)
+    }
+    cache[signature] = mapping
+    return mapping, False
+
+
+def parse_sheet(excel_path, sheet, cache):
+    start = time.time()
+    df = pd.read_excel(excel_path, sheet_name=sheet)
+    columns = list(df.columns)
+    mapping, cached = resolve_columns(columns, cache)
+    obs_col, rec_col, desc_col = mapping["observation"], mapping["recommendation"], mapping["description"]
+
+    pairs = []
+    if obs_col is not None and rec_col is not None:
+        df = df.iloc[:, [obs_col, rec_col] + ([desc_col] if desc_col is not None else [])]
+        df = df.dropna(subset=[columns[obs_col], columns[rec_col]])
+        for row in df.itertuples(index=False):
+            desc = str(row[2]) if desc_col is not None else ""
+            pairs.append((str(row[0]), str(row[1]), sheet, desc))
+
+    report = {
+        "sheet": sheet,
+        "observation": None if obs_col is None else str(columns[obs_col]),
+        "recommendation": None if rec_col is None else str(columns[rec_col]),
+        "description": None if desc_col is None else str(columns[desc_col]),
+        "rows": len(pairs),
+        "cached_mapping": cached,
+        "seconds": round(time.time() - start, 3)
+    }
+    return pairs, report, header_signature(columns), mapping
+
+
+# Worker processes keep their own cache, seeded with the known mappings
+_worker_cache = {}
+
+
+def _init_worker(known):
+    _worker_cache.update(known)
+
+
+def _parse_sheet_task(args):
+    excel_path, sheet = args
+    try:
+        return parse_sheet(excel_path, sheet, _worker_cache)
+    except Exception as e:
+        traceback.print_exc()
+        return [], {"sheet": sheet, "error": str(e)}, None, None
+
+
+def load_cache(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_cache(path, cache):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(cache, f)
+    os.replace(tmp, path)
+
+
+# 2. Parse every sheet of a workbook, in parallel when there are several;
+#    returns (observation, recommendation, sheet, description) tuples in
+#    sheet order and one report per sheet
+def extract_workbook(excel_path, workers=XL_PARSE_WORKERS, cache_path=SCHEMA_CACHE_PATH,
+                     min_parallel_bytes=XL_PARALLEL_MIN_BYTES):
+    start = time.time()
+    sheets = pd.ExcelFile(excel_path).sheet_names
+    cache = load_cache(cache_path) if cache_path else {}
+    tasks = [(excel_path, sheet) for sheet in sheets]
+
+    if os.path.getsize(excel_path) < min_parallel_bytes:
+        workers = 1
+    workers = max(1, min(workers, len(sheets)))
+    if workers == 1:
+        _worker_cache.update(cache)
+        results = [_parse_sheet_task(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(cache,)) as pool:
+            results = list(pool.map(_parse_sheet_task, tasks))
+
+    all_pairs, reports = [], []
+    for pairs, report, signature, mapping in results:
+        all_pairs.extend(pairs)
+        reports.append(report)
+        if signature is not None:
+            cache[signature] = mapping
+    if cache_path:
+        save_cache(cache_path, cache)
+
+    print(f"Parsed {len(sheets)} sheets ({len(all_pairs)} rows) with {workers} processes "
+          f"in {time.time() - start:.2f}s")
+    return all_pairs, reports
@@ -0,0 +1,73 @@
+import hashlib
+import json
+import threading
+
+
+# In-flight call shared by the leader and any duplicate requests
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+# Coalesce identical concurrent requests onto one computation: the first
+# caller for a key runs the function, callers arriving with the same key
+# while it runs wait for it and share its result (or error).
+class SingleFlight:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.counters = {}
+
+    def do(self, key, fn, label="default"):
+        with self.lock:
+            counters = self.counters.setdefault(label, {"executed": 0, "coalesced": 0})
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self.calls[key] = call
+                counters["executed"] += 1
+            else:
+                counters["coalesced"] += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.done.set()
+        return call.result
+
+    def stats(self):
+        with self.lock:
+            return {
+                "in_flight": len(self.calls),
+                "endpoints": {label: dict(c) for label, c in self.counters.items()}
+            }
+
+
+def normalize_text(text):
+    # Trailing spaces and blank lines do not change the answer; indentation
+    # is kept because it is significant in Python
+    lines = (line.rstrip() for line in str(text).splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+def request_key(endpoint, model, payload):
+    if isinstance(payload, dict):
+        payload = {k: normalize_text(v) if isinstance(v, str) else v for k, v in payload.items()}
+    else:
+        payload = normalize_text(payload)
+    raw = json.dumps([endpoint, model, payload], sort_keys=True)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
@@ -16,6 +16,8 @@ CORS(app)
 
 OLLAMA_URL = "http://localhost:11434/api/generate"
 EXCEL_FILE_PATH = os.path.join("backend", "FinalDataset.xlsx")
+# INGEST_MODE=stream reads the workbook in bounded batches (see ingest_stream.py)
+INGEST_MODE = os.environ.get("INGEST_MODE", "batch")
 
 # Initialize model and ChromaDB
 model = SentenceTransformer("all-MiniLM-L6-v2")
@@ -257,8 +259,12 @@ def print_test():
 if __name__ == "__main__":
     with app.app_context():
         try:
-            pairs = extract_from_excel(EXCEL_FILE_PATH)
-            store_in_vector_db(pairs)
+            if INGEST_MODE == "stream":
+                from ingest_stream import stream_ingest
+                stream_ingest(EXCEL_FILE_PATH, collection, model.encode)
+            else:
+                pairs = extract_from_excel(EXCEL_FILE_PATH)
+                store_in_vector_db(pairs)
             print(f"✅ Total records in collection: {collection.count()}", flush=True)
         except Exception as e:
             print(f"❌ Error during data load: {e}", flush=True)
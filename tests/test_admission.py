@@ -0,0 +1,92 @@
+import threading
+import time
+
+import pytest
+
+from admission import AdmissionController, Overloaded
+
+
+def occupy(controller, priority="interactive"):
+    # Hold a slot until the returned event is set
+    release = threading.Event()
+    started = threading.Event()
+
+    def work():
+        started.set()
+        release.wait()
+
+    thread = threading.Thread(target=controller.run, args=(priority, controller.deadline_for(priority), work))
+    thread.start()
+    started.wait()
+    return release, thread
+
+
+def queue_request(controller, priority, order, timeout=None):
+    def run():
+        try:
+            controller.run(priority, controller.deadline_for(priority, timeout), lambda: order.append(priority))
+        except Overloaded as e:
+            order.append(e.status)
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+
+def wait_for_queued(controller, count):
+    while sum(len(q) for q in controller.queues.values()) < count:
+        time.sleep(0.001)
+
+
+def test_interactive_requests_overtake_batch_work():
+    controller = AdmissionController(1, deadlines={"interactive": 60, "batch": 60})
+    controller.service_seconds = 0.01
+    release, holder = occupy(controller)
+    order = []
+    batch = queue_request(controller, "batch", order)
+    wait_for_queued(controller, 1)
+    interactive = queue_request(controller, "interactive", order)
+    wait_for_queued(controller, 2)
+
+    release.set()
+    for thread in (holder, batch, interactive):
+        thread.join()
+    assert order == ["interactive", "batch"]
+    assert controller.stats()["running"] == 0
+
+
+def test_request_that_cannot_meet_its_deadline_is_refused_with_retry_after():
+    controller = AdmissionController(1)
+    controller.service_seconds = 20
+    release, holder = occupy(controller)
+    with pytest.raises(Overloaded) as refused:
+        controller.run("interactive", controller.deadline_for("interactive", 5), lambda: None)
+    release.set()
+    holder.join()
+    assert refused.value.status == 503 and refused.value.retry_after == 20
+    assert controller.stats()["classes"]["interactive"]["rejected_deadline"] == 1
+
+
+def test_full_queue_answers_429():
+    controller = AdmissionController(1, queue_limits={"batch": 0})
+    release, holder = occupy(controller)
+    with pytest.raises(Overloaded) as refused:
+        controller.run("batch", controller.deadline_for("batch"), lambda: None)
+    release.set()
+    holder.join()
+    assert refused.value.status == 429
+
+
+def test_expired_requests_leave_the_queue():
+    controller = AdmissionController(1)
+    controller.service_seconds = 0.01
+    release, holder = occupy(controller)
+    order = []
+    waiting = queue_request(controller, "interactive", order, timeout=0.05)
+    waiting.join()
+    assert order == [503]
+    assert not controller.queues["interactive"]
+    release.set()
+    holder.join()
+    stats = controller.stats()
+    assert stats["classes"]["interactive"]["expired"] == 1 and stats["running"] == 0
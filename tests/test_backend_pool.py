@@ -0,0 +1,91 @@
+import time
+
+import requests
+
+import ollama_client
+from ollama_client import BackendPool
+
+URLS = "http://a:1,http://b:2/api/generate"
+
+
+class FakeResponse:
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+def probe_returns(monkeypatch, status_code):
+    monkeypatch.setattr(ollama_client.requests, "get", lambda *args, **kwargs: FakeResponse(status_code))
+
+
+def probe_fails(monkeypatch):
+    def get(*args, **kwargs):
+        raise requests.exceptions.ConnectionError("down")
+    monkeypatch.setattr(ollama_client.requests, "get", get)
+
+
+def fail(pool, backend, times):
+    for _ in range(times):
+        pool.acquire(exclude=[b for b in pool.backends if b is not backend])
+        pool.release(backend, ok=False)
+
+
+def test_least_outstanding_balancing():
+    pool = BackendPool(URLS)
+    first = pool.acquire()
+    second = pool.acquire()
+    assert first is not second
+    pool.release(first, ok=True)
+    assert pool.acquire() is first
+
+
+def test_sticky_routing():
+    pool = BackendPool(URLS)
+    backend = pool.acquire(sticky_key="s1")
+    pool.acquire()  # the other backend is now equally loaded
+    assert pool.acquire(sticky_key="s1") is backend
+
+
+def test_ejection_after_repeated_failures():
+    pool = BackendPool(URLS, max_failures=3, eject_seconds=300)
+    bad = pool.backends[0]
+    fail(pool, bad, 3)
+    assert not bad.available(time.time())
+    assert all(pool.acquire() is pool.backends[1] for _ in range(3))
+
+
+def test_healthy_probe_does_not_readmit_before_eject_seconds(monkeypatch):
+    pool = BackendPool(URLS, max_failures=3, eject_seconds=300)
+    bad = pool.backends[0]
+    fail(pool, bad, 3)
+
+    probe_returns(monkeypatch, 200)
+    pool.health_check()
+    assert not bad.available(time.time())
+    assert bad.failures == 3
+
+
+def test_readmitted_backend_is_ejected_again_on_next_failure(monkeypatch):
+    pool = BackendPool(URLS, max_failures=3, eject_seconds=300)
+    bad = pool.backends[0]
+    fail(pool, bad, 3)
+
+    bad.ejected_until = time.time() - 1
+    probe_returns(monkeypatch, 200)
+    pool.health_check()
+    assert bad.available(time.time())
+
+    fail(pool, bad, 1)
+    assert not bad.available(time.time())
+
+
+def test_probe_failures_eject_without_touching_request_counters(monkeypatch):
+    pool = BackendPool(URLS, max_failures=2, eject_seconds=300)
+    probe_fails(monkeypatch)
+    pool.health_check()
+    pool.health_check()
+
+    for backend in pool.backends:
+        assert not backend.available(time.time())
+        assert backend.errors == 0
+        assert backend.failures == 0
+        assert backend.probe_failures == 2
@@ -0,0 +1,65 @@
+import json
+import os
+
+from code_examples import extract_code_examples, looks_like_code
+
+DATASET = os.path.join(os.path.dirname(__file__), "..", "DataSet.json")
+
+
+DATA = {
+    "SecureRandom": {
+        "overview": "SecureRandom can block when entropy is low.",
+        "issue": {
+            "problematic_code": "public String url() {\n    SecureRandom r = new SecureRandom();\n    return pick(r);\n}",
+            "recommendation": "Use the discovery client instead.",
+            "recommended_code": "public String url() {\n    return discoveryClient.next();\n}",
+        },
+    },
+    "Loggers": [
+        {"recommendation": "Log errors in catch blocks.", "example": "catch(Exception e){\n  LOGGER.error(\"x\", e);\n}"},
+        {"recommendation": "Avoid System.out.", "example": "Instead of System.out.println(), use a logger."},
+    ],
+    "kafka": [{"configuration": {"checklist": "Config", "sample_config": "spring:\n  kafka:\n    acks: 1"}}],
+}
+
+
+def test_only_java_snippets_are_extracted():
+    examples = extract_code_examples(DATA)
+    assert [e["path"] for e in examples] == [
+        "SecureRandom/issue/problematic_code",
+        "SecureRandom/issue/recommended_code",
+        "Loggers/0/example",
+    ]
+
+
+def test_examples_link_to_topic_role_and_nearest_recommendation():
+    problematic, recommended, logger = extract_code_examples(DATA)
+    assert problematic["topic"] == "SecureRandom" and problematic["role"] == "problematic"
+    assert recommended["role"] == "recommended"
+    assert problematic["recommendation"] == "Use the discovery client instead."
+    assert logger["recommendation"] == "Log errors in catch blocks."
+
+
+def test_ids_are_stable():
+    assert [e["id"] for e in extract_code_examples(DATA)] == [e["id"] for e in extract_code_examples(DATA)]
+
+
+def test_config_and_xml_are_not_code():
+    assert not looks_like_code("spring:\n  datasource:\n    url: jdbc:oracle:thin")
+    assert not looks_like_code("<dependency>\n  <artifactId>spring-kafka</artifactId>\n</dependency>")
+
+
+def test_shipped_dataset_examples():
+    with open(DATASET, "r", encoding="utf-8") as f:
+        examples = {e["path"]: e for e in extract_code_examples(json.load(f))}
+
+    resilience = examples["Resilience4j/0/ImplementationExample/Method"]["code"]
+    assert resilience.startswith("public ResponseEntity<String> getConnectHost(") and "circuitBreakerFactory.create" in resilience
+    assert "Resilience4j/0/ImplementationExample/Implementation" not in examples
+    rest = examples["RestTemplate/0/usage/standard/code"]
+    assert "this.restTemplate.exchange(" in rest["code"] and rest["recommendation"].startswith("RestTemplate is provided")
+    assert "RestTemplate/0/usage/custom/code" in examples
+    assert examples["MDCThreadPoolExecutor/0/CodeComparison/OldCode"]["role"] == "problematic"
+    assert examples["MDCThreadPoolExecutor/0/CodeComparison/UpdatedCode"]["role"] == "recommended"
+    # pom.xml / application.yml snippets stay out
+    assert not any("ChecklistTable" in path for path in examples)
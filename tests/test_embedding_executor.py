@@ -0,0 +1,77 @@
+import threading
+
+import numpy as np
+import pytest
+
+from embedding_executor import EmbeddingExecutor
+
+
+class SlowEncoder:
+    signature = "fake:test"
+
+    def __init__(self):
+        self.calls = []
+        self.release = threading.Event()
+
+    def encode(self, texts, **kwargs):
+        self.calls.append(list(texts))
+        self.release.wait(5)
+        return np.array([[float(len(t)), 1.0] for t in texts])
+
+
+def test_single_text_and_list_keep_their_shapes():
+    encoder = SlowEncoder()
+    encoder.release.set()
+    executor = EmbeddingExecutor(encoder, window_ms=0, threads=0)
+    assert executor.encode("abc").tolist() == [3.0, 1.0]
+    assert executor.encode(["a", "bb"]).tolist() == [[1.0, 1.0], [2.0, 1.0]]
+
+
+def test_concurrent_calls_are_batched_and_results_routed_back():
+    encoder = SlowEncoder()
+    executor = EmbeddingExecutor(encoder, window_ms=50, threads=0)
+    # The first call occupies the encoder while the others queue up
+    results = {}
+    threads = [threading.Thread(target=lambda t=t: results.__setitem__(t, executor.encode(t)))
+               for t in ["x", "yy", "zzz", "wwww"]]
+    threads[0].start()
+    while not encoder.calls:
+        pass
+    for t in threads[1:]:
+        t.start()
+    while executor.queue.qsize() < 3:
+        pass
+    encoder.release.set()
+    for t in threads:
+        t.join()
+
+    assert {t: r[0] for t, r in results.items()} == {"x": 1.0, "yy": 2.0, "zzz": 3.0, "wwww": 4.0}
+    assert len(encoder.calls) == 2
+    stats = executor.stats()
+    assert stats["requests"] == 4 and stats["batches"] == 2
+    assert stats["queue_wait_ms"]["max"] > 0
+
+
+def test_errors_reach_every_caller():
+    class Failing:
+        signature = "fake:fail"
+
+        def encode(self, texts, **kwargs):
+            raise RuntimeError("boom")
+
+    executor = EmbeddingExecutor(Failing(), window_ms=0, threads=0)
+    with pytest.raises(RuntimeError, match="boom"):
+        executor.encode("x")
+
+
+def test_after_fork_starts_a_fresh_thread():
+    encoder = SlowEncoder()
+    encoder.release.set()
+    executor = EmbeddingExecutor(encoder, window_ms=0, threads=0)
+    executor.encode(["a"])
+    parent_thread = executor.thread
+
+    executor.after_fork()
+    assert executor.thread is None and executor.stats()["requests"] == 0
+    assert executor.encode(["abc"]).tolist() == [[3.0, 1.0]]
+    assert executor.thread is not parent_thread
@@ -0,0 +1,61 @@
+import numpy as np
+
+from bench_encoders import neighbour_recall
+from encoders import Encoder, open_collection
+
+
+class FakeEncoder(Encoder):
+    backend = "fake"
+
+    def load(self):
+        return None
+
+
+class FakeCollection:
+    def __init__(self, metadata=None, count=0):
+        self.metadata = metadata
+        self._count = count
+
+    def count(self):
+        return self._count
+
+
+class FakeClient:
+    def __init__(self, existing):
+        self.existing = existing
+        self.deleted = []
+
+    def get_or_create_collection(self, name):
+        return self.existing
+
+    def delete_collection(self, name):
+        self.deleted.append(name)
+
+    def create_collection(self, name, metadata=None):
+        return FakeCollection(metadata)
+
+
+def test_collection_with_same_signature_is_kept():
+    existing = FakeCollection({"embedding": "m:fake"}, count=10)
+    client = FakeClient(existing)
+    assert open_collection(client, "kb", FakeEncoder("m").signature) is existing
+    assert client.deleted == []
+
+
+def test_collection_from_another_encoder_is_reindexed():
+    client = FakeClient(FakeCollection({"embedding": "m:torch"}, count=10))
+    collection = open_collection(client, "kb", FakeEncoder("m").signature)
+    assert client.deleted == ["kb"]
+    assert collection.metadata == {"embedding": "m:fake"}
+
+
+def test_identical_vectors_have_full_recall():
+    corpus = np.eye(4)
+    queries = np.array([[1.0, 0.1, 0, 0], [0, 0, 1.0, 0.2]])
+    assert neighbour_recall(corpus, queries, corpus, queries, k=2) == 1.0
+
+
+def test_recall_drops_when_neighbours_change():
+    corpus = np.eye(2)
+    queries = np.array([[1.0, 0.0]])
+    assert neighbour_recall(corpus, queries, corpus, np.array([[0.0, 1.0]]), k=1) == 0.0
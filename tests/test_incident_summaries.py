@@ -0,0 +1,81 @@
+import threading
+
+import pandas as pd
+
+from incident_summaries import (INCIDENT_SHEET, Checkpoint, dedup_incidents, find_incident_header,
+                                read_incident_summaries, read_incidents, run_pipeline)
+
+
+def write_workbook(path):
+    incidents = pd.DataFrame({
+        "Problem Statement": ["Slow page", "Slow page", "Timeouts", "Leak"],
+        "Impact": ["Users wait", "Users  wait", "Errors", None],
+        "Root Cause": ["N+1 queries", "N+1 queries", "No pool", "Cache"],
+        "Fix": ["Join fetch", "Join fetch", "Add pool", "Evict"]
+    })
+    with pd.ExcelWriter(path) as writer:
+        incidents.to_excel(writer, sheet_name="2024", index=False)
+        pd.DataFrame({"Observation": ["x"]}).to_excel(writer, sheet_name="Notes", index=False)
+
+
+def fake_summarize(calls, fail=()):
+    lock = threading.Lock()
+
+    def summarize(data):
+        with lock:
+            calls.append(data["problem"])
+        if data["problem"] in fail:
+            raise ValueError("invalid model output")
+        return {"summary": f"Summary of {data['problem']}", "problem": data["problem"], "impact": data["impact"],
+                "rootCause": data["rootCause"], "fix": data["fix"]}
+    return summarize
+
+
+def test_header_matches_known_column_names():
+    assert find_incident_header(["#", "Problem", "Impact of problem", "Root-Cause", "Resolution"]) == {
+        "problem": 1, "impact": 2, "rootCause": 3, "fix": 4
+    }
+    assert find_incident_header(["Problem", "Impact", "Fix"]) is None
+
+
+def test_identical_incidents_are_summarized_once(tmp_path):
+    book = tmp_path / "incidents.xlsx"
+    write_workbook(book)
+    incidents = dedup_incidents(read_incidents(str(book)))
+    assert [i["occurrences"] for i in incidents] == [["2024!2", "2024!3"], ["2024!4"]]
+
+
+def test_rerun_skips_checkpointed_incidents_and_retries_failures(tmp_path):
+    book = tmp_path / "incidents.xlsx"
+    write_workbook(book)
+    checkpoint = str(tmp_path / "done.jsonl")
+
+    calls = []
+    report = run_pipeline(str(book), fake_summarize(calls, fail={"Timeouts"}), checkpoint, workers=2)
+    assert report["duplicates"] == 1 and report["summarized"] == 1 and report["failed"] == 1
+    with open(checkpoint, "a") as f:
+        f.write('{"id": "inc_cut')  # a crash mid-write
+
+    calls = []
+    report = run_pipeline(str(book), fake_summarize(calls), checkpoint, str(tmp_path / "out.parquet"), workers=2)
+    assert calls == ["Timeouts"] and report["skipped"] == 1 and report["written"] == 2
+    assert len(Checkpoint(checkpoint).done) == 2
+
+    sheet = pd.read_excel(book, sheet_name=INCIDENT_SHEET)
+    assert sheet["Occurrences"].tolist() == ["2024!2; 2024!3", "2024!4"]
+    assert pd.read_parquet(tmp_path / "out.parquet")["Summary"].tolist() == sheet["Summary"].tolist()
+    # The summary sheet is output, never input
+    assert len(read_incidents(str(book))) == 3
+
+
+def test_summaries_become_kb_rows(tmp_path):
+    book = tmp_path / "incidents.xlsx"
+    write_workbook(book)
+    assert read_incident_summaries(str(book)) == []
+    run_pipeline(str(book), fake_summarize([]), str(tmp_path / "done.jsonl"), workers=1)
+
+    rows = read_incident_summaries(str(book))
+    assert rows[0] == {
+        "observation": "Slow page Root cause: N+1 queries", "recommendation": "Join fetch", "topic": "Incidents",
+        "source": "incident", "summary": "Summary of Slow page", "language": "java"
+    }
@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from ingest_stream import StreamingIngest, stream_ingest, stream_rows
+
+
+class FakeCollection:
+    def __init__(self):
+        self.ids = []
+
+    def upsert(self, ids, documents, metadatas, embeddings):
+        self.ids.extend(ids)
+
+
+def encode(texts):
+    return np.ones((len(texts), 3))
+
+
+def write_workbook(path, sheets):
+    with pd.ExcelWriter(path) as writer:
+        for name, rows in sheets.items():
+            pd.DataFrame(rows).to_excel(writer, sheet_name=name, index=False, header=False)
+
+
+def test_rows_are_streamed_in_batches_across_sheets(tmp_path):
+    book = tmp_path / "kb.xlsx"
+    write_workbook(book, {
+        "A": [["About this sheet", None], ["Observation", "Recommendation"], ["o1", "r1"], ["o2", None], ["o3", "r3"]],
+        "B": [["Observation", "Recommendation"], ["o4", "r4"]],
+        "C": [["x", "y"]] * 8,
+    })
+    batches = list(stream_rows(str(book), batch_rows=2))
+    assert [[r["observation"] for r in b] for b in batches] == [["o1", "o3"], ["o4"]]
+    assert batches[1][0]["topic"] == "B"
+
+
+def test_pipeline_writes_every_batch(tmp_path):
+    book = tmp_path / "kb.xlsx"
+    rows = [["Observation", "Recommendation"]] + [[f"o{i}", f"r{i}"] for i in range(25)]
+    write_workbook(book, {"A": rows})
+    collection = FakeCollection()
+
+    report = stream_ingest(str(book), collection, encode, batch_rows=4, queue_depth=1)
+
+    assert report["rows"] == 25 and report["batches"] == 7
+    assert len(set(collection.ids)) == 25
+
+
+def test_a_failing_stage_stops_the_pipeline():
+    def broken(texts):
+        raise RuntimeError("encoder down")
+
+    batches = ([{"observation": f"o{i}", "recommendation": "r"}] for i in range(100))
+    with pytest.raises(RuntimeError, match="encoder down"):
+        StreamingIngest(FakeCollection(), broken, queue_depth=1).run(batches)
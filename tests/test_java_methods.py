@@ -0,0 +1,104 @@
+from java_methods import MethodResultCache, context_fingerprint, split_methods
+
+SOURCE = """package x;
+import java.util.*;
+// comment {
+@Service
+public class Foo {
+    private int[] a = {1, 2};
+    private String s = "}{";
+    static { init(); }
+
+    @GetMapping("/x/{id}")
+    public List<String> get(@PathVariable("id") String id) throws IOException {
+        if (id == null) { return null; }
+        Runnable r = new Runnable() { public void run() {} };
+        return List.of("}");
+    }
+
+    private void other() {
+        // }
+        char c = '}';
+    }
+
+    class Inner { void hidden() {} }
+}
+"""
+
+
+def fingerprints(source):
+    return {m["name"]: m["fingerprint"] for m in split_methods(source)[0]}
+
+
+def test_splits_top_level_methods_only():
+    methods, skeleton = split_methods(SOURCE)
+    assert [m["name"] for m in methods] == ["get", "other"]
+    assert methods[0]["text"].startswith('@GetMapping("/x/{id}")')
+    assert methods[1]["text"].rstrip().endswith("}")
+    assert "/* method get */" in skeleton
+    assert "class Inner { void hidden() {} }" in skeleton
+    assert "static { init(); }" in skeleton
+
+
+def test_fingerprint_ignores_whitespace_and_comments():
+    edited = SOURCE.replace("char c = '}';", "char   c = '}';  // note").replace("        // }\n", "")
+    assert fingerprints(edited) == fingerprints(SOURCE)
+
+
+def test_fingerprint_sees_code_after_url_literal():
+    template = """class A {
+    int f() {
+        String u = "http://a.com"; return compute(%d);
+    }
+}
+"""
+    assert fingerprints(template % 1)["f"] != fingerprints(template % 2)["f"]
+
+
+def test_fingerprint_sees_string_contents():
+    assert fingerprints(SOURCE) != fingerprints(SOURCE.replace('List.of("}")', 'List.of("} ")'))
+
+
+def test_only_edited_method_changes():
+    before = fingerprints(SOURCE)
+    after = fingerprints(SOURCE.replace("if (id == null)", "if (id == null || id.isEmpty())"))
+    assert after["get"] != before["get"]
+    assert after["other"] == before["other"]
+
+
+def test_cache_is_keyed_by_method_and_context():
+    _, skeleton = split_methods(SOURCE)
+    cache = MethodResultCache(max_entries=2)
+    ctx = context_fingerprint(skeleton, "llama3:8b")
+    cache.put("m1", ctx, {"findings": "f"})
+    assert cache.get("m1", ctx) == {"findings": "f"}
+    assert cache.get("m1", context_fingerprint(skeleton, "other-model")) is None
+
+    cache.put("m2", ctx, {})
+    cache.put("m3", ctx, {})
+    assert cache.get("m1", ctx) is None
+    assert cache.stats()["entries"] == 2
+
+
+def test_methods_with_annotation_arguments_are_split():
+    source = """@Service
+public class Repo {
+    private final Runnable task = () -> { run(); };
+    private int[] ids = {1, 2};
+
+    @Transactional(readOnly = true)
+    public List<Item> findAll() {
+        return items;
+    }
+
+    @GetMapping(value = "/items")
+    public Item find(@RequestParam(required = false) String id) {
+        return null;
+    }
+}
+"""
+    methods, skeleton = split_methods(source)
+    assert [m["name"] for m in methods] == ["findAll", "find"]
+    assert methods[0]["text"].startswith("@Transactional(readOnly = true)")
+    assert "private final Runnable task = () -> { run(); };" in skeleton
+    assert "private int[] ids = {1, 2};" in skeleton
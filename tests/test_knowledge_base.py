@@ -0,0 +1,107 @@
+import numpy as np
+import pandas as pd
+
+import knowledge_base
+from knowledge_base import SourceWatcher, build_collection, collapse_near_duplicates, header_row, observation_records, shards, threads_per_worker
+
+
+class FakeCollection:
+    name = "kb"
+
+    def __init__(self):
+        self.calls = []
+
+    def upsert(self, ids, documents, metadatas, embeddings):
+        self.calls.append(ids)
+
+
+def test_header_is_found_below_a_description_row():
+    df = pd.DataFrame([["Description:", "About"], ["Observation", "Recommendation"], ["obs", "rec"]])
+    assert header_row(df) == (1, 0, 1)
+
+
+def test_sheet_without_header_is_skipped():
+    assert header_row(pd.DataFrame([["a", "b"]])) is None
+
+
+def test_record_ids_depend_on_content_and_duplicates_collapse():
+    rows = [
+        {"observation": "o1", "recommendation": "r1", "topic": "A"},
+        {"observation": "o1", "recommendation": "r1", "topic": "B"},
+        {"observation": "o2", "recommendation": "r2"},
+    ]
+    records = observation_records(rows)
+    assert len(records) == 2
+    assert records[0]["id"] == observation_records(rows[:1])[0]["id"]
+    assert records[0]["metadata"] == {"recommendation": "r1", "topic": "A", "language": "java"}
+    assert "topic" not in records[1]["metadata"]
+
+
+def test_shards_keep_order_and_cover_everything():
+    items = list(range(1000))
+    parts = shards(items, workers=4, min_size=10)
+    assert len(parts) == 16
+    assert [x for part in parts for x in part] == items
+
+
+def test_threads_are_split_between_workers():
+    assert threads_per_worker(4, cpus=16) == 4
+    assert threads_per_worker(32, cpus=16) == 1
+
+
+def test_build_writes_in_bulk_batches(monkeypatch):
+    monkeypatch.setattr(knowledge_base, "WRITE_BATCH_SIZE", 2)
+    records = [{"id": str(i), "document": f"doc {i}", "metadata": {}} for i in range(5)]
+    collection = FakeCollection()
+    build_collection(collection, records, "m", workers=1, encode=lambda texts, batch_size: np.ones((len(texts), 3)))
+    assert collection.calls == [["0", "1"], ["2", "3"], ["4"]]
+
+
+def test_watcher_calls_back_once_a_change_has_settled(tmp_path):
+    source = tmp_path / "kb.json"
+    source.write_text("{}")
+    calls = []
+    watcher = SourceWatcher(interval=0)
+    watcher.watch([str(source)], calls.append)
+
+    watcher.check()
+    assert calls == []
+
+    source.write_text('{"a": 1}')
+    watcher.check()
+    assert calls == []  # still being written
+    watcher.check()
+    assert calls == [[str(source)]]
+    watcher.check()
+    assert len(calls) == 1
+
+
+def test_near_duplicates_collapse_into_one_canonical_row():
+    rows = [
+        {"observation": "Avoid System.out.println in the code, use a logger.", "recommendation": "Use LOGGER.info", "topic": "Loggers"},
+        {"observation": "Avoid System.out.println() in code; use a logger instead.", "recommendation": "Use LOGGER.debug", "topic": "Misc"},
+        {"observation": "Set a connection timeout on RestTemplate.", "recommendation": "Configure timeouts", "topic": "RestTemplate"},
+    ]
+    collapsed, report = collapse_near_duplicates(rows, threshold=0.6)
+    assert report == {"rows": 3, "kept": 2, "compression_ratio": 1.5}
+    merged = collapsed[0]
+    assert merged["observation"] == rows[1]["observation"]
+    assert merged["recommendation"] == "Use LOGGER.info\nUse LOGGER.debug"
+    assert merged["topics"] == "Loggers; Misc" and merged["duplicates"] == 1
+    assert "duplicates" not in collapsed[1]
+
+
+def test_distinct_observations_are_kept():
+    rows = [{"observation": text, "recommendation": "r"} for text in ("Use a pool", "Cache the token", "Batch the calls")]
+    collapsed, report = collapse_near_duplicates(rows)
+    assert len(collapsed) == 3 and report["compression_ratio"] == 1.0
+
+
+def test_near_duplicates_are_not_merged_across_languages():
+    rows = [
+        {"observation": "Reuse one HTTP client per service.", "recommendation": "Keep a shared client", "language": "java"},
+        {"observation": "Reuse one HTTP client per service.", "recommendation": "Use a requests.Session", "language": "python"},
+    ]
+    collapsed, _ = collapse_near_duplicates(rows)
+    assert [r["language"] for r in collapsed] == ["java", "python"]
+    assert [r["metadata"]["language"] for r in observation_records(collapsed)] == ["java", "python"]
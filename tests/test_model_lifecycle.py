@@ -0,0 +1,89 @@
+from ollama_client import ModelLifecycle, OllamaClient, parse_keep_alive
+
+URLS = "http://a:1,http://b:2"
+
+
+class FakeOllama:
+    def __init__(self, load_duration=0.0):
+        self.posts = []
+        self.loaded = {"http://a:1": set(), "http://b:2": set()}
+        self.load_duration = load_duration
+
+    def post(self, backend, payload, timeout):
+        self.posts.append((backend.base_url, payload))
+        self.loaded[backend.base_url].add(payload["model"] if ":" in payload["model"] else payload["model"] + ":latest")
+        return {"response": "ok", "load_duration": int(self.load_duration * 1e9)}
+
+    def resident_models(self, backend):
+        return set(self.loaded[backend.base_url])
+
+
+def client_with(fake, keep_alive_spec=""):
+    client = OllamaClient(URLS, keep_alive_spec=keep_alive_spec)
+    client._post = fake.post
+    client.resident_models = fake.resident_models
+    return client
+
+
+def test_keep_alive_is_injected_per_model():
+    assert parse_keep_alive("llama3:8b=1h, llama3 = 30m,junk") == {"llama3:8b": "1h", "llama3": "30m"}
+    fake = FakeOllama()
+    client = client_with(fake, "llama3:8b=1h")
+    client.generate({"model": "llama3:8b", "prompt": "p"})
+    client.generate({"model": "llama3", "prompt": "p"})
+    client.generate({"model": "llama3", "prompt": "p", "keep_alive": "5m"})
+    assert [payload["keep_alive"] for _, payload in fake.posts] == ["1h", "30m", "5m"]
+
+
+def test_warm_up_loads_every_model_on_every_backend():
+    fake = FakeOllama()
+    client = client_with(fake)
+    lifecycle = ModelLifecycle(client, ["llama3:8b", "llama3", "llama3"])
+    lifecycle.warm_up()
+
+    assert sorted((url, p["model"]) for url, p in fake.posts) == [
+        ("http://a:1", "llama3"), ("http://a:1", "llama3:8b"), ("http://b:2", "llama3"), ("http://b:2", "llama3:8b")
+    ]
+    assert all("prompt" not in p for _, p in fake.posts)
+    assert lifecycle.stats()["resident"] == {url: {"llama3:8b": True, "llama3": True} for url in fake.loaded}
+    assert client.stats()["llama3"]["warmups"] == 2
+
+
+def test_evicted_models_are_reloaded_by_the_residency_check():
+    fake = FakeOllama()
+    client = client_with(fake)
+    lifecycle = ModelLifecycle(client, ["llama3:8b", "llama3"])
+    lifecycle.warm_up()
+    fake.posts.clear()
+
+    lifecycle.check_residency()
+    assert fake.posts == []
+
+    fake.loaded["http://b:2"].discard("llama3:latest")
+    lifecycle.check_residency()
+    assert [(url, p["model"]) for url, p in fake.posts] == [("http://b:2", "llama3")]
+    assert lifecycle.last_check is not None
+
+
+def test_failed_load_is_reported_as_not_resident():
+    fake = FakeOllama()
+    client = client_with(fake)
+
+    def refuse(backend, payload, timeout):
+        raise ConnectionError("refused")
+    client._post = refuse
+    lifecycle = ModelLifecycle(client, ["llama3"])
+    lifecycle.warm_up()
+    assert lifecycle.resident == {"http://a:1": {"llama3": False}, "http://b:2": {"llama3": False}}
+
+
+def test_cold_loads_are_counted_from_load_duration():
+    fake = FakeOllama(load_duration=0.1)
+    client = client_with(fake)
+    client.generate({"model": "llama3", "prompt": "p"})
+    fake.load_duration = 4.0
+    client.generate({"model": "llama3", "prompt": "p"})
+
+    counters = client.stats()["llama3"]
+    assert counters["requests"] == 2 and counters["cold_loads"] == 1
+    assert counters["load_seconds"] == 4.0
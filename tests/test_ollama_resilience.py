@@ -0,0 +1,114 @@
+import threading
+import time
+
+import pytest
+import requests
+
+from ollama_client import OllamaClient, OllamaUnavailable, deadline_scope
+
+URLS = "http://a:1,http://b:2"
+PAYLOAD = {"model": "m", "prompt": "p"}
+
+
+def client_with(post, hedge_percentile=0):
+    client = OllamaClient(URLS, hedge_percentile=hedge_percentile)
+    client.breaker.max_failures = 2
+    client._post = post
+    return client
+
+
+def test_circuit_opens_after_repeated_failures_and_fails_fast():
+    calls = []
+
+    def post(backend, payload, timeout):
+        calls.append(backend.base_url)
+        raise requests.exceptions.ReadTimeout("hung")
+
+    client = client_with(post)
+    for _ in range(2):
+        with pytest.raises(requests.exceptions.Timeout):
+            client.generate(PAYLOAD, timeout=1)
+    with pytest.raises(OllamaUnavailable) as refused:
+        client.generate(PAYLOAD, timeout=1)
+    assert refused.value.status == 503 and len(calls) == 2
+    assert client.resilience_stats()["outcomes"]["circuit_open"] == 1
+    assert all(b.outstanding == 0 for b in client.pool.backends)
+
+
+def test_half_open_probe_closes_the_circuit():
+    ok = []
+
+    def post(backend, payload, timeout):
+        if not ok:
+            raise requests.exceptions.ConnectionError("down")
+        return {"response": "fine"}
+
+    client = client_with(post)
+    client.breaker.open_seconds = 0
+    for _ in range(2):
+        with pytest.raises(requests.exceptions.ConnectionError):
+            client.generate(PAYLOAD)
+    ok.append(True)
+    assert client.generate(PAYLOAD)["response"] == "fine"
+    assert client.breaker.stats()["state"] == "closed"
+
+
+def test_deadline_caps_the_timeout_and_expired_requests_are_not_sent():
+    timeouts = []
+
+    def post(backend, payload, timeout):
+        timeouts.append(timeout)
+        return {"response": "ok"}
+
+    client = client_with(post)
+    with deadline_scope(time.monotonic() + 2):
+        client.generate(PAYLOAD, timeout=30)
+    assert 0 < timeouts[0] <= 2
+
+    with deadline_scope(time.monotonic() - 1):
+        with pytest.raises(OllamaUnavailable) as refused:
+            client.generate(PAYLOAD, timeout=30)
+    assert refused.value.status == 504 and len(timeouts) == 1
+
+
+def test_slow_call_is_hedged_to_the_other_backend():
+    release = threading.Event()
+
+    def post(backend, payload, timeout):
+        if backend.base_url == "http://a:1":
+            release.wait(5)
+            return {"response": "slow"}
+        return {"response": "fast"}
+
+    client = client_with(post, hedge_percentile=95)
+    client.latencies["m"] = [0.01] * 30
+    client.pool.sticky["s"] = client.pool.backends[0].url
+    assert client.generate(PAYLOAD, timeout=10, sticky_key="s")["response"] == "fast"
+    release.set()
+    outcomes = client.resilience_stats()["outcomes"]
+    assert outcomes["hedged"] == 1 and outcomes["hedge_wins"] == 1
+
+
+def test_client_error_on_the_half_open_probe_does_not_wedge_the_circuit():
+    replies = ["down"] * 4 + [404, "ok", "ok"]  # each failing call tries both backends
+
+    def post(backend, payload, timeout):
+        reply = replies.pop(0)
+        if reply == "down":
+            raise requests.exceptions.ConnectionError("down")
+        if reply == 404:
+            response = requests.Response()
+            response.status_code = 404
+            raise requests.exceptions.HTTPError("model not found", response=response)
+        return {"response": "fine"}
+
+    client = client_with(post)
+    client.breaker.open_seconds = 0
+    for _ in range(2):
+        with pytest.raises(requests.exceptions.ConnectionError):
+            client.generate(PAYLOAD)
+    with pytest.raises(requests.exceptions.HTTPError):
+        client.generate(PAYLOAD)
+    assert client.generate(PAYLOAD)["response"] == "fine"
+    assert client.generate(PAYLOAD)["response"] == "fine"
+    assert client.breaker.stats()["state"] == "closed"
@@ -0,0 +1,63 @@
+import pytest
+
+from patching import PatchError, apply_unified_diff, extract_diff
+
+SOURCE = """class A {
+    void f() {
+        String s = "";
+        for (int i = 0; i < n; i++) s += i;
+    }
+}
+"""
+
+HUNK = """--- a/A.java
++++ b/A.java
+@@ -2,5 +2,5 @@
+     void f() {
+-        String s = "";
+-        for (int i = 0; i < n; i++) s += i;
++        StringBuilder s = new StringBuilder();
++        for (int i = 0; i < n; i++) s.append(i);
+     }"""
+
+PATCHED = SOURCE.replace('String s = "";', "StringBuilder s = new StringBuilder();").replace("s += i;", "s.append(i);")
+
+
+def test_fenced_diff_applies():
+    reply = f"Here is the change:\n```diff\n{HUNK}\n```\nExplanation: use a StringBuilder."
+    assert apply_unified_diff(SOURCE, extract_diff(reply)) == PATCHED
+
+
+def test_unfenced_diff_stops_before_explanation():
+    reply = f"{HUNK}\n\nExplanation: string concatenation in a loop copies the string each time."
+    patch = extract_diff(reply)
+    assert "Explanation" not in patch
+    assert apply_unified_diff(SOURCE, patch) == PATCHED
+
+
+def test_hunk_without_line_numbers_or_context_prefix():
+    patch = """@@ ... @@
+    void f() {
+-        String s = "";
++        StringBuilder s = new StringBuilder();"""
+    assert 'StringBuilder s = new StringBuilder();' in apply_unified_diff(SOURCE, patch)
+
+
+def test_pure_insertion_uses_line_number():
+    patched = apply_unified_diff(SOURCE, "@@ -1,0 +2,1 @@\n+    private int n;")
+    assert patched.splitlines()[1] == "    private int n;"
+
+
+def test_mismatched_hunk_is_rejected():
+    with pytest.raises(PatchError):
+        apply_unified_diff(SOURCE, "@@ -1 +1 @@\n-class B {\n+class C {")
+
+
+def test_reply_without_diff_is_rejected():
+    with pytest.raises(PatchError):
+        extract_diff("I rewrote the whole class for you.")
+
+
+def test_no_op_diff_is_rejected():
+    with pytest.raises(PatchError):
+        apply_unified_diff(SOURCE, "@@ -1 +1 @@\n class A {")
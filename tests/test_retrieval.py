@@ -0,0 +1,136 @@
+from retrieval import distance_to_score, embed_queries, fuse, merge_window_results, mmr, query_windows, retrieve, search, search_many, select_context, unpack_query
+
+
+def query_result(distances, embeddings):
+    n = len(distances)
+    return {
+        "ids": [[f"obs_{i}" for i in range(n)]],
+        "documents": [[f"doc {i}" for i in range(n)]],
+        "metadatas": [[{"recommendation": f"rec {i}"} for i in range(n)]],
+        "distances": [distances],
+        "embeddings": [embeddings],
+    }
+
+
+def test_distance_cutoff_drops_far_candidates():
+    result = unpack_query(query_result([0.2, 0.5, 1.9], [[1, 0], [0, 1], [1, 1]]))
+    items = select_context(result, top_k=3, max_distance=1.4)
+    assert [item["id"] for item in items] == ["obs_0", "obs_1"]
+    assert items[0]["score"] == distance_to_score(0.2)
+
+
+def test_nothing_close_enough_returns_no_context():
+    result = unpack_query(query_result([1.8, 1.9], [[1, 0], [0, 1]]))
+    assert select_context(result, max_distance=1.4) == []
+
+
+def test_mmr_skips_near_duplicates():
+    # obs_1 is a near copy of obs_0; obs_2 is less relevant but different
+    result = unpack_query(query_result([0.2, 0.21, 0.6], [[1, 0], [0.999, 0.01], [0, 1]]))
+    items = select_context(result, top_k=2, max_distance=1.4, mmr_lambda=0.5)
+    assert [item["id"] for item in items] == ["obs_0", "obs_2"]
+
+
+def test_mmr_with_lambda_one_is_plain_ranking():
+    assert mmr([0.9, 0.8, 0.1], [[1, 0], [1, 0], [0, 1]], k=2, lambda_=1.0) == [0, 1]
+
+
+def test_short_code_is_a_single_window():
+    code = "class A {\n    void run() {}\n}"
+    assert query_windows(code) == [code]
+
+
+def test_long_java_is_split_into_skeleton_and_methods():
+    body = "\n".join(f"        int x{i} = {i};" for i in range(20))
+    code = "class A {\n    int field;\n" + "".join(
+        f"    void m{n}() {{\n{body}\n    }}\n" for n in range(3)
+    ) + "}"
+    windows = query_windows(code)
+    assert len(windows) == 4
+    assert "int field;" in windows[0] and "x0" not in windows[0]
+    assert windows[1].strip().startswith("void m0()")
+
+
+def test_window_count_is_capped():
+    code = "\n".join(f"line {i}" for i in range(1000))
+    assert len(query_windows(code, language="python", max_windows=5)) == 5
+
+
+def test_merge_keeps_best_distance_per_item():
+    results = {
+        "ids": [["obs_0", "obs_1"], ["obs_1", "obs_2"]],
+        "documents": [["d0", "d1"], ["d1", "d2"]],
+        "metadatas": [[{}, {}], [{}, {}]],
+        "distances": [[0.5, 0.9], [0.1, 0.7]],
+    }
+    merged = merge_window_results(results)
+    assert merged["ids"] == ["obs_1", "obs_0", "obs_2"]
+    assert merged["distances"] == [0.1, 0.5, 0.7]
+
+
+def test_retrieve_encodes_and_queries_once():
+    calls = []
+
+    class Collection:
+        def query(self, query_embeddings, n_results, include):
+            calls.append(len(query_embeddings))
+            n = len(query_embeddings)
+            return {
+                "ids": [["obs_0"]] * n,
+                "documents": [["d0"]] * n,
+                "metadatas": [[{}]] * n,
+                "distances": [[0.3]] * n,
+            }
+
+    code = "\n".join(f"line {i}" for i in range(100))
+    items = retrieve(lambda texts: [[1.0, 0.0]] * len(texts), Collection(), code, language="python")
+    assert len(calls) == 1 and calls[0] > 1
+    assert [item["id"] for item in items] == ["obs_0"]
+
+
+def test_fuse_ranks_items_found_by_both_indexes_first():
+    def item(item_id, distance):
+        return {"id": item_id, "distance": distance}
+    prose = [item("obs_0", 0.9), item("obs_1", 1.0)]
+    code = [item("code_a", 0.2), item("obs_1", 0.3)]
+    assert [i["id"] for i in fuse([prose, code], top_k=3)] == ["obs_1", "code_a", "obs_0"]
+
+
+def test_search_passes_the_partition_filter():
+    seen = {}
+
+    class Collection:
+        def query(self, query_embeddings, n_results, include, where=None):
+            seen["where"] = where
+            return {"ids": [[]], "documents": [[]], "metadatas": [[]], "distances": [[]], "embeddings": [[]]}
+
+    assert search(Collection(), [[1.0, 0.0]], where={"language": "python"}) == []
+    assert seen["where"] == {"language": "python"}
+
+
+def test_many_snippets_are_encoded_and_queried_once():
+    encoded, queried = [], []
+
+    def encode(texts):
+        encoded.append(len(texts))
+        return [[1.0, 0.0, 0.0]] * len(texts)
+
+    class Collection:
+        def query(self, query_embeddings, n_results, include, where=None):
+            queried.append(len(query_embeddings))
+            n = len(query_embeddings)
+            return {
+                "ids": [["obs_k", "obs_x"]] * n,
+                "documents": [["kafka advice", "other advice"]] * n,
+                "metadatas": [[{"topic_kafka": True}, {}]] * n,
+                "distances": [[0.5, 0.2]] * n,
+                "embeddings": [[[0.0, 1.0, 0.0], [0.0, 0.0, 1.0]]] * n,
+            }
+
+    long_code = "\n".join(f"line {i}" for i in range(100))
+    groups = embed_queries(encode, ["short", long_code], language="python")
+    assert encoded == [1 + len(groups[1])] and len(groups[0]) == 1
+
+    found = search_many(Collection(), groups, topics=[["kafka"], []], top_k=1)
+    assert queried == [len(groups[0]) + len(groups[1])]
+    assert [items[0]["id"] for items in found] == ["obs_k", "obs_x"]
@@ -0,0 +1,18 @@
+import serve
+
+
+def test_only_one_worker_wins_the_leader_lock(tmp_path, monkeypatch):
+    monkeypatch.setattr(serve, "leader_lock", None)
+    path = str(tmp_path / "locks" / "leader.lock")
+    assert serve.elect_leader(path)
+    holder = serve.leader_lock
+    assert not serve.elect_leader(path)
+
+    holder.close()  # the leader exited
+    assert serve.elect_leader(path)
+    serve.leader_lock.close()
+
+
+def test_process_memory_reports_megabytes():
+    memory = serve.process_memory()
+    assert memory and all(value > 0 for value in memory.values() if value)
@@ -0,0 +1,89 @@
+import json
+import zipfile
+
+import pandas as pd
+
+from sheet_export import column_names, export_workbook, read_exported_sheet, sheet_checksums
+
+
+def write_workbook(path, sheets):
+    with pd.ExcelWriter(path) as writer:
+        for name, df in sheets.items():
+            df.to_excel(writer, sheet_name=name, index=False)
+
+
+def test_column_names_match_pandas():
+    assert column_names(["a", None, "a", ""]) == ["a", "Unnamed: 1", "a.1", "Unnamed: 3"]
+
+
+def test_sheets_are_exported_in_chunks_and_read_back(tmp_path):
+    book = tmp_path / "kb.xlsx"
+    a = pd.DataFrame({"Observation": [f"o{i}" for i in range(7)], "Recommendation": ["r"] * 7})
+    write_workbook(book, {"A": a, "B&C": pd.DataFrame({"n": [1, 2]})})
+
+    report = export_workbook(str(book), str(tmp_path / "out"), workers=2, chunk_rows=3)
+
+    assert report["exported"] == 2 and report["rows"] == 9
+    assert read_exported_sheet(str(tmp_path / "out"), "A").equals(a)
+    lines = (tmp_path / "out" / "B_C.jsonl").read_text().splitlines()
+    assert [json.loads(line) for line in lines] == [{"n": "1"}, {"n": "2"}]
+
+
+def test_unchanged_sheets_are_skipped(tmp_path):
+    book = tmp_path / "kb.xlsx"
+    sheets = {"A": pd.DataFrame({"x": [1]}), "B": pd.DataFrame({"x": [2]})}
+    write_workbook(book, sheets)
+    out = str(tmp_path / "out")
+    export_workbook(str(book), out, workers=1)
+
+    assert export_workbook(str(book), out, workers=1)["skipped"] == 2
+
+    before = sheet_checksums(str(book))
+    sheets["B"] = pd.DataFrame({"x": [3]})
+    write_workbook(book, sheets)
+    after = sheet_checksums(str(book))
+    assert before["A"] == after["A"] and before["B"] != after["B"]
+    report = export_workbook(str(book), out, workers=1)
+    assert report["exported"] == 1 and report["skipped"] == 1
+    assert read_exported_sheet(out, "B")["x"].tolist() == ["3"]
+
+
+def write_shared_strings_workbook(path, sheets):
+    # Excel keeps cell text in one sharedStrings part for all sheets
+    main = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+    rel = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+    strings = [text for texts in sheets.values() for text in texts]
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr("xl/workbook.xml", f'<workbook xmlns="{main}" xmlns:r="{rel}"><sheets>' + "".join(
+            f'<sheet name="{name}" sheetId="{i}" r:id="rId{i}"/>' for i, name in enumerate(sheets, 1)) + "</sheets></workbook>")
+        archive.writestr("xl/_rels/workbook.xml.rels",
+                         '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">' + "".join(
+                             f'<Relationship Id="rId{i}" Target="worksheets/sheet{i}.xml"/>' for i in range(1, len(sheets) + 1))
+                         + "</Relationships>")
+        archive.writestr("xl/sharedStrings.xml", f'<sst xmlns="{main}">' + "".join(f"<si><t>{t}</t></si>" for t in strings) + "</sst>")
+        index = 0
+        for i, texts in enumerate(sheets.values(), 1):
+            cells = "".join(f'<row r="{r}"><c r="A{r}" t="s"><v>{index + r - 1}</v></c></row>' for r in range(1, len(texts) + 1))
+            archive.writestr(f"xl/worksheets/sheet{i}.xml", f'<worksheet xmlns="{main}"><sheetData>{cells}</sheetData></worksheet>')
+            index += len(texts)
+
+
+def test_text_edit_only_changes_its_own_sheet(tmp_path):
+    book = tmp_path / "kb.xlsx"
+    write_shared_strings_workbook(book, {"A": ["Observation", "slow loop"], "B": ["Observation", "old text"]})
+    before = sheet_checksums(str(book))
+
+    write_shared_strings_workbook(book, {"A": ["Observation", "slow loop"], "B": ["Observation", "new text"]})
+    after = sheet_checksums(str(book))
+    assert before["A"] == after["A"] and before["B"] != after["B"]
+
+
+def test_sheets_with_the_same_safe_name_get_their_own_files(tmp_path):
+    book = tmp_path / "kb.xlsx"
+    write_workbook(book, {"B&C": pd.DataFrame({"x": [1]}), "B_C": pd.DataFrame({"x": [2]})})
+    out = str(tmp_path / "out")
+
+    export_workbook(str(book), out, workers=1)
+    assert read_exported_sheet(out, "B&C")["x"].tolist() == ["1"]
+    assert read_exported_sheet(out, "B_C")["x"].tolist() == ["2"]
+    assert export_workbook(str(book), out, workers=1)["skipped"] == 2
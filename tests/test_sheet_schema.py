@@ -0,0 +1,35 @@
+import json
+
+import pandas as pd
+
+from sheet_schema import extract_workbook, resolve_columns
+
+
+def write_workbook(path, sheets):
+    with pd.ExcelWriter(path) as writer:
+        for name, df in sheets.items():
+            df.to_excel(writer, sheet_name=name, index=False)
+
+
+def test_identical_layouts_reuse_the_mapping():
+    cache = {}
+    mapping, cached = resolve_columns(["Observation", "Sample Code", "Description"], cache)
+    assert mapping == {"observation": 0, "recommendation": 1, "description": 2} and not cached
+    again, cached = resolve_columns(["Observation", "Sample Code", "Description"], cache)
+    assert again == mapping and cached
+
+
+def test_workbook_is_parsed_in_parallel_with_per_sheet_reports(tmp_path):
+    book = tmp_path / "kb.xlsx"
+    layout = {"Observation": ["o1", "o2"], "Sample Code": ["c1", None]}
+    write_workbook(book, {"A": pd.DataFrame(layout), "B": pd.DataFrame(layout), "C": pd.DataFrame({"x": [1]})})
+    cache_path = tmp_path / "cache.json"
+
+    serial, _ = extract_workbook(str(book), workers=1, cache_path=str(cache_path))
+    parallel, reports = extract_workbook(str(book), workers=3, cache_path=str(cache_path), min_parallel_bytes=0)
+
+    assert parallel == serial == [("o1", "c1", "A", ""), ("o1", "c1", "B", "")]
+    assert [r["sheet"] for r in reports] == ["A", "B", "C"]
+    assert reports[0]["cached_mapping"] and reports[0]["recommendation"] == "Sample Code"
+    assert reports[2]["observation"] is None and reports[2]["rows"] == 0
+    assert len(json.loads(cache_path.read_text())) == 2
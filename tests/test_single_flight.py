@@ -0,0 +1,54 @@
+import threading
+import time
+
+from single_flight import SingleFlight, request_key
+
+
+def test_concurrent_duplicates_share_one_computation():
+    flight = SingleFlight()
+    calls = []
+
+    def work():
+        calls.append(1)
+        time.sleep(0.2)
+        return 42
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.do("k", work, label="e"))) for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert results == [42] * 5
+    assert len(calls) == 1
+    assert flight.stats()["endpoints"]["e"] == {"executed": 1, "coalesced": 4}
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_error_is_shared_and_key_released():
+    flight = SingleFlight()
+
+    def fail():
+        raise RuntimeError("boom")
+
+    try:
+        flight.do("k", fail)
+    except RuntimeError:
+        pass
+    assert flight.do("k", lambda: "ok") == "ok"
+
+
+def test_key_ignores_trailing_spaces_and_blank_lines():
+    assert request_key("e", "m", "a = 1  \n\n\nb = 2\n") == request_key("e", "m", "a = 1\nb = 2")
+
+
+def test_key_keeps_indentation():
+    nested = "for x in xs:\n    f(x)\n    g(x)"
+    flat = "for x in xs:\n    f(x)\ng(x)"
+    assert request_key("optimize-python", "m", nested) != request_key("optimize-python", "m", flat)
+
+
+def test_key_depends_on_endpoint_and_model():
+    assert request_key("a", "m", "x") != request_key("b", "m", "x")
+    assert request_key("a", "m", "x") != request_key("a", "n", "x")
@@ -0,0 +1,72 @@
+from knowledge_base import code_example_records, observation_records
+from retrieval import search_focused
+from topics import detect_topics, topic_filter, topic_ids
+
+KAFKA_CLASS = """
+import org.apache.kafka.clients.consumer.ConsumerRecord;
+import com.zaxxer.hikari.HikariDataSource;
+
+@Service
+public class Orders {
+    @KafkaListener(topics = "orders")
+    public void onOrder(ConsumerRecord<String, String> record) { }
+}
+"""
+
+
+def test_imports_and_annotations_map_to_kb_topics():
+    assert detect_topics(KAFKA_CLASS) == ["jdbc_pool", "kafka"]
+    assert detect_topics("public class Plain { int x; }") == []
+
+
+def test_sheet_and_dataset_names_resolve_to_the_same_topic():
+    assert topic_ids("Secure_random") == topic_ids("SecureRandom") == ["secure_random"]
+    assert topic_ids("Hikari & Tomcat JDBC; kafka; Sheet1") == ["jdbc_pool", "kafka"]
+
+
+def test_filters():
+    assert topic_filter([]) is None
+    assert topic_filter(["kafka"]) == {"topic_kafka": True}
+    assert topic_filter(["kafka", "jms"]) == {"$or": [{"topic_kafka": True}, {"topic_jms": True}]}
+
+
+def test_records_carry_topic_flags():
+    record = observation_records([{"observation": "o", "recommendation": "r", "topic": "kafka", "topics": "kafka; JMS"}])[0]
+    assert record["metadata"]["topic_kafka"] and record["metadata"]["topic_jms"]
+    example = {"id": "code_1", "code": "c", "topic": "SecureRandom", "role": "example", "recommendation": "", "path": "p"}
+    assert code_example_records([example])[0]["metadata"]["topic_secure_random"]
+
+
+class Collection:
+    def __init__(self, by_filter):
+        self.by_filter = by_filter
+        self.filters = []
+
+    def query(self, query_embeddings, n_results, include, where=None):
+        self.filters.append(where)
+        ids = self.by_filter.get(str(where), [])
+        return {
+            "ids": [ids],
+            "documents": [[f"doc {i}" for i in ids]],
+            "metadatas": [[{} for _ in ids]],
+            "distances": [[0.2 + 0.1 * n for n in range(len(ids))]],
+            "embeddings": [[[float(k == n) for k in range(4)] for n in range(len(ids))]],
+        }
+
+
+def test_focused_search_fills_up_from_the_rest_of_the_partition():
+    language = {"language": "java"}
+    focus = {"topic_kafka": True}
+    collection = Collection({
+        str({"$and": [language, focus]}): ["kafka_1"],
+        str(language): ["kafka_1", "other_1", "other_2"],
+    })
+    items = search_focused(collection, [[1.0, 0.0]], focus, top_k=2, where=language)
+    assert [item["id"] for item in items] == ["kafka_1", "other_1"]
+    assert collection.filters == [{"$and": [language, focus]}, language]
+
+
+def test_focused_search_stops_when_the_topics_are_enough():
+    collection = Collection({str({"topic_kafka": True}): ["k1", "k2", "k3"]})
+    items = search_focused(collection, [[1.0, 0.0]], {"topic_kafka": True}, top_k=2)
+    assert len(items) == 2 and len(collection.filters) == 1
@@ -0,0 +1,157 @@
+import numpy as np
+import pytest
+
+from knowledge_base import VersionedCollection, read_pointer, version_name
+
+
+class FakeCollection:
+    def __init__(self, name, metadata=None):
+        self.name = name
+        self.metadata = metadata
+        self.rows = {}
+        self.documents = {}
+
+    def count(self):
+        return len(self.rows)
+
+    def upsert(self, ids, documents, metadatas, embeddings):
+        self.rows.update(zip(ids, embeddings))
+        self.documents.update(zip(ids, documents))
+
+    def get(self, ids=None, include=()):
+        ids = [i for i in (ids or self.rows) if i in self.rows]
+        return {"ids": ids, "documents": [self.documents[i] for i in ids], "embeddings": [self.rows[i] for i in ids]}
+
+    def query(self, query_embeddings, n_results, include):
+        distances = sorted(float(np.sum((np.array(v) - query_embeddings[0]) ** 2)) for v in self.rows.values())
+        return {"distances": [distances[:n_results]]}
+
+
+class FakeClient:
+    def __init__(self):
+        self.collections = {}
+
+    def create_collection(self, name, metadata=None):
+        self.collections[name] = FakeCollection(name, metadata)
+        return self.collections[name]
+
+    def get_collection(self, name):
+        return self.collections[name]
+
+    def delete_collection(self, name):
+        del self.collections[name]
+
+    def list_collections(self):
+        return list(self.collections)
+
+
+def records(*docs):
+    return [{"id": f"obs_{i}", "document": d, "metadata": {}} for i, d in enumerate(docs)]
+
+
+def encode(texts, batch_size=None):
+    return np.array([[float(len(t)), 1.0] for t in texts])
+
+
+def test_publish_swaps_pointer_and_drops_old_version(tmp_path):
+    client = FakeClient()
+    kb = VersionedCollection(client, "kb", "m:torch", str(tmp_path))
+    first = kb.publish(records("a"), "m", workers=1, encode=encode)["version"]
+    second = kb.publish(records("a", "bb"), "m", workers=1, encode=encode)["version"]
+
+    assert first != second
+    assert read_pointer(kb.pointer_path)["name"] == second
+    assert list(client.collections) == [second]
+
+
+def test_unchanged_records_are_not_rebuilt(tmp_path):
+    kb = VersionedCollection(FakeClient(), "kb", "m:torch", str(tmp_path))
+    kb.publish(records("a"), "m", workers=1, encode=encode)
+    report = kb.publish(records("a"), "m", workers=1, encode=lambda *a, **k: pytest.fail("re-embedded"))
+    assert report["unchanged"] and report["version"] == kb.current_name()
+
+
+def test_reindex_only_embeds_new_rows_and_reports_changes(tmp_path):
+    kb = VersionedCollection(FakeClient(), "kb", "m:torch", str(tmp_path))
+    kb.publish(records("a", "bb"), "m", workers=1, encode=encode)
+    embedded = []
+
+    def counting_encode(texts, batch_size=None):
+        embedded.extend(texts)
+        return encode(texts)
+
+    new_rows = [{"id": "obs_0", "document": "a", "metadata": {}}, {"id": "obs_9", "document": "ccc", "metadata": {}}]
+    report = kb.publish(new_rows, "m", workers=1, encode=counting_encode)
+    assert embedded == ["ccc"]
+    assert (report["added"], report["removed"], report["embedded"]) == (1, 1, 1)
+
+
+def test_leased_version_survives_swap_until_released(tmp_path):
+    client = FakeClient()
+    kb = VersionedCollection(client, "kb", "m:torch", str(tmp_path))
+    old = kb.publish(records("a"), "m", workers=1, encode=encode)["version"]
+    with kb.lease() as collection:
+        new = kb.publish(records("bb"), "m", workers=1, encode=encode)["version"]
+        assert collection.name == old and old in client.collections
+    assert list(client.collections) == [new]
+
+
+def test_failed_validation_keeps_current_version(tmp_path):
+    client = FakeClient()
+    kb = VersionedCollection(client, "kb", "m:torch", str(tmp_path))
+    current = kb.publish(records("a"), "m", workers=1, encode=encode)["version"]
+    with pytest.raises(ValueError):
+        kb.publish(records("bb"), "m", workers=1, encode=lambda texts, batch_size=None: np.zeros((0, 2)))
+    assert kb.current_name() == current and list(client.collections) == [current]
+
+
+def test_new_process_loads_and_follows_the_pointer(tmp_path):
+    client = FakeClient()
+    writer = VersionedCollection(client, "kb", "m:torch", str(tmp_path))
+    writer.publish(records("a"), "m", workers=1, encode=encode)
+
+    reader = VersionedCollection(client, "kb", "m:torch", str(tmp_path))
+    assert reader.load() == writer.current_name()
+    writer.publish(records("bb"), "m", workers=1, encode=encode)
+    assert reader.refresh() and reader.current_name() == writer.current_name()
+
+
+def test_other_encoder_ignores_the_pointer(tmp_path):
+    client = FakeClient()
+    VersionedCollection(client, "kb", "m:torch", str(tmp_path)).publish(records("a"), "m", workers=1, encode=encode)
+    assert VersionedCollection(client, "kb", "m:onnx", str(tmp_path)).load() is None
+    assert version_name("kb", "m:torch", records("a")) != version_name("kb", "m:onnx", records("a"))
+
+
+def test_followers_never_drop_versions_and_the_publisher_waits_for_the_grace(tmp_path):
+    client = FakeClient()
+    publisher = VersionedCollection(client, "kb", "sig", str(tmp_path), retire_grace=60)
+    follower = VersionedCollection(client, "kb", "sig", str(tmp_path))
+    first = publisher.publish(records("a"), "m", encode=encode)["version"]
+    assert follower.reopen(client, drop_retired=False) == first
+
+    second = publisher.publish(records("a", "bb"), "m", encode=encode)["version"]
+    assert first in client.collections  # still within the grace period
+    assert follower.refresh() and follower.current_name() == second
+    assert first in client.collections
+
+    publisher.retired[0]["retired_at"] -= 61
+    publisher.collect_garbage()
+    assert first not in client.collections and not publisher.retired
+
+
+def test_reverting_an_edit_reactivates_the_retired_version(tmp_path):
+    client = FakeClient()
+    kb = VersionedCollection(client, "kb", "sig", str(tmp_path), retire_grace=60)
+    first = kb.publish(records("a"), "m", encode=encode)["version"]
+    original = client.collections[first]
+    kb.publish(records("a", "bb"), "m", encode=encode)
+
+    report = kb.publish(records("a"), "m", encode=lambda *a, **k: pytest.fail("re-embedded"))
+    assert report["revived"] and kb.current_name() == first
+    assert client.collections[first] is original
+
+    for version in kb.retired:
+        version["retired_at"] -= 61
+    kb.collect_garbage()
+    assert list(client.collections) == [first] and read_pointer(kb.pointer_path)["name"] == first
@@ -0,0 +1,115 @@
+import re
+
+# KB topics with the names they go by in the workbooks / DataSet.json and
+# the imports, annotations and types that show a class needs them
+TOPICS = {
+    "async": {
+        "names": ["Asynchronous call imp", "Asynchronous call impl", "Asynchronous call implementation"],
+        "patterns": [r"@Async\b", r"\bCompletableFuture\b", r"java\.util\.concurrent\.(?:Executor|Future)"]
+    },
+    "mdc_executor": {
+        "names": ["MDCThreadPoolExecutor"],
+        "patterns": [r"\bMDCThreadPoolExecutor\b", r"\bThreadPoolExecutor\b", r"\bThreadPoolTaskExecutor\b", r"org\.slf4j\.MDC\b"]
+    },
+    "resilience4j": {
+        "names": ["Resilience4j"],
+        "patterns": [r"io\.github\.resilience4j", r"\bCircuitBreaker(?:Factory)?\b", r"@(?:Retry|Bulkhead|RateLimiter|TimeLimiter)\b"]
+    },
+    "http_sink": {
+        "names": ["HttpSink"],
+        "patterns": [r"\bHttpSink\b"]
+    },
+    "rest_template": {
+        "names": ["RestTemplate"],
+        "patterns": [r"\bRestTemplate\b", r"org\.springframework\.web\.client"]
+    },
+    "jdbc_pool": {
+        "names": ["Hikari & Tomcat JDBC"],
+        "patterns": [r"com\.zaxxer\.hikari", r"org\.apache\.tomcat\.jdbc", r"\bHikari(?:DataSource|Config)\b", r"\bJdbcTemplate\b",
+                     r"javax\.sql\.DataSource"]
+    },
+    "mongodb": {
+        "names": ["Mongo DB"],
+        "patterns": [r"org\.springframework\.data\.mongodb", r"com\.mongodb", r"\bMongo(?:Template|Client|Repository)\b"]
+    },
+    "jms": {
+        "names": ["JMS"],
+        "patterns": [r"(?:javax|jakarta)\.jms", r"org\.springframework\.jms", r"@JmsListener\b", r"\bJmsTemplate\b", r"\bJMSConnector\b",
+                     r"@EnableJMSIntegration\b"]
+    },
+    "kafka": {
+        "names": ["kafka"],
+        "patterns": [r"org\.apache\.kafka", r"org\.springframework\.kafka", r"@(?:KafkaListener|EnableKafka)\b", r"\bKafka(?:Template|Consumer|Producer)\b"]
+    },
+    "synchronized": {
+        "names": ["Synchronized_block"],
+        "patterns": [r"\bsynchronized\b"]
+    },
+    "solace": {
+        "names": ["Solace"],
+        "patterns": [r"com\.solace", r"com\.solacesystems"]
+    },
+    "loggers": {
+        "names": ["Loggers"],
+        "patterns": [r"org\.slf4j", r"org\.apache\.(?:logging\.)?log4j", r"java\.util\.logging", r"\bLOGGER\.", r"\bSystem\.(?:out|err)\.print"]
+    },
+    "secure_random": {
+        "names": ["Secure_random", "SecureRandom"],
+        "patterns": [r"\bSecureRandom\b"]
+    },
+    "session_profile": {
+        "names": ["Session_profile", "SessionProfile"],
+        "patterns": [r"\bSessionProfile\b"]
+    },
+    "user_entitlement": {
+        "names": ["Userentitlement", "UserEntitlement"],
+        "patterns": [r"\bUserEntitlement\b", r"\bEntitlement(?:Service|Client)\b"]
+    },
+    "locator_call": {
+        "names": ["Redundant_locator_call", "RedundantLocatorCall"],
+        "patterns": [r"\b\w*Locator\b"]
+    },
+    "gemfire": {
+        "names": ["Fusion_gemfire", "FusionGemfire"],
+        "patterns": [r"org\.apache\.geode", r"com\.gemstone", r"\bGemfire\w*", r"\bClientCache\b", r"@Region\b"]
+    },
+}
+
+
+def normalize_name(name):
+    return re.sub(r"[^a-z0-9]", "", str(name).lower())
+
+
+TOPIC_NAMES = {normalize_name(name): topic for topic, spec in TOPICS.items() for name in spec["names"]}
+TOPIC_PATTERNS = {topic: re.compile("|".join(spec["patterns"])) for topic, spec in TOPICS.items()}
+
+
+# 1. Ingestion: sheet / DataSet.json names to topic ids; a near-duplicate
+#    row merged from several sheets ("A; B") belongs to all of them
+def topic_ids(*names):
+    found = []
+    for value in names:
+        for name in str(value or "").split(";"):
+            topic = TOPIC_NAMES.get(normalize_name(name))
+            if topic and topic not in found:
+                found.append(topic)
+    return found
+
+
+# Chroma metadata holds scalars only, so each topic is a boolean flag
+def topic_flags(topics):
+    return {f"topic_{topic}": True for topic in topics}
+
+
+# 2. Query time: a regex pass over the code (imports, annotations, types)
+#    decides which topics it touches, in TOPICS order
+def detect_topics(code):
+    return [topic for topic, pattern in TOPIC_PATTERNS.items() if pattern.search(code)]
+
+
+def topic_filter(topics):
+    clauses = [{f"topic_{topic}": True} for topic in topics]
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else {"$or": clauses}
+